@@ -7,9 +7,12 @@ from datetime import datetime
 from ikabot.bot.bot import Bot
 from ikabot.helpers.gui import Colours, daysHoursMinutes
 from ikabot.helpers.naval import get_military_and_see_movements
+from ikabot.web.rateLimiter import RequestPriority
 
 
 class AttacksMonitoringBot(Bot):
+    request_priority = RequestPriority.HIGH
+
     def __init__(self, ikariam_service, bot_config):
         super().__init__(ikariam_service, bot_config)
         self.seconds_between_checks = bot_config['waitMinutes'] * 60
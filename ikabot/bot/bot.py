@@ -11,9 +11,16 @@ from ikabot import config
 from ikabot.helpers.database import Database
 from ikabot.helpers.ikabotProcessListManager import IkabotProcessListManager, ProcessStatus
 from ikabot.helpers.telegram import Telegram
+from ikabot.web.gateway import GatewayIkariamService, get_gateway_socket_path, is_gateway_supported
+from ikabot.web.rateLimiter import RequestPriority
 
 
 class Bot(ABC):
+    # priority of the bot's requests in the account's shared rate limiter
+    request_priority = RequestPriority.NORMAL
+    # send the requests through the account's gateway when it's enabled with --useGateway
+    uses_gateway = True
+
     @abstractmethod
     def _get_process_info(self) -> str:
         raise NotImplementedError('Implement me in the current bot class')
@@ -41,9 +48,16 @@ class Bot(ABC):
             logging.info("Preparing %s with config: %s", self.__class__.__name__, self.bot_config)
             self.__set_process_signals()
             self.ikariam_service.padre = False
+            self.ikariam_service.request_priority = self.request_priority
+            # don't share the parent's sockets
+            self.ikariam_service.reset_connection_pool()
+            if self.uses_gateway and config.application_params.get('useGateway', False) and is_gateway_supported():
+                self.ikariam_service = GatewayIkariamService(self.ikariam_service,
+                                                             get_gateway_socket_path(config.BOT_NAME))
 
             # Reinitialize connections
-            self.db = Database(bot_name=config.BOT_NAME)
+            self.db = Database(bot_name=config.BOT_NAME,
+                               batch_interval=float(config.application_params.get('dbBatchInterval', 0)))
             self.telegram = Telegram(db=self.db, is_user_attached=False)
             self.__process_manager = IkabotProcessListManager(self.db)
             self.ikariam_service.reset_db_telegram(db=self.db, telegram=self.telegram)
@@ -130,6 +144,7 @@ class Bot(ABC):
             actual_sleep_time += remaining_time * ratio
             remaining_time = total_sleep_time - actual_sleep_time
 
+        # not batched: the pending heartbeats are committed with it, so the others see the state of the whole sleep
         self.__process_manager.upsert_process({
             'status': ProcessStatus.WAITING,
             'nextActionTime': time.time() + actual_sleep_time,
@@ -142,7 +157,7 @@ class Bot(ABC):
             'status': ProcessStatus.RUNNING,
             'nextActionTime': None,
             'info': 'After ' + info
-        })
+        }, batched=True)
 
         return actual_sleep_time
 
@@ -162,4 +177,4 @@ class Bot(ABC):
         }
         if target_city is not None:
             status_update['targetCity'] = target_city
-        self.__process_manager.upsert_process(status_update)
+        self.__process_manager.upsert_process(status_update, batched=True)
@@ -2,15 +2,19 @@
 # -*- coding: utf-8 -*-
 
 import gzip
-import json
 import time
 from pathlib import Path
 
 from ikabot.bot.bot import Bot
 from ikabot.helpers.getJson import getIsland
+from ikabot.helpers import jsonCodec
+from ikabot.helpers.models import Island, to_json_default
+from ikabot.web.rateLimiter import RequestPriority
 
 
 class DumpWorldBot(Bot):
+    request_priority = RequestPriority.LOW
+
     def __init__(self, ikariam_service, bot_config):
         super().__init__(ikariam_service, bot_config)
         self.shallow = bot_config['shallow']
@@ -86,7 +90,7 @@ class DumpWorldBot(Bot):
             }
         )
         shallow_islands = []
-        for x, val in json.loads(data)['data'].items():
+        for x, val in jsonCodec.loads(data)['data'].items():
             for y, val2 in val.items():
                 shallow_islands.append({
                     'x': x,
@@ -106,8 +110,7 @@ class DumpWorldBot(Bot):
         p = Path(self.dump_path).parent
         p.mkdir(exist_ok=True, parents=True)
         with gzip.open(self.dump_path, 'wb') as file:
-            json_string = json.dumps(world).encode('utf-8')
-            file.write(json_string)
+            file.write(jsonCodec.dumps_bytes(world, default=to_json_default))
 
     def __retrieve_islands(self, island_ids):
         islands = []
@@ -128,5 +131,5 @@ class DumpWorldBot(Bot):
                 except Exception:
                     # try again
                     pass
-            islands.append(getIsland(html))
+            islands.append(Island.from_dict(getIsland(html)))
         return islands
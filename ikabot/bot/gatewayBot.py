@@ -0,0 +1,47 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+import logging
+
+from ikabot import config
+from ikabot.bot.bot import Bot
+from ikabot.web.gateway import get_gateway_socket_path, IkariamGatewayServer, is_gateway_running, \
+    is_gateway_supported
+from ikabot.web.rateLimiter import RequestPriority
+
+
+class GatewayBot(Bot):
+    """
+    Owns the one real session of the account and serves the requests of all the other bots
+    """
+    request_priority = RequestPriority.HIGH
+    uses_gateway = False
+
+    def _get_process_info(self) -> str:
+        return 'I share one ikariam session between all the bots'
+
+    def _start(self) -> None:
+        self._set_process_info('Listening on {}'.format(self.bot_config['socketPath']))
+        IkariamGatewayServer(self.ikariam_service, self.bot_config['socketPath']).serve_forever()
+
+    @staticmethod
+    def start_if_needed(ikariam_service):
+        """
+        Starts the account's gateway if it's enabled with --useGateway and it's not running yet
+        :param ikariam_service: ikabot.web.ikariamService.IkariamService
+        :return: int/None -> pid of the new gateway process
+        """
+        if not config.application_params.get('useGateway', False):
+            return None
+        if not is_gateway_supported():
+            logging.warning('The gateway requires unix sockets, which are not supported on this system')
+            return None
+
+        socket_path = get_gateway_socket_path(config.BOT_NAME)
+        if is_gateway_running(socket_path):
+            logging.info('Gateway is already running on %s', socket_path)
+            return None
+
+        return GatewayBot(ikariam_service, {'socketPath': socket_path}).start(
+            action='Gateway',
+            objective='Shared session',
+        )
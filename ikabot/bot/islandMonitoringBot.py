@@ -1,7 +1,9 @@
 #! /usr/bin/env python3
 # -*- coding: utf-8 -*-
 import logging
+import re
 from enum import Enum
+from html import unescape
 from typing import Dict, List
 
 import bs4
@@ -11,7 +13,11 @@ from ikabot.config import city_url, island_url
 from ikabot.helpers.dicts import combine_dicts_with_lists, search_additional_keys_in_dict, \
     search_value_change_in_dict_for_presented_values_in_now
 from ikabot.helpers.getJson import getCity, getIsland
+from ikabot.helpers.models import City
 from ikabot.helpers.citiesAndIslands import getIslandsIds
+from ikabot.web.rateLimiter import RequestPriority
+
+_selected_option_pattern = re.compile(r'<option\s(?:[^>]*\s)?selected(?:[\s=/][^>]*)?>([^<]*)</option>')
 
 
 class CityStatusUpdate(Enum):
@@ -41,6 +47,8 @@ class IslandMonitoringNotifications(Enum):
 
 
 class IslandMonitoringBot(Bot):
+    request_priority = RequestPriority.LOW
+
     __state_inactive = 'inactive'
     __state_vacation = 'vacation'
 
@@ -79,11 +87,16 @@ class IslandMonitoringBot(Bot):
                 # Ensure we've loaded the island with the correct city
                 while True:
                     _island_html = self.ikariam_service.get(island_url + island_id)
+                    if _monitoring_city_name and self.is_monitoring_city_selected():
+                        # the page says we're still in the monitoring city, no need to look at the selector
+                        _city_name = _monitoring_city_name
+                        break
                     _city_name = self.extract_current_city_name_from_selector(_island_html)
 
                     if _monitoring_city_name and _city_name != _monitoring_city_name:
                         logging.debug("Switching to monitoring city %s from %s", _monitoring_city_name, _city_name)
                         self.open_monitoring_city()
+                        self.ikariam_service.metrics['citySwitches'] += 1
                     else:
                         break
 
@@ -118,8 +131,23 @@ class IslandMonitoringBot(Bot):
     def open_monitoring_city(self):
         return self.ikariam_service.get(city_url + self.monitoring_city_id)
 
+    def is_monitoring_city_selected(self):
+        """
+        Checks the current city of the last loaded page
+        :return: bool
+        """
+        current_city_id = self.ikariam_service.account_state.get('current_city_id')
+        return current_city_id is not None and str(current_city_id) == str(self.monitoring_city_id)
+
     @staticmethod
     def extract_current_city_name_from_selector(html):
+        # only the selector is parsed, the rest of the island page is not needed
+        start = html.find('id="js_homeCitySelect"')
+        end = html.find('</select>', start)
+        match = _selected_option_pattern.search(html, start, end) if start != -1 and end != -1 else None
+        if match is not None:
+            return unescape(match.group(1)).strip()
+
         logging.debug('Extracting current city name from selector: %s', html)
         return (bs4.BeautifulSoup(html, 'html.parser')
                 .select_one('#js_homeCitySelect option[selected]')
@@ -133,7 +161,7 @@ class IslandMonitoringBot(Bot):
         :param island: dict[]
         :return: dict[dict] cityId -> city
         """
-        return {city['id']: city for city in island['cities'] if city['type'] == 'city'}
+        return {city['id']: City.from_dict(city) for city in island['cities'] if city['type'] == 'city'}
 
     @staticmethod
     def monitor_level_up(
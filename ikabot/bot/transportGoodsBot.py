@@ -1,17 +1,15 @@
 #! /usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import json
 import math
 import sys
 from decimal import Decimal
 from typing import List, Union
 
 from ikabot.bot.bot import Bot
-from ikabot.config import (SECONDS_IN_HOUR, actionRequest, city_url,
-                           materials_names)
-from ikabot.helpers.citiesAndIslands import getCurrentCityId
-from ikabot.helpers.getJson import getCity
+from ikabot.config import SECONDS_IN_HOUR, actionRequest, materials_names
+from ikabot.helpers.citiesAndIslands import changeCurrentCity
+from ikabot.helpers.getJson import get_city
 from ikabot.helpers.gui import addThousandSeparator
 from ikabot.helpers.naval import TransportShip
 from ikabot.helpers.planRoutes import waitForAvailableShips
@@ -135,8 +133,8 @@ class TransportGoodsBot(Bot):
         if batch_size is not None:
             storage_capacity_in_ships = min(storage_capacity_in_ships, batch_size)
 
-        origin_city = getCity(self.ikariam_service.get(city_url + str(job.origin_city['id'])))
-        target_city = getCity(self.ikariam_service.get(city_url + str(job.target_city['id'])))
+        origin_city = get_city(self.ikariam_service, job.origin_city['id'])
+        target_city = get_city(self.ikariam_service, job.target_city['id'])
 
         foreign = str(target_city['id']) != str(job.target_city['id'])
         if not foreign:
@@ -179,19 +177,7 @@ class TransportGoodsBot(Bot):
         # this can fail if a random request is made in between this two posts
 
         # Change from the city the bot is sitting right now to the city we want to load resources from
-        self.ikariam_service.post(
-            noIndex=True,
-            params={
-                'action': 'header',
-                'function': 'changeCurrentCity',
-                'actionRequest': actionRequest,
-                'oldView': 'city',
-                'cityId': origin_city['id'],
-                'backgroundView': 'city',
-                'currentCityId': getCurrentCityId(self.ikariam_service),
-                'ajax': '1'
-            }
-        )
+        changeCurrentCity(self.ikariam_service, origin_city['id'])
 
         required_ships = int(math.ceil((Decimal(sum(resources_to_send)) / Decimal(self.ship_size))))
         # Request to send the resources from the origin to the target
@@ -225,8 +211,7 @@ class TransportGoodsBot(Bot):
             key = 'cargo_resource' if ind == 0 else 'cargo_tradegood{:d}'.format(ind)
             data[key] = res
 
-        resp = self.ikariam_service.post(params=data)
-        resp = json.loads(resp, strict=False)
+        resp = self.ikariam_service.post(params=data, parseJson=True)
         if resp[3][1][0]['type'] == 10:
             return resources_to_send
 
@@ -4,8 +4,8 @@ from abc import abstractmethod
 from typing import Union
 
 from ikabot.bot.bot import Bot
-from ikabot.config import actionRequest, city_url
-from ikabot.helpers.getJson import getCity
+from ikabot.config import actionRequest
+from ikabot.helpers.getJson import get_city
 from ikabot.helpers.ikabotProcessListManager import ProcessStatus
 from ikabot.helpers.planRoutes import getMinimumWaitingTime
 
@@ -87,7 +87,8 @@ class AbstractUpgradeBuildingBot(Bot):
         """
         failed_consecutive_wait_times = 0
         while True:
-            city = getCity(self.ikariam_service.get(city_url + self.city_id))
+            # the upgrade is sent for the current city
+            city = get_city(self.ikariam_service, self.city_id, select=True)
             building = self._get_building_to_upgrade(city)
             logging.debug('Trying to upgrade building in city %s, Building: %s', city['name'], building)
 
@@ -100,7 +101,7 @@ class AbstractUpgradeBuildingBot(Bot):
                 self.__expand_building(building)
 
                 # check if the upgrade has started
-                city = getCity(self.ikariam_service.get(city_url + self.city_id))
+                city = get_city(self.ikariam_service, self.city_id)
                 building_in_construction = self.__get_currently_expanding_building(city)
                 if (building_in_construction is None
                         or building_in_construction['position'] != building['position']
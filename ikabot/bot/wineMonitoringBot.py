@@ -4,13 +4,17 @@ from typing import List
 
 from ikabot.bot.bot import Bot
 from ikabot.config import city_url, SECONDS_IN_HOUR
+from ikabot.helpers import citySnapshots
 from ikabot.helpers.getJson import getCity
 from ikabot.helpers.gui import Colours, daysHoursMinutes
 from ikabot.helpers.citiesAndIslands import getIdsOfCities
 from ikabot.helpers.resources import getProductionPerSecond
+from ikabot.web.rateLimiter import RequestPriority
 
 
 class WineMonitoringBot(Bot):
+    request_priority = RequestPriority.HIGH
+
     __process_info_working = 'Checking for low wine'
 
     def __init__(self, ikariam_service, bot_config):
@@ -31,6 +35,7 @@ class WineMonitoringBot(Bot):
             for city_id in cities:
                 logging.debug('Checking city: %s', city_id)
                 city = getCity(self.ikariam_service.get(city_url + city_id))
+                citySnapshots.record_city(self.ikariam_service.db, city)
                 self._set_process_info(self.__process_info_working, target_city=city['name'])
 
                 consumption_per_hour = city['wineConsumptionPerHour']
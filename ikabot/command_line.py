@@ -5,6 +5,7 @@ import sys
 import time
 import traceback
 
+from ikabot.bot.gatewayBot import GatewayBot
 from ikabot.function.activateMiracleBotConfigurator import activate_miracle_bot_configurator
 from ikabot.function.attackBarbariansBotConfigurator import attack_barbarians_bot_configurator
 from ikabot.function.attacksMonitoringBotConfigurator import configure_alert_attacks_monitoring_bot
@@ -166,6 +167,7 @@ def menu(ikariam_service, db, telegram):
     """
     checkForUpdate()
     show_proxy(db)
+    GatewayBot.start_if_needed(ikariam_service)
     process_list_manager = IkabotProcessListManager(db)
     consecutive_keyboard_interruptions = False
 
@@ -173,6 +175,7 @@ def menu(ikariam_service, db, telegram):
         banner()
 
         print("now: ", formatTimestamp(time.time()))
+        process_list_manager.compact()
         process_list_manager.print_proces_table()
 
         try:
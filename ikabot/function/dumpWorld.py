@@ -3,13 +3,13 @@
 
 import ast
 import gzip
-import json
 import os
 
 from ikabot.bot.dumpWorldBot import DumpWorldBot
 from ikabot.config import isWindows
 from ikabot.helpers.database import Database
 from ikabot.helpers.gui import banner, Colours, enter, getDateTime
+from ikabot.helpers import jsonCodec
 from ikabot.helpers.userInput import askUserYesNo, read
 from ikabot.helpers.telegram import Telegram
 from ikabot.web.ikariamService import IkariamService
@@ -71,7 +71,7 @@ def view_dump(ikariam_service: IkariamService, db: Database, telegram: Telegram)
     print('Loading dump...')
     selected_dump = files[choice]
     with gzip.open(selected_dump, 'rb') as file:
-        selected_dump = json.load(file)
+        selected_dump = jsonCodec.loads(file.read())
 
     selected_islands = set()
     while True:
@@ -1,14 +1,13 @@
 #! /usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from ikabot.config import city_url, materials_names, MAXIMUM_CITY_NAME_LENGTH
+from ikabot.config import materials_names, MAXIMUM_CITY_NAME_LENGTH
 from ikabot.function.constructBuilding import constructBuilding
 from ikabot.function.islandWorkplaces import islandWorkplaces
 from ikabot.function.transportGoodsBotConfigurator import transport_goods_bot_configurator
 from ikabot.function.upgradeBuildingBotConfigurator import upgrade_single_building_bot_configurator
-from ikabot.helpers.citiesAndIslands import getIdsOfCities
+from ikabot.helpers.citiesAndIslands import get_cities, getIdsOfCities
 from ikabot.helpers.database import Database
-from ikabot.helpers.getJson import getCity
 from ikabot.helpers.gui import banner, Colours, printProgressBar
 from ikabot.helpers.market import printGoldForAllCities
 from ikabot.helpers.telegram import Telegram
@@ -168,15 +167,13 @@ def getStatusForAllCities(ikariam_service: IkariamService, db: Database, telegra
     banner()
 
     [city_ids, _] = getIdsOfCities(ikariam_service, False)
-    cities = []
 
     # available_ships = 0
     # total_ships = 0
 
     # region Retrieve cities data
-    for res_ind, city_id in enumerate(city_ids):
-        printProgressBar("Retrieving cities data", res_ind+1, len(city_ids))
-        cities.append(getCity(ikariam_service.get(city_url + city_id)))
+    cities = get_cities(ikariam_service, city_ids,
+                        progress=lambda done, total: printProgressBar("Retrieving cities data", done, total))
     # endregion
 
     # Remove progressbar
@@ -17,11 +17,10 @@ from ikabot.bot.upgradeBuilding.upgradeBuildingGroupBot import \
     UpgradeBuildingGroupBot
 from ikabot.bot.upgradeBuilding.upgradeSingleBuildingBot import \
     UpgradeSingleBuildingBot
-from ikabot.config import (MAXIMUM_CITY_NAME_LENGTH, actionRequest, city_url,
+from ikabot.config import (MAXIMUM_CITY_NAME_LENGTH, actionRequest,
                            materials_names, materials_names_tec)
 from ikabot.helpers.buildings import BuildingTypes
-from ikabot.helpers.citiesAndIslands import chooseCity, getIdsOfCities
-from ikabot.helpers.getJson import getCity
+from ikabot.helpers.citiesAndIslands import chooseCity, get_cities, getIdsOfCities
 from ikabot.helpers.gui import (Colours, addThousandSeparator, banner,
                                 decodeUnicodeEscape, enter)
 from ikabot.helpers.ikabotProcessListManager import IkabotProcessListManager
@@ -271,7 +270,7 @@ def sendResourcesMenu(ikariam_service, beneficent_city_id, missing):
     missing : list[int]
     """
     cities_ids, _ = getIdsOfCities(ikariam_service)
-    cities = [getCity(ikariam_service.get(city_url + str(city_id))) for city_id in cities_ids]
+    cities = get_cities(ikariam_service, cities_ids)
     beneficent_city = [c for c in cities if c['id'] == beneficent_city_id][0]
     send_resources = None
     expand_anyway = None
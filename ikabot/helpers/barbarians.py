@@ -1,4 +1,3 @@
-import json
 import math
 import re
 from decimal import Decimal
@@ -6,6 +5,7 @@ from decimal import Decimal
 from ikabot.bot.transportGoodsBot import TransportGoodsBot
 from ikabot.config import actionRequest, materials_names
 from ikabot.helpers.citiesAndIslands import getCurrentCityId
+from ikabot.helpers import jsonCodec
 from ikabot.helpers.naval import (TransportShip,
                                   get_military_and_see_movements,
                                   get_transport_ships_size)
@@ -56,7 +56,7 @@ def get_units(session, city):
     }
 
     resp = session.post(params=params)
-    resp = json.loads(resp, strict=False)
+    resp = jsonCodec.loads(resp, strict=False)
     html = resp[1][1][1]
     html = html.split('<div class="fleet')[0]
 
@@ -78,7 +78,7 @@ def get_units(session, city):
 def get_barbarians_lv(session, island):
     params = {"view": "barbarianVillage", "destinationIslandId": island['id'], "oldBackgroundView": "city", "cityWorldviewScale": "1", "islandId": island['id'], "backgroundView": "island", "currentIslandId": island['id'], "actionRequest": actionRequest, "ajax": "1"}
     resp = session.post(params=params)
-    resp = json.loads(resp, strict=False)
+    resp = jsonCodec.loads(resp, strict=False)
 
     level = int(resp[2][1]['js_islandBarbarianLevel']['text'])
     gold = int(resp[2][1]['js_islandBarbarianResourcegold']['text'].replace(',', ''))
@@ -119,7 +119,7 @@ def get_barbarians_info(ikariam_service, island_id):
         'ajax': 1
     }
     resp = ikariam_service.post(params=query)
-    resp = json.loads(resp, strict=False)
+    resp = jsonCodec.loads(resp, strict=False)
     return resp
 
 
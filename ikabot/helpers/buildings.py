@@ -1,4 +1,3 @@
-import json
 from enum import Enum
 from typing import Tuple, Union
 
@@ -6,6 +5,7 @@ from ikabot.config import actionRequest, city_url
 from ikabot.helpers.citiesAndIslands import chooseCity, getIdsOfCities
 from ikabot.helpers.getJson import getCity
 from ikabot.helpers.gui import enter
+from ikabot.helpers import jsonCodec
 from ikabot.web.ikariamService import IkariamService
 
 
@@ -65,7 +65,7 @@ def get_building_info(ikariam_service: IkariamService, city_id: int, building: d
             'ajax': '1'
         }
     )
-    return json.loads(data, strict=False)
+    return jsonCodec.loads(data, strict=False)
 
 
 def choose_city_with_building(ikariam_service: IkariamService, building_type: str) \
@@ -4,10 +4,13 @@
 import json
 import re
 
-from ikabot.config import city_url, island_url, MAXIMUM_CITY_NAME_LENGTH
+from ikabot import config
+from ikabot.config import actionRequest, city_url, island_url, MAXIMUM_CITY_NAME_LENGTH
+from ikabot.helpers import citySnapshots
 from ikabot.helpers.getJson import getCity, getIsland
 from ikabot.helpers.gui import banner, decodeUnicodeEscape, enter
 from ikabot.helpers.userInput import read
+from ikabot.web.asyncIkariamService import AsyncIkariamService
 from ikabot.web.ikariamService import IkariamService
 
 menu_cities = ''
@@ -168,19 +171,78 @@ def getIslandsIds(session):
     """
     (cities_ids, cities) = getIdsOfCities(session)
     islands_ids = set()
-    for city_id in cities_ids:
-        html = session.get(city_url + city_id)
-        city = getCity(html)
+    for city in get_cities(session, cities_ids):
         island_id = city['islandId']
         islands_ids.add(island_id)
     return list(islands_ids)
 
 
-def getCurrentCityId(session):
+def get_cities(ikariam_service, cities_ids, progress=None):
+    """
+    Loads and parses the cities concurrently
+    :param ikariam_service: ikabot.web.ikariamService.IkariamService
+    :param cities_ids: list[int|str]
+    :param progress: None/callable(done, total) -> called after each loaded city
+    :return: list[dict] -> the cities in the same order as the ids
+    """
+    htmls = AsyncIkariamService(ikariam_service).get_all([city_url + str(city_id) for city_id in cities_ids],
+                                                         progress=progress)
+    cities = [getCity(html) for html in htmls]
+    for city in cities:
+        citySnapshots.record_city(getattr(ikariam_service, 'db', None), city)
+    return cities
+
+
+def get_islands(ikariam_service, islands_ids, progress=None):
+    """
+    Loads and parses the islands concurrently
+    :param ikariam_service: ikabot.web.ikariamService.IkariamService
+    :param islands_ids: list[int|str]
+    :param progress: None/callable(done, total) -> called after each loaded island
+    :return: list[dict] -> the islands in the same order as the ids
+    """
+    htmls = AsyncIkariamService(ikariam_service).get_all([island_url + str(island_id) for island_id in islands_ids],
+                                                         progress=progress)
+    return [getIsland(html) for html in htmls]
+
+
+def getCurrentCityId(session, max_age=None):
     """
     Parameters
     ----------
     session : ikabot.web.ikariamService.IkariamService
+    max_age : None/float
+        how old the tracked current city can be, the max_age of the account state by default
     """
+    city_id = session.account_state.get('current_city_id', max_age)
+    if city_id is not None:
+        return str(city_id)
     html = session.get()
     return re.search(r'currentCityId:\s(\d+),', html).group(1)
+
+
+def changeCurrentCity(session, city_id):
+    """
+    Selects the city in the header. The current city is shared by all the processes of the account, which can change
+    it at any moment, so the switch is always sent, even when the city looks selected already. Only the currentCityId
+    parameter of the switch is taken from the city seen in the last few seconds (param citySwitchMaxAge)
+    :param session: ikabot.web.ikariamService.IkariamService
+    :param city_id: int|str
+    :return: void
+    """
+    current_city_id = getCurrentCityId(session, float(config.application_params.get('citySwitchMaxAge', 2)))
+    session.post(
+        noIndex=True,
+        params={
+            'action': 'header',
+            'function': 'changeCurrentCity',
+            'actionRequest': actionRequest,
+            'oldView': 'city',
+            'cityId': city_id,
+            'backgroundView': 'city',
+            'currentCityId': current_city_id,
+            'ajax': '1'
+        },
+        parseJson=True,
+    )
+    session.metrics['citySwitches'] += 1
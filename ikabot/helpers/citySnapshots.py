@@ -0,0 +1,136 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Time series of the state of the cities, recorded every time the page of a city is fetched, so the status screens,
+the wine alerts and the planners can look at the past and the present of the cities without asking the game again.
+Every snapshot is written in one bucket of each tier and replaces the older snapshot of the bucket, so a tier keeps the
+last state of every minute, hour or day, and the rows older than the retention of their tier are deleted.
+"""
+import logging
+import time
+
+from ikabot import config
+
+# (tier, seconds of a bucket, seconds for which the buckets are kept), from the finest to the coarsest
+TIERS = [
+    (0, 60, 24 * 60 * 60),
+    (1, 60 * 60, 30 * 24 * 60 * 60),
+    (2, 24 * 60 * 60, 365 * 24 * 60 * 60),
+]
+
+# (database, city id) -> time of the last snapshot written by this process
+_last_recorded = {}
+_last_pruned = 0
+_prune_interval = 60 * 60
+
+
+def record_city(db, city, now=None):
+    """
+    Records the state of a city which was just fetched. Loading the city must never fail because of the snapshots,
+    so the errors are only logged. A city which is fetched again within the citySnapshotInterval parameter is not
+    written again
+    :param db: None/ikabot.helpers.database.Database -> nothing is recorded without a database
+    :param city: dict -> as returned by getCity
+    :param now: None/float
+    :return: bool -> whether the snapshot was written
+    """
+    if db is None:
+        return False
+    now = time.time() if now is None else now
+    try:
+        city_id = int(city['id'])
+        key = (id(db), city_id)
+        interval = float(config.application_params.get('citySnapshotInterval', 10))
+        if now - _last_recorded.get(key, 0) < interval:
+            return False
+        buckets = [(tier, int(now // size * size)) for tier, size, _ in TIERS]
+        db.store_city_snapshot(city_id, buckets, now, to_snapshot_data(city))
+        _last_recorded[key] = now
+        _prune(db, now)
+        return True
+    except Exception as e:
+        logging.warning('Could not record the snapshot of the city: %s', e)
+        return False
+
+
+def _prune(db, now):
+    global _last_pruned
+    if now - _last_pruned < _prune_interval:
+        return
+    _last_pruned = now
+    deleted = db.delete_old_city_snapshots({tier: now - retention for tier, _, retention in TIERS})
+    logging.debug('Deleted %d old city snapshots', deleted)
+
+
+def to_snapshot_data(city):
+    """
+    :param city: dict -> as returned by getCity
+    :return: dict -> the part of the city which is recorded, the buildings as [position, building, level]
+    """
+    return {
+        'availableResources': list(city['availableResources']),
+        'productionPerHour': list(city['productionPerHour']),
+        'wineConsumptionPerHour': city['wineConsumptionPerHour'],
+        'storageCapacity': city['storageCapacity'],
+        'buildings': [[b['position'], b['building'], b['level']] for b in city['position']
+                      if b['building'] != 'empty' and 'level' in b],
+    }
+
+
+def _from_row(row):
+    snapshot = dict(row['data'])
+    snapshot['cityId'] = row['cityId']
+    snapshot['time'] = row['recordedAt']
+    snapshot['buildings'] = [{'position': position, 'building': building, 'level': level}
+                             for position, building, level in snapshot['buildings']]
+    return snapshot
+
+
+def get_latest_city_snapshot(db, city_id, max_age=None, now=None):
+    """
+    :param db: ikabot.helpers.database.Database
+    :param city_id: int|str
+    :param max_age: None/float -> how old the snapshot can be, the retention of the coarsest tier by default
+    :param now: None/float
+    :return: None/dict -> cityId, time, availableResources, productionPerHour, wineConsumptionPerHour,
+    storageCapacity and buildings (list of dicts with position, building and level)
+    """
+    now = time.time() if now is None else now
+    for tier, _, retention in TIERS:
+        since = now - (retention if max_age is None else min(max_age, retention))
+        rows = db.get_city_snapshots(int(city_id), tier, since, now)
+        if rows:
+            return _from_row(rows[-1])
+    return None
+
+
+def get_city_history(db, city_id, since, until=None, now=None):
+    """
+    Returns the snapshots of the finest tier which still keeps the ones of the given period
+    :param db: ikabot.helpers.database.Database
+    :param city_id: int|str
+    :param since: float
+    :param until: None/float -> now by default
+    :param now: None/float
+    :return: list[dict] -> snapshots as returned by get_latest_city_snapshot, sorted by time
+    """
+    now = time.time() if now is None else now
+    until = now if until is None else until
+    tier = next((tier for tier, _, retention in TIERS if now - since <= retention), TIERS[-1][0])
+    return [_from_row(row) for row in db.get_city_snapshots(int(city_id), tier, since, until)]
+
+
+def estimate_available_resources(snapshot, at=None):
+    """
+    Projects the resources of a snapshot to the given time with its production and its wine consumption
+    :param snapshot: dict -> as returned by get_latest_city_snapshot
+    :param at: None/float -> now by default
+    :return: list[int]
+    """
+    hours = max(0, (time.time() if at is None else at) - snapshot['time']) / (60 * 60)
+    resources = []
+    for i, (available, production) in enumerate(zip(snapshot['availableResources'], snapshot['productionPerHour'])):
+        if i == 1:
+            production -= snapshot['wineConsumptionPerHour']
+        resources.append(int(min(snapshot['storageCapacity'], max(0, available + production * hours))))
+    return resources
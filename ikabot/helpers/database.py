@@ -1,25 +1,125 @@
 import json
 import logging
 import sqlite3
+import time
 from contextlib import closing
 from typing import List
 
 from ikabot import config
 
+_busy_timeout = 11.0
+
 
 class Database:
     __bot_name_str = 'botName'
     __bot_name_where = "{} = :{}".format(__bot_name_str, __bot_name_str)
+    __process_columns = ["pid", "action", "status", "lastActionTime", "nextActionTime", "targetCity", "objective",
+                         "info", "createTime"]
 
-    def __init__(self, bot_name):
+    def __init__(self, bot_name, batch_interval=0):
+        """
+        :param bot_name: str
+        :param batch_interval: float -> seconds for which the batched writes are kept in memory before they are
+                                        committed together; 0 commits every write
+        """
         logging.debug('Creating db connection; botName=%s', bot_name)
         self.__bot_name = bot_name
-        self.__conn = sqlite3.connect(config.DB_FILE, timeout=11.0)
+        self.__conn = sqlite3.connect(config.DB_FILE, timeout=_busy_timeout)
+        self.__batch_interval = batch_interval
+        self.__pending = {}
+        self.__pending_since = None
+        # pids of the processes which this connection has seen in the table
+        self.__existing_processes = set()
+        self.__configure_connection()
+
+    def __configure_connection(self):
+        """
+        Write ahead log, so the readers don't block the writer and the other way around, and fsync only at the
+        checkpoints, which is safe with the write ahead log
+        """
+        params = config.application_params
+        pragmas = [
+            ('journal_mode', params.get('dbJournalMode', 'WAL')),
+            ('synchronous', params.get('dbSynchronous', 'NORMAL')),
+            ('busy_timeout', int(_busy_timeout * 1000)),
+            ('mmap_size', int(params.get('dbMmapSize', 64 * 1024 * 1024))),
+        ]
+        for name, value in pragmas:
+            try:
+                with closing(self.__conn.cursor()) as _cursor:
+                    _cursor.execute('PRAGMA {} = {}'.format(name, value))
+            except sqlite3.OperationalError as e:
+                # e.g. the journal mode can't be changed while another process is writing
+                logging.warning('Could not set PRAGMA %s = %s: %s', name, value, e)
 
     def close_db_conn(self):
         logging.debug('Closing db connection')
+        self.flush()
         self.__conn.close()
 
+    def flush(self):
+        """
+        Commits the batched writes together
+        :return: void
+        """
+        if self.__pending:
+            self.__execute_and_commit()
+
+    def flush_if_due(self):
+        """
+        Commits the batched writes which are older than the batch interval. The writes are also committed by the
+        next write after the interval, but a bot can be busy for long without writing anything
+        :return: bool -> whether the writes were committed
+        """
+        if self.__pending_since is None or time.time() - self.__pending_since < self.__batch_interval:
+            return False
+        self.flush()
+        return True
+
+    def __execute_and_commit(self, *writes):
+        """
+        Executes the batched writes and the given ones in one transaction
+        :param writes: (table, kind, key_columns, data)
+        :return: int -> number of rows changed by the last write
+        """
+        writes = list(self.__pending.values()) + list(writes)
+        self.__pending, self.__pending_since = {}, None
+        rowcount = 0
+        with closing(self.__conn.cursor()) as _cursor:
+            for table, kind, key_columns, data in writes:
+                _cursor.execute(self.__build_write_sql(table, kind, key_columns, data), data)
+                rowcount = _cursor.rowcount
+        self.__conn.commit()
+        return rowcount
+
+    def __build_write_sql(self, table, kind, key_columns, data):
+        if kind == 'replace':
+            return f"INSERT OR REPLACE INTO {table} ({', '.join(data)}) VALUES(:{', :'.join(data)})"
+        where = " AND ".join(['{} = :{}'.format(c, c) for c in [self.__bot_name_str] + key_columns])
+        if kind == 'delete':
+            return f"DELETE FROM {table} WHERE {where}"
+        values = ", ".join(['{} = :{}'.format(c, c) for c in data if c not in key_columns and c != self.__bot_name_str])
+        return f"UPDATE {table} SET {values} WHERE {where}"
+
+    def __write(self, table, kind, key_columns, data, batch_key=None):
+        """
+        :param batch_key: None/object -> identifies the row of a batched write; the later writes of the same row are
+                                         merged with the pending one
+        :return: int -> number of rows changed; 1 for a batched write
+        """
+        if batch_key is None or self.__batch_interval <= 0:
+            return self.__execute_and_commit((table, kind, key_columns, data))
+
+        pending = self.__pending.get((table, batch_key), None)
+        if pending is not None:
+            kind, key_columns, data = pending[1], pending[2], dict(pending[3], **data)
+        self.__pending[(table, batch_key)] = (table, kind, key_columns, data)
+        if self.__pending_since is None:
+            self.__pending_since = time.time()
+        elif time.time() - self.__pending_since >= self.__batch_interval:
+            self.flush()
+        return 1
+
     def __add_bot_name_to_args(self, args):
         """
         Add account name to the args
@@ -34,6 +134,7 @@ class Database:
         """
         Select data from table
         """
+        self.flush()
         where = " AND ".join([self.__bot_name_where] + (where or []))
         args = self.__add_bot_name_to_args(args)
 
@@ -45,27 +146,42 @@ class Database:
 
         return [dict(zip(columns, row)) for row in rows]
 
-    def __upsert(self, table: str, columns: List[str], data: dict) -> None:
+    def __upsert(self, table: str, columns: List[str], data: dict, batch_key=None) -> None:
         """
         Inserts data into table
         """
         data = self.__add_bot_name_to_args(data)
-        columns = [self.__bot_name_str] + [c for c in columns if c in data]
-        sql = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES(:{', :'.join(columns)})"
-        with closing(self.__conn.cursor()) as _cursor:
-            _cursor.execute(sql, data)
-        self.__conn.commit()
+        data = {c: data[c] for c in [self.__bot_name_str] + columns if c in data}
+        self.__write(table, 'replace', [], data, batch_key)
+
+    def __update(self, table: str, key_columns: List[str], columns: List[str], data: dict, batch_key=None) -> int:
+        """
+        Updates the given columns of the row with the given keys
+        :return: int -> number of updated rows
+        """
+        data = self.__add_bot_name_to_args(data)
+        data = {c: data[c] for c in [self.__bot_name_str] + key_columns + columns if c in data}
+        return self.__write(table, 'update', key_columns, data, batch_key)
 
     def __delete(self, table: str, args: dict) -> None:
         """
         Deletes data from table
         """
         args = self.__add_bot_name_to_args(args)
-        where = " AND ".join(['{} = :{}'.format(c, c) for c in args])
-        sql = f"DELETE FROM {table} WHERE {where}"
+        self.__write(table, 'delete', [c for c in args if c != self.__bot_name_str], args)
+
+    def get_storage_version(self):
+        """
+        Returns a marker that changes every time the stored values of the bot (cookies, proxy config...) are written,
+        either by this connection or by another process, and not on the other writes (heartbeats, snapshots...).
+        The version is kept by the triggers of the storage table. Comparing markers is way cheaper than reading and
+        parsing the values again.
+        :return: int
+        """
         with closing(self.__conn.cursor()) as _cursor:
-            _cursor.execute(sql, args)
-        self.__conn.commit()
+            _cursor.execute('SELECT version FROM storageVersions WHERE botName = ?', (self.__bot_name,))
+            row = _cursor.fetchone()
+        return 0 if row is None else row[0]
 
     def get_processes(self, filters=None):
         """
@@ -78,23 +194,118 @@ class Database:
         return self.__select('processes', where, args)
 
     def set_process(self, process):
-        self.__upsert(
-            'processes',
-            [
-                "pid",
-                "action",
-                "status",
-                "lastActionTime",
-                "nextActionTime",
-                "targetCity",
-                "objective",
-                "info"
-            ],
-            process
-        )
+        self.__upsert('processes', self.__process_columns, process)
+        self.__existing_processes.add(process['pid'])
+
+    def update_process(self, pid, values, batched=False):
+        """
+        Updates only the given columns of the process, without reading it
+        :param pid: int
+        :param values: dict -> columns to update; the ones which are not columns of the table are ignored
+        :param batched: bool -> the update is only a heartbeat, it can be committed later with the other ones
+        :return: bool -> whether the process exists
+        """
+        # a batched update of a row which doesn't exist would be lost silently
+        batch_key = pid if batched and pid in self.__existing_processes else None
+        updated = self.__update('processes', ['pid'], self.__process_columns, dict(values, pid=pid), batch_key)
+        if updated:
+            self.__existing_processes.add(pid)
+        return updated > 0
 
     def delete_process(self, pid):
         self.__delete('processes', {'pid': pid})
+        self.__existing_processes.discard(pid)
+
+    def delete_expired_processes(self, statuses, now=None):
+        """
+        Deletes in one statement the processes which have finished and have been shown long enough
+        :param statuses: list[str] -> statuses of the finished processes
+        :param now: None/float -> time after which the rows are expired, the current time by default
+        :return: int -> number of deleted processes
+        """
+        args = self.__add_bot_name_to_args({'now': time.time() if now is None else now})
+        args.update({'status{}'.format(i): status for i, status in enumerate(statuses)})
+        placeholders = ', '.join(':status{}'.format(i) for i in range(len(statuses)))
+        sql = f"DELETE FROM processes WHERE {self.__bot_name_where} AND status IN ({placeholders}) " \
+              f"AND nextActionTime <= :now"
+        self.flush()
+        with closing(self.__conn.cursor()) as _cursor:
+            _cursor.execute(sql, args)
+            deleted = _cursor.rowcount
+        self.__conn.commit()
+        self.__existing_processes.clear()
+        return deleted
+
+    def optimize(self):
+        """
+        Gives the free pages back to the file system and lets sqlite update the statistics of the indexes. Never
+        runs a full vacuum, which would wait for the other processes to stop writing: the database is switched to
+        incremental vacuum by migrate.switch_to_incremental_vacuum at the start
+        :return: void
+        """
+        self.flush()
+        try:
+            with closing(self.__conn.cursor()) as _cursor:
+                _cursor.execute('PRAGMA incremental_vacuum')
+                _cursor.fetchall()
+                _cursor.execute('PRAGMA optimize')
+            self.__conn.commit()
+        except sqlite3.OperationalError as e:
+            # e.g. another process is writing for longer than the busy timeout
+            logging.warning('Could not optimize the database: %s', e)
+
+    def store_city_snapshot(self, city_id, buckets, recorded_at, data):
+        """
+        Writes the snapshot of the city in the bucket of every tier, replacing the older snapshot of the bucket
+        :param city_id: int
+        :param buckets: list[(int, int)] -> tier and start time of its bucket
+        :param recorded_at: float
+        :param data: dict
+        :return: void
+        """
+        data = json.dumps(data, separators=(',', ':'))
+        self.__execute_and_commit(*[
+            ('citySnapshots', 'replace', [], self.__add_bot_name_to_args(
+                {'cityId': city_id, 'tier': tier, 'time': time, 'recordedAt': recorded_at, 'data': data}))
+            for tier, time in buckets
+        ])
+
+    def get_city_snapshots(self, city_id, tier, since, until):
+        """
+        :param city_id: int
+        :param tier: int
+        :param since: float
+        :param until: float
+        :return: list[dict] -> cityId, tier, time, recordedAt and data of the snapshots, sorted by time
+        """
+        snapshots = self.__select(
+            'citySnapshots',
+            ['cityId = :cityId', 'tier = :tier', 'recordedAt >= :since', 'recordedAt <= :until'],
+            {'cityId': city_id, 'tier': tier, 'since': since, 'until': until}
+        )
+        for snapshot in snapshots:
+            snapshot['data'] = json.loads(snapshot['data'])
+        return sorted(snapshots, key=lambda s: s['recordedAt'])
+
+    def delete_old_city_snapshots(self, oldest_times):
+        """
+        Deletes in one statement the snapshots which are older than the retention of their tier
+        :param oldest_times: dict[int, float] -> tier -> time of its oldest bucket to keep
+        :return: int -> number of deleted snapshots
+        """
+        args = self.__add_bot_name_to_args({})
+        conditions = []
+        for tier, oldest_time in oldest_times.items():
+            args['tier{}'.format(tier)] = tier
+            args['time{}'.format(tier)] = oldest_time
+            conditions.append('(tier = :tier{0} AND time < :time{0})'.format(tier))
+        self.flush()
+        with closing(self.__conn.cursor()) as _cursor:
+            _cursor.execute(f"DELETE FROM citySnapshots WHERE {self.__bot_name_where} AND ({' OR '.join(conditions)})",
+                            args)
+            deleted = _cursor.rowcount
+        self.__conn.commit()
+        return deleted
 
     def get_stored_value(self,  key):
         data = self.__select(
@@ -3,16 +3,35 @@
 
 import json
 import re
+from decimal import Decimal
 from math import ceil
 
-from ikabot.config import materials_names, SECONDS_IN_HOUR
+from ikabot.config import city_url, island_url, materials_names, SECONDS_IN_HOUR
 from ikabot.helpers.gui import decodeUnicodeEscape
+from ikabot.helpers import citySnapshots, jsonCodec
 from ikabot.helpers.resources import extract_resource_production, extract_tradegood, extract_tradegood_production, \
     getAvailableResources, \
     getWarehouseCapacity, \
     getWineConsumptionPerHour
 
 
+# the variables of the dataSetForView script block, found with a single scan of the block
+_view_variable_pattern = re.compile(
+    r'(currentResources|maxResources|branchOfficeResources|wineSpendings|producedTradegood|tradegoodProduction'
+    r'|resourceProduction):(\s*)(JSON\.parse\(\'[^\']*\'\)|"[^"]*"|[^,\s}]+)(,?)'
+)
+# the value patterns are the same as the ones of the helpers, which are used when a variable is not in the block
+_available_resources_pattern = re.compile(r'\\"resource\\":(\d+),\\"2\\":(\d+),\\"1\\":(\d+),\\"4\\":(\d+),\\"3\\":(\d+)}')
+_max_resources_pattern = re.compile(r'JSON\.parse\(\'{\\"resource\\":(\d+),')
+_listed_for_sale_pattern = re.compile(r'JSON\.parse\(\'{\\"resource\\":\\"(\d+)\\",\\"1\\":\\"(\d+)\\",\\"2\\":\\"(\d+)\\",\\"3\\":\\"(\d+)\\",\\"4\\":\\"(\d+)\\"}\'\)')
+_free_citizens_pattern = re.compile(r'js_GlobalMenu_citizens">(.*?)</span>')
+_population_pattern = re.compile(r'js_GlobalMenu_population">(.*?)</span>')
+_tradegood_pattern = re.compile(r'"(\d+)"')
+_production_pattern = re.compile(r'\d+(\.\d+)?')
+_leading_number_pattern = re.compile(r'\d+')
+_json_decoder = json.JSONDecoder(strict=False)
+
+
 def parse_int(num: str) -> int:
     return int(num.replace(',', '').replace('.', ''))
 
@@ -135,7 +154,7 @@ def getIsland(html):
     isla = isla.replace('buildplace', 'empty')
 
     # {"id":idIsla,"name":nombreIsla,"x":,"y":,"good":numeroBien,"woodLv":,"goodLv":,"wonder":numeroWonder, "wonderName": "nombreDelMilagro","wonderLv":"5","cities":[{"type":"city","name":cityName,"id":cityId,"level":lvIntendencia,"Id":playerId,"Name":playerName,"AllyId":,"AllyTag":,"state":"vacation"},...}}
-    isla = json.loads(isla, strict=False)
+    isla = jsonCodec.loads(isla, strict=False)
     isla['tipo'] = re.search(r'"tradegood":(\d)', html).group(1)
     isla['x'] = int(isla['xCoord'])
     isla['y'] = int(isla['yCoord'])
@@ -148,6 +167,74 @@ def getIsland(html):
     return isla
 
 
+def extract_background_data(html):
+    """
+    Decodes the updateBackgroundData of the page, without searching for the end of it first
+    :param html: str -> city page
+    :return: dict
+    """
+    # the data is usually at the end of the page, after the script variables
+    start = html.find('"updateBackgroundData",', max(html.rfind('dataSetForView'), 0))
+    if start == -1:
+        start = html.index('"updateBackgroundData",')
+    start += len('"updateBackgroundData",')
+    if html[start:start + 1].isspace():
+        start += 1
+    return _json_decoder.raw_decode(html, start)[0]
+
+
+def extract_city_variables(html):
+    """
+    Extracts the variables of the city page which getCity needs with a single scan of the dataSetForView script
+    block, instead of searching the whole page for each of them. A variable which isn't in the block is extracted
+    from the whole page by its helper, as before.
+    :param html: str -> city page
+    :return: dict
+    """
+    # the script block is at the end of the page, look for it from there
+    found = {}
+    for match in _view_variable_pattern.finditer(html, max(html.rfind('dataSetForView'), 0)):
+        found.setdefault(match.group(1), match)
+
+    def value(name, pattern, single_space=False, comma=False, search=False):
+        match = found.get(name, None)
+        if match is None or (single_space and len(match.group(2)) != 1) or (comma and not match.group(4)):
+            return None
+        if search:
+            return pattern.search(match.group(3))
+        return pattern.fullmatch(match.group(3)) if comma else pattern.match(match.group(3))
+
+    variables = {}
+
+    resources = value('currentResources', _available_resources_pattern, search=True)
+    variables['availableResources'] = [int(resources.group(i)) for i in [1, 3, 2, 5, 4]] if resources \
+        else getAvailableResources(html, num=True)
+
+    capacity = value('maxResources', _max_resources_pattern)
+    variables['storageCapacity'] = int(capacity.group(1)) if capacity else getWarehouseCapacity(html)
+
+    on_sale = value('branchOfficeResources', _listed_for_sale_pattern, single_space=True)
+    variables['resourcesListedForSale'] = [int(amount) for amount in on_sale.groups()] if on_sale \
+        else getResourcesListedForSale(html)
+
+    wine = value('wineSpendings', _leading_number_pattern, single_space=True)
+    variables['wineConsumptionPerHour'] = int(wine.group(0)) if wine else getWineConsumptionPerHour(html)
+
+    tradegood = value('producedTradegood', _tradegood_pattern, single_space=True, comma=True)
+    variables['producedTradegood'] = int(tradegood.group(1)) if tradegood else extract_tradegood(html)
+
+    production = value('tradegoodProduction', _production_pattern, single_space=True, comma=True)
+    variables['tradegoodProductionPerSecond'] = Decimal(production.group(0)) if production \
+        else extract_tradegood_production(html)
+    production = value('resourceProduction', _production_pattern, single_space=True, comma=True)
+    variables['resourceProductionPerSeconds'] = Decimal(production.group(0)) if production \
+        else extract_resource_production(html)
+
+    variables['freeCitizens'] = parse_int(_free_citizens_pattern.search(html).group(1))
+    variables['population'] = parse_int(_population_pattern.search(html).group(1))
+    return variables
+
+
 def getCity(html):
     """This function uses the ``html`` passed to it as a string to extract, parse and return a City object
     Parameters
@@ -161,8 +248,7 @@ def getCity(html):
         this function returns a json parsed City object. For more information about this object refer to the github wiki page of Ikabot.
     """
 
-    city = re.search(r'"updateBackgroundData",\s?([\s\S]*?)\],\["updateTemplateData"', html).group(1)
-    city = json.loads(city, strict=False)
+    city = extract_background_data(html)
 
     city['ownerName'] = decodeUnicodeEscape(city.pop('ownerName'))
     city['x'] = int(city['islandXCoord'])
@@ -190,20 +276,21 @@ def getCity(html):
 
     city['id'] = str(city['id'])
     city['isOwnCity'] = True
-    city['availableResources'] = getAvailableResources(html, num=True)
-    city['storageCapacity'] = getWarehouseCapacity(html)
-    city['freeCitizens'] = getFreeCitizens(html)
-    city['population'] = getPopulation(html)
-    city['wineConsumptionPerHour'] = getWineConsumptionPerHour(html)
-    city['resourcesListedForSale'] = getResourcesListedForSale(html)
+    variables = extract_city_variables(html)
+    city['availableResources'] = variables['availableResources']
+    city['storageCapacity'] = variables['storageCapacity']
+    city['freeCitizens'] = variables['freeCitizens']
+    city['population'] = variables['population']
+    city['wineConsumptionPerHour'] = variables['wineConsumptionPerHour']
+    city['resourcesListedForSale'] = variables['resourcesListedForSale']
     city['freeSpaceForResources'] = []
     for i in range(5):
         city['freeSpaceForResources'].append(city['storageCapacity'] - city['availableResources'][i] - city['resourcesListedForSale'][i])
 
-    city['producedTradegood'] = extract_tradegood(html)
+    city['producedTradegood'] = variables['producedTradegood']
     city['tradegood'] = city['producedTradegood']
-    city['tradegoodProductionPerSecond'] = extract_tradegood_production(html)
-    city['resourceProductionPerSeconds'] = extract_resource_production(html)
+    city['tradegoodProductionPerSecond'] = variables['tradegoodProductionPerSecond']
+    city['resourceProductionPerSeconds'] = variables['resourceProductionPerSeconds']
 
     production_per_second = [0] * len(city['availableResources'])
     production_per_second[0] = city['resourceProductionPerSeconds']
@@ -214,3 +301,41 @@ def getCity(html):
     city['productionPerHour'] = [int(r*SECONDS_IN_HOUR) for r in production_per_second]
 
     return city
+
+
+def get_city(ikariam_service, city_id, max_age=None, select=False):
+    """
+    Returns the parsed city, reusing the one parsed in the last few seconds. The parsed cities are forgotten when a
+    write action (transport, upgrade, donation...) is sent for them. Getting the page of a city also selects it on
+    the server, a reused one doesn't: a caller which sends a write action for the city next must pass select or call
+    changeCurrentCity before the write
+    :param ikariam_service: ikabot.web.ikariamService.IkariamService
+    :param city_id: int|str
+    :param max_age: None/float -> how old the parsed city can be, the max_age of the cache by default
+    :param select: bool -> the city must be the current city on the server; the parsed city is only reused while the
+    tracked current city is this one
+    :return: dict
+    """
+    city = ikariam_service.parsed_cache.get('city', city_id, max_age)
+    if select and str(ikariam_service.account_state.get('current_city_id', float('inf'))) != str(city_id):
+        city = None
+    if city is None:
+        city = getCity(ikariam_service.get(city_url + str(city_id)))
+        ikariam_service.parsed_cache.put('city', city_id, city)
+        citySnapshots.record_city(getattr(ikariam_service, 'db', None), city)
+    return city
+
+
+def get_island(ikariam_service, island_id, max_age=None):
+    """
+    Returns the parsed island, reusing the one parsed in the last few seconds
+    :param ikariam_service: ikabot.web.ikariamService.IkariamService
+    :param island_id: int|str
+    :param max_age: None/float -> how old the parsed island can be, the max_age of the cache by default
+    :return: dict
+    """
+    island = ikariam_service.parsed_cache.get('island', island_id, max_age)
+    if island is None:
+        island = getIsland(ikariam_service.get(island_url + str(island_id)))
+        ikariam_service.parsed_cache.put('island', island_id, island)
+    return island
@@ -10,7 +10,7 @@ from typing import Union
 
 import psutil
 
-from ikabot.config import isWindows
+from ikabot import config
 from ikabot.helpers.database import Database
 from ikabot.helpers.gui import Colours, daysHoursMinutes, formatTimestamp, printTable
 
@@ -44,22 +44,34 @@ class ProcessStatus:
         return Colours.Text.RESET
 
 
+# the processes which are only shown for a while before they are deleted
+_finished_statuses = [
+    ProcessStatus.DONE,
+    ProcessStatus.ZOMBIE,
+    ProcessStatus.TERMINATED,
+    ProcessStatus.ERROR,
+    ProcessStatus.FORCE_KILLED
+]
+
+
 class _ProcessSpecialAction(Enum):
     SET_DELETION_TIME = 'set-deletion-time'
     SET_TERMINATED_STATUS = 'set-terminated-status'
     HAS_DIFFERENT_NAME = 'has-different-name'
     SET_ZOMBIE = 'set-zombie'
+    SET_CREATE_TIME = 'set-create-time'
     HAS_EXPIRED_SHOWTIME = 'do-delete'
 
 
-def _determine_process_special_action(process: dict, ika_process_name: str) -> Union[_ProcessSpecialAction, None]:
-    if process['status'] in [
-        ProcessStatus.DONE,
-        ProcessStatus.ZOMBIE,
-        ProcessStatus.TERMINATED,
-        ProcessStatus.ERROR,
-        ProcessStatus.FORCE_KILLED
-    ]:
+def _determine_process_special_action(process: dict, ika_process_name: str,
+                                      running_process: Union[dict, None]) -> Union[_ProcessSpecialAction, None]:
+    """
+    :param process: dict -> row of the process table
+    :param ika_process_name: str -> name of the ikabot processes
+    :param running_process: dict/None -> the running process with the pid of the row, see _get_running_processes
+    :return: _ProcessSpecialAction/None
+    """
+    if process['status'] in _finished_statuses:
         next_action_time = process.get('nextActionTime', None)
         if next_action_time is None:
             return _ProcessSpecialAction.SET_DELETION_TIME
@@ -67,26 +79,49 @@ def _determine_process_special_action(process: dict, ika_process_name: str) -> U
             return _ProcessSpecialAction.HAS_EXPIRED_SHOWTIME
         return None
 
-    try:
-        proc = psutil.Process(pid=process['pid'])
-
-        # check if the process is not zombie
-        # windows doesn't support the status method
-        if isWindows or proc.status() != 'zombie':
-            if proc.name() != ika_process_name:
-                # not the same name, so probably restarted the system
-                return _ProcessSpecialAction.HAS_DIFFERENT_NAME
-        else:
-            # the process is zombie
-            if process['status'] != ProcessStatus.ZOMBIE:
-                return _ProcessSpecialAction.SET_ZOMBIE
-
-    except psutil.NoSuchProcess:
+    if running_process is None:
         return _ProcessSpecialAction.SET_TERMINATED_STATUS
 
+    create_time = process.get('createTime', None)
+    running_create_time = running_process['create_time']
+    if create_time is not None and running_create_time is not None and abs(running_create_time - create_time) > 1:
+        last_action_time = process.get('lastActionTime', None)
+        if last_action_time is None or last_action_time < running_create_time:
+            # the row was written before the running process started: another process got the pid of the dead one
+            return _ProcessSpecialAction.SET_TERMINATED_STATUS
+        # the running process has written the row, only its createTime is stale
+        return _ProcessSpecialAction.SET_CREATE_TIME
+
+    # the status is None where psutil can't read it
+    if running_process['status'] == psutil.STATUS_ZOMBIE:
+        if process['status'] != ProcessStatus.ZOMBIE:
+            return _ProcessSpecialAction.SET_ZOMBIE
+    elif running_process['name'] is not None and running_process['name'] != ika_process_name:
+        # not the same name, so probably restarted the system. None is a name which psutil can't read
+        return _ProcessSpecialAction.HAS_DIFFERENT_NAME
+
     return None
 
 
+def _get_running_processes():
+    """
+    Takes a snapshot of all the running processes at once, instead of asking for every process separately
+    :return: dict[int, dict] -> pid -> pid, name, status and create_time of the process
+    """
+    return {p.info['pid']: p.info for p in psutil.process_iter(['pid', 'name', 'status', 'create_time'])}
+
+
+def _get_create_time(pid):
+    """
+    :param pid: int
+    :return: float/None -> start time of the process, None if it is not running
+    """
+    try:
+        return psutil.Process(pid).create_time()
+    except psutil.Error:
+        return None
+
+
 class IkabotProcessListManager:
     def __init__(self, db: Database):
         """
@@ -94,6 +129,7 @@ class IkabotProcessListManager:
         :param db: ikabot.helpers.database.Database
         """
         self.__db = db
+        self.__last_compaction = None
 
     def __get_processes(self, filters=None):
         """
@@ -105,10 +141,13 @@ class IkabotProcessListManager:
 
         # check it's still running
         running_ikabot_processes = []
-        ika_process_name = psutil.Process(pid=os.getpid()).name()
+        running_processes = _get_running_processes()
+        own_process = running_processes.get(os.getpid(), None)
+        ika_process_name = own_process['name'] if own_process else psutil.Process(pid=os.getpid()).name()
         deletion_time = time.time() + 30
         for process in process_list:
-            action = _determine_process_special_action(process, ika_process_name)
+            action = _determine_process_special_action(process, ika_process_name,
+                                                       running_processes.get(process['pid'], None))
 
             if action in [_ProcessSpecialAction.HAS_DIFFERENT_NAME, _ProcessSpecialAction.HAS_EXPIRED_SHOWTIME]:
                 logging.info('Deleting process: reason=%s, process=%s', action.value, process)
@@ -123,6 +162,9 @@ class IkabotProcessListManager:
                 logging.info('Found process zombie. Setting to zombie %s', process)
                 process['status'] = ProcessStatus.ZOMBIE
                 self.__db.set_process(process)
+            elif action == _ProcessSpecialAction.SET_CREATE_TIME:
+                process['createTime'] = running_processes[process['pid']]['create_time']
+                self.__db.update_process(process['pid'], {'createTime': process['createTime']})
             elif action == _ProcessSpecialAction.SET_DELETION_TIME:
                 logging.info('Setting deletion time for process: %s', process)
                 process['nextActionTime'] = deletion_time
@@ -134,46 +176,54 @@ class IkabotProcessListManager:
 
     def get_process_list(self, filters=None):
         """
-        Returns processes as list with the applied filter
+        Returns processes as list with the applied filter. The processes which are not running anymore are marked
+        or deleted on the way, so this is where the table is reconciled with the running processes (e.g. on every
+        refresh of the menu), not on the writes of the bots
         :param filters: list[column, relation, value]
         :return: list[dict[]]
         """
         return self.__get_processes(filters)
 
-    def upsert_process(self, process):
+    def compact(self, interval=None):
+        """
+        Deletes the expired processes in one statement and optimizes the database, at most once every interval
+        seconds. Called on the refresh of the menu
+        :param interval: None/float -> seconds between the compactions; the dbCompactionInterval parameter by default
+        :return: bool -> whether the compaction was done
         """
-        Insert or updates process data.
+        if interval is None:
+            interval = float(config.application_params.get('dbCompactionInterval', 60 * 60))
+        if self.__last_compaction is not None and time.time() - self.__last_compaction < interval:
+            return False
+        self.__last_compaction = time.time()
+        deleted = self.__db.delete_expired_processes(_finished_statuses)
+        self.__db.optimize()
+        logging.info('Compacted the database; deleted processes: %d', deleted)
+        return True
+
+    def upsert_process(self, process, batched=False):
+        """
+        Insert or updates process data. Only the given columns are written, the process is not read, so it costs
+        the same no matter how many processes there are
         :param process: dict[] -> process to update
+        :param batched: bool -> the update is only a heartbeat, which can be committed later with the next ones
         :return:
         """
         _pid = process.get('pid', os.getpid())
+        _values = {k: v for k, v in process.items() if k != 'pid'}
+        _values['lastActionTime'] = time.time()
 
-        _stored_process = self.__get_processes(filters=[['pid', '==', _pid]])
-        if len(_stored_process) > 0:
-            _stored_process = _stored_process[0]
-        else:
-            _stored_process = {
-                'pid': _pid
-            }
-
-        # Merge with old data
-        _stored_process.update(process)
-        _stored_process['lastActionTime'] = time.time()
-
-        # Save
-        self.__db.set_process(_stored_process)
+        if _values.get('status', None) == ProcessStatus.INITIALIZED \
+                or not self.__db.update_process(_pid, _values, batched=batched):
+            # first write of the process, which replaces the row of a dead process that had the same pid
+            self.__db.set_process(dict(_values, pid=_pid, createTime=_get_create_time(_pid)))
 
         # Print process
         logging.info(
-            "updateProcess: %s | %s | %s | next: %s | obj: %s | city: %s | %s",
-            _stored_process.get('pid', '-'),
-            _stored_process.get('action', '-'),
-            _stored_process.get('status', '-'),
-            '-' if _stored_process.get('nextActionTime', None) is None else formatTimestamp(
-                _stored_process['nextActionTime']),
-            _stored_process.get('objective', '-'),
-            _stored_process.get('targetCity', '-'),
-            _stored_process.get('info', '-'),
+            "updateProcess: %s | %s",
+            _pid,
+            ' | '.join('{}: {}'.format(k, formatTimestamp(v) if k.endswith('Time') and v is not None else v)
+                       for k, v in _values.items() if k != 'lastActionTime'),
         )
 
     def print_proces_table(self, process_list=None, add_process_numbers=False):
@@ -0,0 +1,117 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Json with the fastest available library: orjson or ujson when installed, the json module otherwise. The
+jsonBackend parameter (auto/orjson/ujson/json) chooses the library. The fast library reads the document first, and
+only a document which it rejects (control characters with strict=False, NaN, ...) is read again by the json module.
+The differences with the json module: the versions of orjson which don't reject the integers out of the 64 bit range
+read them as floats, orjson writes NaN and infinity as null, and ujson accepts control characters in the strings even
+with strict=True.
+"""
+import json
+
+from ikabot import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+_backends = {}
+
+
+def _json_loads(data, strict):
+    return json.loads(data, strict=strict)
+
+
+def _json_dumps(obj, default):
+    return json.dumps(obj, default=default).encode('utf-8')
+
+
+_backends['json'] = (_json_loads, _json_dumps)
+
+if orjson is not None:
+    def _orjson_loads(data, strict):
+        # orjson is always strict, the documents with control characters are handled by the fallback
+        return orjson.loads(data)
+
+    def _orjson_dumps(obj, default):
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+    _backends['orjson'] = (_orjson_loads, _orjson_dumps)
+
+if ujson is not None:
+    def _ujson_loads(data, strict):
+        # ujson accepts the control characters in the strings like strict=False, the valid documents are the same
+        return ujson.loads(data)
+
+    def _ujson_dumps(obj, default):
+        return ujson.dumps(obj, default=default, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+
+    _backends['ujson'] = (_ujson_loads, _ujson_dumps)
+
+_backend = None
+
+
+def get_backend():
+    """
+    :return: str -> name of the library in use
+    """
+    global _backend
+    if _backend is None:
+        set_backend(config.application_params.get('jsonBackend', 'auto'))
+    return _backend
+
+
+def set_backend(name):
+    """
+    :param name: str -> auto/orjson/ujson/json; auto picks the fastest installed library
+    :return: str -> name of the library in use, json when the requested one is not installed
+    """
+    global _backend
+    if name == 'auto':
+        name = next((n for n in ('orjson', 'ujson') if n in _backends), 'json')
+    _backend = name if name in _backends else 'json'
+    return _backend
+
+
+def loads(data, strict=True):
+    """
+    :param data: str/bytes
+    :param strict: bool -> same as the strict parameter of json.loads
+    :return: object
+    """
+    backend = get_backend()
+    if backend != 'json':
+        try:
+            return _backends[backend][0](data, strict)
+        except (ValueError, OverflowError):
+            # orjson.JSONDecodeError and ujson.JSONDecodeError are ValueErrors
+            pass
+    return json.loads(data, strict=strict)
+
+
+def dumps_bytes(obj, default=None):
+    """
+    :param obj: object
+    :param default: None/callable(object) -> same as the default parameter of json.dumps
+    :return: bytes -> utf-8 json; compact when a fast library is used
+    """
+    try:
+        return _backends[get_backend()][1](obj, default)
+    except (TypeError, ValueError, OverflowError):
+        return _json_dumps(obj, default)
+
+
+def dumps(obj, default=None):
+    """
+    :param obj: object
+    :param default: None/callable(object) -> same as the default parameter of json.dumps
+    :return: str
+    """
+    return dumps_bytes(obj, default).decode('utf-8')
@@ -2,11 +2,10 @@
 # -*- coding: utf-8 -*-
 
 import re
-import json
 
-from ikabot.config import actionRequest, city_url
-from ikabot.helpers.getJson import getCity
-from ikabot.helpers.citiesAndIslands import getIdsOfCities
+from ikabot.config import actionRequest
+from ikabot.helpers.citiesAndIslands import get_cities, getIdsOfCities
+from ikabot.helpers import jsonCodec
 from bs4 import BeautifulSoup
 
 
@@ -22,9 +21,7 @@ def getCommercialCities(session):
     """
     cities_ids = getIdsOfCities(session)[0]
     commercial_cities = []
-    for city_id in cities_ids:
-        html = session.get(city_url + city_id)
-        city = getCity(html)
+    for city in get_cities(session, cities_ids):
         for building in city['position']:
             if building['building'] == 'branchOffice':
                 city['marketPosition'] = building['position']
@@ -45,7 +42,7 @@ def getMarketHtml(session, city):
     """
     url = 'view=branchOffice&cityId={}&position={:d}&currentCityId={}&backgroundView=city&actionRequest={}&ajax=1'.format(city['id'], city['marketPosition'], city['id'], actionRequest)
     data = session.post(url)
-    json_data = json.loads(data, strict=False)
+    json_data = jsonCodec.loads(data, strict=False)
     return json_data[1][1][1]
 
 
@@ -72,7 +69,7 @@ def getFinances(session, city_id):
     """
     url = 'view=finances&backgroundView=city&currentCityId={}&templateView=finances&actionRequest={}&ajax=1'.format(city_id, actionRequest)
     data = session.post(url)
-    return json.loads(data, strict=False)
+    return jsonCodec.loads(data, strict=False)
 
 
 def getGold(session, city_id):
@@ -138,4 +135,4 @@ def getMarketInfo(session, city):
               'templateView': 'branchOfficeOwnOffers', 'currentTab': 'tab_branchOfficeOwnOffers',
               'actionRequest': actionRequest, 'ajax': '1'}
     resp = session.post(params=params, noIndex=True)
-    return json.loads(resp, strict=False)[1][1][1]
+    return jsonCodec.loads(resp, strict=False)[1][1][1]
@@ -0,0 +1,213 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+from collections.abc import MutableMapping
+
+from ikabot.config import materials_names
+from ikabot.helpers.gui import decodeUnicodeEscape
+
+
+class _Missing:
+    """
+    Value of the slots whose key is not in the dict
+    """
+
+    def __repr__(self):
+        return 'MISSING'
+
+    def __reduce__(self):
+        return 'MISSING'  # copies and pickles are the same object
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+MISSING = _Missing()
+
+
+class Model(MutableMapping):
+    """
+    Compact replacement of the dicts of the game objects, which behaves like the dict it was made from. The usual
+    keys are kept in slots instead of a dict per object, the keys which can be computed from the others are not kept
+    at all, and the unusual keys go to a small dict which is created only when needed.
+    """
+    __slots__ = ('_extra',)
+
+    # keys kept in slots, in the order of the original dict
+    _fields = ()
+    # key -> function(model) which computes it, returning MISSING when the original dict doesn't have the key
+    _derived = {}
+
+    def __init__(self, data=None, **kwargs):
+        self._extra = None
+        for field in self._fields:
+            object.__setattr__(self, field, MISSING)
+        for key, value in dict(data or {}, **kwargs).items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        :param data: dict
+        :return: Model -> equal to the dict
+        """
+        model = cls()
+        derived = []
+        for key, value in data.items():
+            if key in cls._derived:
+                derived.append((key, value))
+            else:
+                model[key] = value
+        for key, value in derived:
+            computed = model._compute(key)
+            if computed is MISSING or type(computed) is not type(value) or computed != value:
+                model[key] = value
+        # the keys which the dict doesn't have must not be computed
+        for key in cls._derived:
+            if key not in data and model._compute(key) is not MISSING:
+                model[key] = MISSING
+        return model
+
+    def _compute(self, key):
+        try:
+            return self._derived[key](self)
+        except (TypeError, KeyError, IndexError, AttributeError):
+            return MISSING
+
+    def __getitem__(self, key):
+        if self._extra is not None and key in self._extra:
+            value = self._extra[key]
+        elif key in self._fields:
+            value = getattr(self, key)
+        elif key in self._derived:
+            value = self._compute(key)
+        else:
+            value = MISSING
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._fields and (self._extra is None or key not in self._extra):
+            object.__setattr__(self, key, value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if key in self._fields:
+            object.__setattr__(self, key, MISSING)
+        if self._extra is not None:
+            self._extra.pop(key, None)
+        if key in self._derived and self._compute(key) is not MISSING:
+            self[key] = MISSING  # hide the computed value
+
+    def __iter__(self):
+        for key in self._fields:
+            if getattr(self, key) is not MISSING:
+                yield key
+        for key in self._derived:
+            if key not in self._fields and (self._extra is None or key not in self._extra) \
+                    and self._compute(key) is not MISSING:
+                yield key
+        if self._extra is not None:
+            for key, value in self._extra.items():
+                if value is not MISSING:
+                    yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, dict(self))
+
+    def to_dict(self):
+        """
+        :return: dict -> the original dict, including the computed keys
+        """
+        data = {}
+        for key in self._fields:
+            value = getattr(self, key)
+            if value is not MISSING:
+                data[key] = value
+        extra = self._extra or {}
+        for key in self._derived:
+            if key not in extra:
+                value = self._compute(key)
+                if value is not MISSING:
+                    data[key] = value
+        for key, value in extra.items():
+            if value is not MISSING:
+                data[key] = value
+        return data
+
+
+def to_json_default(obj):
+    """
+    Used as the default of json.dumps, so the models are written as dicts
+    :param obj: object
+    :return: dict
+    """
+    if isinstance(obj, Model):
+        return obj.to_dict()
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(obj).__name__))
+
+
+def _if_city(function):
+    return lambda city: function(city) if city.type == 'city' else MISSING
+
+
+class Building(Model):
+    __slots__ = ('name', 'level', 'isBusy', 'canUpgrade', 'isMaxLevel', 'building', 'groundId', 'completed',
+                 'position', 'type')
+    _fields = __slots__
+    _derived = {
+        'positionAndName': lambda b: MISSING if MISSING in (b.position, b.name) else
+        '[#{}] {}'.format(b.position, b.name),
+    }
+
+
+class City(Model):
+    """
+    A city on an island, as returned by getIsland
+    """
+    __slots__ = ('type', 'name', 'id', 'level', 'ownerId', 'ownerName', 'ownerAllyId', 'ownerAllyTag', 'hasTreaties',
+                 'actions', 'state', 'viewAble', 'infos', 'islandX', 'islandY', 'tradegood', 'islandName', 'player',
+                 'position')
+    _fields = __slots__
+    _derived = {
+        'material': _if_city(lambda c: MISSING if c.tradegood is MISSING else materials_names[c.tradegood]),
+        'cityName': _if_city(lambda c: decodeUnicodeEscape(c.name)),
+        'isNoob': _if_city(lambda c: c.state == 'noob'),
+        'allianceName': _if_city(lambda c: decodeUnicodeEscape(c.ownerAllyTag) if c.ownerAllyId > 0 else MISSING),
+        'alliance': _if_city(lambda c: '' if c.ownerAllyId <= 0 else MISSING),
+        'hasAlliance': _if_city(lambda c: c.ownerAllyId > 0),
+    }
+
+    @classmethod
+    def from_dict(cls, data):
+        city = super().from_dict(data)
+        if isinstance(city.position, list):
+            city.position = [Building.from_dict(b) if isinstance(b, dict) else b for b in city.position]
+        return city
+
+
+class Island(Model):
+    """
+    An island with its cities, as returned by getIsland
+    """
+    __slots__ = ('id', 'name', 'xCoord', 'yCoord', 'tradegood', 'resourceLevel', 'tradegoodLevel', 'wonder',
+                 'wonderName', 'wonderLevel', 'cities', 'tipo', 'x', 'y')
+    _fields = __slots__
+
+    @classmethod
+    def from_dict(cls, data):
+        island = super().from_dict(data)
+        if isinstance(island.cities, list):
+            island.cities = [City.from_dict(c) if isinstance(c, dict) else c for c in island.cities]
+        return island
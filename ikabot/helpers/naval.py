@@ -1,6 +1,5 @@
 #! /usr/bin/env python3
 # -*- coding: utf-8 -*-
-import json
 import re
 from enum import Enum
 
@@ -8,8 +7,14 @@ import bs4
 
 from ikabot.config import actionRequest
 from ikabot.helpers.citiesAndIslands import getCurrentCityId
+from ikabot.helpers import jsonCodec
+from ikabot.helpers.unitStats import get_unit_stat
 from ikabot.web.ikariamService import IkariamService
 
+_info_box_pattern = re.compile(r'<div\s[^>]*class="(?:[^"]*\s)?infoBoxContent[\s"][^>]*>')
+_float_left_pattern = re.compile(r'<div\s[^>]*class="(?:[^"]*\s)?floatleft[\s"][^>]*>')
+_line_break_pattern = re.compile(r'<br\s*/?>')
+
 
 def getAvailableShips(session):
     """Function that returns the total number of free (available) ships
@@ -23,6 +28,9 @@ def getAvailableShips(session):
     ships : int
         number of currently available ships
     """
+    ships = session.account_state.get('free_transporters')
+    if ships is not None:
+        return ships
     html = session.get()
     return int(re.search(r'GlobalMenu_freeTransporters">(\d+)<', html).group(1))
 
@@ -39,6 +47,9 @@ def getTotalShips(session):
     ships : int
         total number of ships the player has
     """
+    ships = session.account_state.get('max_transporters')
+    if ships is not None:
+        return ships
     html = session.get()
     return int(re.search(r'maxTransporters">(\d+)<', html).group(1))
 
@@ -48,7 +59,15 @@ class TransportShip(Enum):
 
 def get_transport_ships_size(ikariam_service: IkariamService, city_id: int, ship: TransportShip):
     """
-    Get the size of the transport ships
+    Get the size of the transport ships. It is stored for the account, so only the first call asks the game
+    """
+    return get_unit_stat(ikariam_service.db, ship.value, 'capacity',
+                         lambda: fetch_transport_ships_size(ikariam_service, city_id, ship))
+
+
+def fetch_transport_ships_size(ikariam_service: IkariamService, city_id: int, ship: TransportShip):
+    """
+    Asks the game for the size of the transport ships
     """
     response = ikariam_service.post(params={
         'view': 'unitdescription',
@@ -60,8 +79,45 @@ def get_transport_ships_size(ikariam_service: IkariamService, city_id: int, ship
         'actionRequest': actionRequest,
         'ajax': 1
     })
-    html = json.loads(response, strict=False)[1][1][1]
-    size = (bs4.BeautifulSoup(html, 'html.parser')
+    html = jsonCodec.loads(response, strict=False)[1][1][1]
+    size = extract_transport_ship_size(html, ship)
+    return int(size.replace(' ', '').replace('.', ''))
+
+
+def extract_transport_ship_size(html, ship: TransportShip):
+    """
+    Finds the capacity in the description of the ship. The markup is walked with plain string searches, the whole
+    document is parsed with BeautifulSoup only if the markup is not the expected one
+    :param html: str -> html of the unit description
+    :param ship: TransportShip
+    :return: str -> the capacity as shown, e.g. 1.500
+    """
+    ship_class = re.compile(r'\sclass="(?:[^"]*\s)?s{}(?:\s[^"]*)?"'.format(ship.value))
+    position = 0
+    while True:
+        position = html.find('id="unit"', position)
+        if position == -1:
+            return _extract_transport_ship_size_from_tree(html, ship)
+        tag = html[html.rfind('<', 0, position):html.find('>', position) + 1]
+        position += 1
+        if tag.startswith('<div') and ship_class.search(tag):
+            break
+
+    # the first div.floatleft of the div.infoBoxContent after the unit
+    for pattern in [_info_box_pattern, _float_left_pattern]:
+        match = pattern.search(html, position)
+        if match is None:
+            return _extract_transport_ship_size_from_tree(html, ship)
+        position = match.end()
+    end = html.find('</div>', position)
+    lines = _line_break_pattern.split(html[position:end]) if end != -1 else []
+    if len(lines) < 2 or '</span>' not in lines[-2]:
+        return _extract_transport_ship_size_from_tree(html, ship)
+    return lines[-2].split('</span>')[1].strip()
+
+
+def _extract_transport_ship_size_from_tree(html, ship: TransportShip):
+    return (bs4.BeautifulSoup(html, 'html.parser')
             .find('div', {'id': 'unit', 'class': 's{}'.format(ship.value)})
             .parent
             .find('div', {'class': 'infoBoxContent'})
@@ -70,8 +126,7 @@ def get_transport_ships_size(ikariam_service: IkariamService, city_id: int, ship
             .split('<br/>')[-2]
             .split("</span>")[1]
             .strip()
-    )
-    return int(size.replace(' ', '').replace('.', ''))
+            )
 
 
 def get_military_and_see_movements(ikariam_service, city_id=None):
@@ -95,6 +150,5 @@ def get_military_and_see_movements(ikariam_service, city_id=None):
         'ajax': 1
     }
 
-    resp = ikariam_service.post(params=query)
-    resp = json.loads(resp, strict=False)
+    resp = ikariam_service.post(params=query, parseJson=True)
     return resp[1][1][2]['viewScriptParams']['militaryAndFleetMovements']
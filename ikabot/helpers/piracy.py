@@ -1,9 +1,9 @@
-import json
 import logging
 from typing import Union
 
 from ikabot.config import city_url, actionRequest
 from ikabot.helpers.buildings import find_city_with_the_biggest_building
+from ikabot.helpers import jsonCodec
 from ikabot.web.ikariamService import IkariamService
 
 
@@ -25,9 +25,9 @@ def getPiracyTemplateData(session, city_id):
       'ajax': 1
     })
 
-    _template_data = json.loads(html, strict=False)[2][1]
+    _template_data = jsonCodec.loads(html, strict=False)[2][1]
     _template_data = _template_data['load_js']['params']
-    return json.loads(_template_data, strict=False)
+    return jsonCodec.loads(_template_data, strict=False)
 
 
 def findCityWithTheBiggestPiracyFortress(ikariam_service: IkariamService) -> Union[dict, None]:
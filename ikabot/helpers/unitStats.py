@@ -0,0 +1,58 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+import time
+
+from ikabot import config
+
+# key of the storage table which keeps the stats of the units of the account
+UNIT_STATS_KEY = 'unitStats'
+
+# the writes which can change the stats of the units
+_unit_stats_writes = [
+    ('Advisor', 'doResearch'),
+]
+
+
+def get_unit_stat(db, unit_id, stat, load, max_age=None):
+    """
+    Returns a stat of a unit (e.g. the capacity of a ship) from the storage of the account and asks the game only if
+    we don't know it. The stats change only with the research, which is also done in the browser, so they are asked
+    again after max_age seconds anyway
+    :param db: ikabot.helpers.database.Database
+    :param unit_id: int -> id of the unit or the ship
+    :param stat: str -> name of the stat
+    :param load: callable() -> asks the game for the stat
+    :param max_age: None/float -> seconds for which a stored stat is used; the unitStatsMaxAge parameter by default
+    :return: object
+    """
+    if max_age is None:
+        max_age = float(config.application_params.get('unitStatsMaxAge', 24 * 60 * 60))
+    unit_id = str(unit_id)
+    stats = db.get_stored_value(UNIT_STATS_KEY) or {}
+    stored = stats.get(unit_id, {}).get(stat, None)
+    if stored is not None and time.time() - stored['time'] <= max_age:
+        return stored['value']
+
+    value = load()
+    stats = db.get_stored_value(UNIT_STATS_KEY) or {}
+    stats.setdefault(unit_id, {})[stat] = {'value': value, 'time': time.time()}
+    db.store_value(UNIT_STATS_KEY, stats)
+    return value
+
+
+def invalidate_unit_stats(db):
+    """
+    Forgets the stored stats of the units, e.g. after a research
+    :param db: ikabot.helpers.database.Database
+    :return: void
+    """
+    if db.get_stored_value(UNIT_STATS_KEY):
+        db.store_value(UNIT_STATS_KEY, {})
+
+
+def changes_unit_stats(data):
+    """
+    :param data: dict -> parameters of a post request
+    :return: bool -> whether the request can change the stats of the units
+    """
+    return (data.get('action', None), data.get('function', None)) in _unit_stats_writes
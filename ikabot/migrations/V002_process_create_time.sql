@@ -0,0 +1,4 @@
+-- depends: V001_initial
+
+-- start time of the process, so a new process which got the pid of a dead one is not taken for it
+ALTER TABLE processes ADD COLUMN createTime REAL;
@@ -0,0 +1,6 @@
+-- depends: V002_process_create_time
+
+-- the filters of get_processes
+CREATE INDEX processes_status ON processes (botName, status);
+CREATE INDEX processes_target_city ON processes (botName, targetCity);
+CREATE INDEX processes_next_action_time ON processes (botName, nextActionTime);
@@ -0,0 +1,13 @@
+-- depends: V003_process_indexes
+
+-- state of the cities as parsed by the bots, one row per city and time bucket of each tier
+CREATE TABLE citySnapshots
+(
+    botName    VARCHAR(16) NOT NULL,
+    cityId     INTEGER     NOT NULL,
+    tier       INTEGER     NOT NULL,
+    time       INTEGER     NOT NULL,
+    recordedAt TIMESTAMP   NOT NULL,
+    data       TEXT        NOT NULL,
+    PRIMARY KEY (botName, cityId, tier, time)
+) WITHOUT ROWID;
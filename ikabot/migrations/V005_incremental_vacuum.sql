@@ -0,0 +1,4 @@
+-- depends: V004_city_snapshots
+
+-- the database is switched to incremental vacuum by migrate.switch_to_incremental_vacuum after the migrations: the
+-- switch needs a full vacuum, which fails while another bot is writing, so it can't be a migration
@@ -0,0 +1,27 @@
+-- depends: V005_incremental_vacuum
+
+-- version of the storage rows (cookies, proxy...) of every bot, bumped by every write of the rows, so the sessions
+-- read them again only when they change and not on every write of the database
+CREATE TABLE storageVersions
+(
+    botName VARCHAR(16) NOT NULL PRIMARY KEY,
+    version INTEGER     NOT NULL
+);
+
+CREATE TRIGGER storage_inserted AFTER INSERT ON storage
+BEGIN
+    INSERT INTO storageVersions (botName, version) VALUES (NEW.botName, 1)
+    ON CONFLICT (botName) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER storage_updated AFTER UPDATE ON storage
+BEGIN
+    INSERT INTO storageVersions (botName, version) VALUES (NEW.botName, 1)
+    ON CONFLICT (botName) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER storage_deleted AFTER DELETE ON storage
+BEGIN
+    INSERT INTO storageVersions (botName, version) VALUES (OLD.botName, 1)
+    ON CONFLICT (botName) DO UPDATE SET version = version + 1;
+END;
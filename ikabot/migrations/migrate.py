@@ -1,6 +1,9 @@
 import logging
 import os
+import sqlite3
+from contextlib import closing
 
+import psutil
 from yoyo import get_backend, read_migrations
 
 from ikabot import config
@@ -21,3 +24,29 @@ def apply_migrations():
 
     print('DB migrations applied')
     logging.info('DB migrations applied')
+    switch_to_incremental_vacuum()
+
+
+def switch_to_incremental_vacuum():
+    """
+    Switches the database to incremental vacuum, so Database.optimize can give the free pages back without a full
+    vacuum. The switch itself needs one full vacuum, which would make the running bots wait for as long as it takes,
+    so it's deferred to the first start without running bots, and to the next start if another process is writing
+    :return: bool -> whether the database uses incremental vacuum
+    """
+    with closing(sqlite3.connect(config.DB_FILE, timeout=0, isolation_level=None)) as conn:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            return True
+        pids = [row[0] for row in conn.execute('SELECT pid FROM processes')]
+        if any(pid != os.getpid() and psutil.pid_exists(pid) for pid in pids):
+            logging.info('Bots are running, the database will be switched to incremental vacuum at the next start')
+            return False
+        try:
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+        except sqlite3.OperationalError as e:
+            # SQLITE_BUSY, another process is writing
+            logging.warning('The database will be switched to incremental vacuum at the next start: %s', e)
+            return False
+    logging.info('Switched the database to incremental vacuum')
+    return True
@@ -0,0 +1,111 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+import time
+
+# the values shown in the header of the html pages
+_html_patterns = {
+    'free_transporters': re.compile(r'GlobalMenu_freeTransporters">(\d+)<'),
+    'max_transporters': re.compile(r'maxTransporters">(\d+)<'),
+    'current_city_id': re.compile(r'currentCityId:\s(\d+),'),
+}
+
+# the values of the headerData of the ajax responses
+_ajax_patterns = {
+    'free_transporters': re.compile(r'"freeTransporters":"?(\d+)'),
+    'max_transporters': re.compile(r'"maxTransporters":"?(\d+)'),
+    'gold': re.compile(r'"gold":"?(\d+)'),
+    'current_city_id': re.compile(r'"selectedCity":"city_(\d+)"'),
+}
+
+# (name, key, parse) of the values of the headerData of the parsed ajax responses
+_header_fields = [
+    ('free_transporters', 'freeTransporters', int),
+    ('max_transporters', 'maxTransporters', int),
+    ('gold', 'gold', lambda gold: int(str(gold).split('.')[0])),
+]
+
+
+class AccountState:
+    """
+    Values of the account which the game sends with almost every response (free transporters, gold, current
+    city...). They are updated from the responses we already receive, so the helpers don't need an extra request
+    just to read one number. A value older than max_age seconds is considered stale, because the bots of the other
+    processes keep changing it.
+    """
+
+    def __init__(self, max_age=10):
+        """
+        :param max_age: float -> seconds for which a value is considered fresh
+        """
+        self.max_age = max_age
+        self.__values = {}
+
+    def set(self, name, value):
+        self.__values[name] = (value, time.time())
+
+    def get(self, name, max_age=None):
+        """
+        :param name: str -> free_transporters/max_transporters/gold/current_city_id/current_resources
+        :param max_age: None/float -> overrides the max_age of the state
+        :return: object/None -> the value or None if we don't have a fresh one
+        """
+        if name not in self.__values:
+            return None
+        value, updated = self.__values[name]
+        if time.time() - updated > (self.max_age if max_age is None else max_age):
+            return None
+        return value
+
+    def invalidate(self, *names):
+        """
+        :param names: str -> values to forget; all of them when none is given
+        :return: void
+        """
+        if len(names) == 0:
+            self.__values.clear()
+        for name in names:
+            self.__values.pop(name, None)
+
+    def update_from_text(self, text):
+        """
+        Updates the state from html page or ajax response
+        :param text: str -> response body
+        :return: void
+        """
+        if not text:
+            return
+        patterns = _ajax_patterns if text.lstrip()[:1] == '[' else _html_patterns
+        for name, pattern in patterns.items():
+            match = pattern.search(text)
+            if match is not None:
+                self.set(name, int(match.group(1)))
+
+    def update_from_json(self, data):
+        """
+        Updates the state from parsed ajax response
+        :param data: object -> parsed response body
+        :return: void
+        """
+        if not isinstance(data, list):
+            return
+        for item in data:
+            if not isinstance(item, list) or len(item) < 2 or item[0] != 'updateGlobalData':
+                continue
+            header = item[1].get('headerData', None) if isinstance(item[1], dict) else None
+            if not isinstance(header, dict):
+                continue
+            for name, key, parse in _header_fields:
+                if key not in header:
+                    continue
+                try:
+                    self.set(name, parse(header[key]))
+                except (TypeError, ValueError):
+                    # an unexpected value must not fail the request which brought it, skip it
+                    continue
+            if isinstance(header.get('currentResources', None), dict):
+                self.set('current_resources', dict(header['currentResources']))
+            dropdown = header.get('cityDropdownMenu', None)
+            selected_city = str(dropdown.get('selectedCity', '') if isinstance(dropdown, dict) else '')
+            if selected_city.startswith('city_') and selected_city[len('city_'):].isdigit():
+                self.set('current_city_id', int(selected_city[len('city_'):]))
@@ -0,0 +1,119 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from ikabot import config
+from ikabot.web.session import create_session
+
+
+class AsyncIkariamService:
+    """
+    Concurrent sibling of IkariamService for bulk read-only GET requests (view=city, view=island...). It shares the
+    cookies, headers and proxy of the synchronous service and sends the requests from a pool of worker threads
+    through one keep-alive connection pool, at most max_concurrency at the same time. Every request takes a token from
+    the account's shared rate limiter, and its success or connection failure is reported to the circuit breaker of the
+    server, and the cookies set by the responses are merged back into the session of the synchronous service.
+    Responses with an expired session or a failed connection are re-fetched through the synchronous service, which
+    takes care of logging in again. While the requests are replayed or recorded, or the circuit of the server is not
+    closed, the requests are sent one by one through the synchronous service instead.
+    """
+
+    def __init__(self, ikariam_service, max_concurrency=None):
+        """
+        :param ikariam_service: ikabot.web.ikariamService.IkariamService
+        :param max_concurrency: int/None -> how many requests can be in flight at the same time
+        """
+        self.ikariam_service = ikariam_service
+        self.max_concurrency = int(max_concurrency or config.application_params.get('asyncMaxConcurrency', 6))
+
+    def __create_session(self):
+        session = create_session(pool_connections=1, pool_maxsize=self.max_concurrency)
+        session.headers.clear()
+        session.headers.update(self.ikariam_service.s.headers)
+        session.proxies.update(self.ikariam_service.s.proxies)
+        session.cookies.update(self.ikariam_service.s.cookies)
+        return session
+
+    def __fetch(self, session, url):
+        """
+        Blocking fetch, executed in the worker threads
+        :return: (requests.Response/None, str/None) -> the response and its html, no response if the connection
+        failed, no html if we need to retry it with the synchronous service
+        """
+        self.ikariam_service.rate_limiter.acquire(self.ikariam_service.request_priority)
+        try:
+            response = session.get(self.ikariam_service.urlBase + url, verify=config.do_ssl_verify)
+            html = response.text
+        except requests.exceptions.RequestException as e:
+            logging.warning('Bulk GET failed, will retry it: url=%s, error=%s', url, e)
+            return None, None
+
+        if self.ikariam_service.isExpired(html):
+            logging.info('Bulk GET got expired session, will retry it: url=%s', url)
+            return response, None
+        return response, html
+
+    def __get_sequentially(self, urls, progress):
+        htmls = []
+        for url in urls:
+            htmls.append(self.ikariam_service.get(url))
+            if progress is not None:
+                progress(len(htmls), len(urls))
+        return htmls
+
+    def get_all(self, urls, progress=None):
+        """
+        Sends GET requests for all the urls concurrently and returns the responses in the same order
+        :param urls: list[str] -> urls to be appended to the urlBase of the service
+        :param progress: None/callable(done, total) -> called every time a request completes
+        :return: list[str] -> html responses
+        """
+        if len(urls) == 0:
+            return []
+
+        if not self.ikariam_service.is_bulk_get_allowed():
+            logging.debug('Sequential GET of %d urls', len(urls))
+            return self.__get_sequentially(urls, progress)
+
+        logging.debug('Bulk GET of %d urls', len(urls))
+        htmls = [None] * len(urls)
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor, self.__create_session() as session:
+            futures = {executor.submit(self.__fetch, session, url): i for i, url in enumerate(urls)}
+            # the results are registered by this thread, the one of the service
+            for future in as_completed(futures):
+                i = futures[future]
+                if future.cancelled():
+                    continue
+                response, html = future.result()
+                if response is None:
+                    self.ikariam_service.register_bulk_get_failure(self.ikariam_service.urlBase + urls[i])
+                    if not self.ikariam_service.is_bulk_get_allowed():
+                        # the circuit is open, the requests which haven't started wait for it in the synchronous
+                        # service instead
+                        for pending in futures:
+                            pending.cancel()
+                elif html is not None:
+                    self.ikariam_service.register_bulk_get(self.ikariam_service.urlBase + urls[i], response, html)
+                    htmls[i] = html
+                    done += 1
+                    if progress is not None:
+                        progress(done, len(urls))
+            # e.g. a new session id or a refreshed load balancer cookie
+            self.ikariam_service.s.cookies.update(session.cookies)
+
+        # the concurrent requests have rotated the actionRequest token on the server and have selected the cities
+        # in unknown order
+        self.ikariam_service.action_request_token = None
+        self.ikariam_service.account_state.invalidate('current_city_id')
+
+        for i, url in enumerate(urls):
+            if htmls[i] is None:
+                htmls[i] = self.ikariam_service.get(url)
+                done += 1
+                if progress is not None:
+                    progress(done, len(urls))
+        return htmls
@@ -0,0 +1,302 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+import base64
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import socket
+import struct
+import sys
+import threading
+import traceback
+
+from ikabot import config
+from ikabot.web.rateLimiter import RequestPriority
+
+__header_format = '!I'
+__header_size = struct.calcsize(__header_format)
+
+
+def get_gateway_socket_path(bot_name):
+    """
+    :param bot_name: str
+    :return: str -> path of the unix socket of the account's gateway
+    """
+    return '{}.{}.gateway.sock'.format(config.DB_FILE, re.sub(r'\W', '_', bot_name))
+
+
+def is_gateway_supported():
+    return hasattr(socket, 'AF_UNIX')
+
+
+def is_gateway_running(socket_path):
+    """
+    Checks if there is a gateway listening on the socket
+    :param socket_path: str
+    :return: bool
+    """
+    if not is_gateway_supported() or not os.path.exists(socket_path):
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+def _send_message(sock, message):
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(struct.pack(__header_format, len(data)) + data)
+
+
+def _receive_exactly(sock, size):
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+class GatewayError(Exception):
+    """
+    Error of the gateway whose type can't be raised again in the bot
+    """
+
+
+def _rebuild_exception(type_name, message):
+    """
+    Rebuilds the exception raised by the gateway, so the except clauses of the bots catch it like a local one. Only
+    the types of the modules which are already loaded are used
+    :param type_name: str/None -> module and name of the type of the exception
+    :param message: str
+    :return: BaseException
+    """
+    module_name, _, name = (type_name or '').rpartition('.')
+    error_type = getattr(sys.modules.get(module_name, None), name, None)
+    if isinstance(error_type, type) and issubclass(error_type, BaseException):
+        try:
+            return error_type(message)
+        except Exception:
+            pass
+    return GatewayError(message)
+
+
+def _receive_message(sock):
+    header = _receive_exactly(sock, __header_size)
+    if header is None:
+        return None
+    data = _receive_exactly(sock, struct.unpack(__header_format, header)[0])
+    if data is None:
+        return None
+    return json.loads(data)
+
+
+class GatewayResponse:
+    """
+    The part of requests.Response that the bots use when they ask for the full response
+    """
+
+    def __init__(self, status_code, headers, content, encoding):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding or 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+
+class IkariamGatewayServer:
+    """
+    Serves the get/post requests of all the bots of one account through a single IkariamService: one login, one
+    keep-alive connection pool, one actionRequest token and one rate limiter. The connections are read by their own
+    threads, but the requests are executed one at a time by the thread of serve_forever, because the service, its
+    session and its sqlite connection belong to the thread which created them. The waiting requests are executed in
+    the order of their priority, so the requests of the user and the alerts don't wait for the background work.
+    """
+
+    def __init__(self, ikariam_service, socket_path):
+        """
+        :param ikariam_service: ikabot.web.ikariamService.IkariamService
+        :param socket_path: str
+        """
+        self.ikariam_service = ikariam_service
+        self.socket_path = socket_path
+        # (priority, arrival, message, queue of its response)
+        self.__requests = queue.PriorityQueue()
+        self.__arrivals = itertools.count()
+        self.served_requests = 0
+
+    def serve_forever(self):
+        """
+        Executes the requests until shutdown is called, must run in the thread which owns the ikariam service
+        """
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(self.socket_path)
+            os.chmod(self.socket_path, 0o600)
+            server.listen()
+            logging.info('Gateway is listening on %s', self.socket_path)
+            threading.Thread(target=self.__accept_connections, args=(server,), daemon=True).start()
+            while True:
+                _, _, message, responses = self.__requests.get()
+                if message is None:
+                    return
+                responses.put(self.__execute(message))
+
+    def shutdown(self):
+        """
+        Stops serve_forever after the requests which are already waiting
+        """
+        self.__requests.put((float('inf'), next(self.__arrivals), None, None))
+
+    def __accept_connections(self, server):
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return  # the server socket was closed
+            threading.Thread(target=self.__handle_connection, args=(conn,), daemon=True).start()
+
+    def __handle_connection(self, conn):
+        responses = queue.Queue(maxsize=1)
+        with conn:
+            while True:
+                try:
+                    message = _receive_message(conn)
+                    if message is None:
+                        return
+                    priority = RequestPriority[message.get('priority', 'NORMAL')].value
+                    self.__requests.put((priority, next(self.__arrivals), message, responses))
+                    _send_message(conn, responses.get())
+                except OSError:
+                    logging.debug('Gateway client disconnected')
+                    return
+
+    def __execute(self, message):
+        self.served_requests += 1
+        self.ikariam_service.request_priority = RequestPriority[message.get('priority', 'NORMAL')]
+        kwargs = message['kwargs']
+        try:
+            if message['op'] == 'get':
+                result = self.ikariam_service.get(**kwargs)
+                if kwargs.get('fullResponse', False):
+                    result = {
+                        'status': result.status_code,
+                        'headers': dict(result.headers),
+                        'content': base64.b64encode(result.content).decode('ascii'),
+                        'encoding': result.encoding,
+                    }
+            elif message['op'] == 'post':
+                result = self.ikariam_service.post(**kwargs)
+            else:
+                return {'error': 'Unknown operation: {}'.format(message['op'])}
+            return {'result': result}
+        except (Exception, SystemExit) as e:
+            logging.error('Gateway failed to execute %s\n%s', message, traceback.format_exc())
+            return {'error': traceback.format_exc(), 'errorMessage': str(e),
+                    'errorType': '{}.{}'.format(type(e).__module__, type(e).__qualname__)}
+
+
+class GatewayIkariamService:
+    """
+    IkariamService compatible proxy, which sends the get/post requests through the account's gateway. Everything
+    else is delegated to the local service, which is also used when the gateway is not available.
+    """
+
+    def __init__(self, ikariam_service, socket_path):
+        """
+        :param ikariam_service: ikabot.web.ikariamService.IkariamService -> the local service
+        :param socket_path: str
+        """
+        object.__setattr__(self, 'local_service', ikariam_service)
+        object.__setattr__(self, 'socket_path', socket_path)
+        object.__setattr__(self, '_GatewayIkariamService__socket', None)
+        object.__setattr__(self, '_GatewayIkariamService__lock', threading.Lock())
+
+    def __getattr__(self, name):
+        return getattr(self.local_service, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.local_service, name, value)
+
+    def __close_socket(self):
+        if self.__socket is not None:
+            self.__socket.close()
+        object.__setattr__(self, '_GatewayIkariamService__socket', None)
+
+    def __call(self, op, kwargs):
+        """
+        :return: (bool, object) -> is the call served by the gateway and its result
+        """
+        message = {'op': op, 'kwargs': kwargs, 'priority': self.local_service.request_priority.name}
+        with self.__lock:
+            try:
+                if self.__socket is None:
+                    object.__setattr__(self, '_GatewayIkariamService__socket',
+                                       socket.socket(socket.AF_UNIX, socket.SOCK_STREAM))
+                    self.__socket.connect(self.socket_path)
+                _send_message(self.__socket, message)
+                response = _receive_message(self.__socket)
+                if response is None:
+                    raise ConnectionError('Gateway closed the connection')
+            except OSError as e:
+                logging.warning('Gateway is not available, using the local session: %s', e)
+                self.__close_socket()
+                return False, None
+
+        if 'error' in response:
+            logging.debug('Gateway error: %s', response['error'])
+            raise _rebuild_exception(response.get('errorType', None), response.get('errorMessage', response['error']))
+        return True, response['result']
+
+    def __update_account_state(self, result, parse_json):
+        # the gateway has updated its own state, keep ours up to date too
+        if parse_json:
+            self.local_service.account_state.update_from_json(result)
+        else:
+            self.local_service.account_state.update_from_text(result)
+
+    def is_bulk_get_allowed(self):
+        """
+        The concurrent bulk reads would use the local session, the gateway executes them one by one instead
+        :return: bool
+        """
+        return False
+
+    def logout(self):
+        with self.__lock:
+            self.__close_socket()
+        self.local_service.logout()
+
+    def get(self, url='', params={}, ignoreExpire=False, noIndex=False, fullResponse=False, parseJson=False):
+        kwargs = {'url': url, 'params': params, 'ignoreExpire': ignoreExpire, 'noIndex': noIndex,
+                  'fullResponse': fullResponse, 'parseJson': parseJson}
+        served, result = self.__call('get', kwargs)
+        if not served:
+            return self.local_service.get(**kwargs)
+        if fullResponse:
+            return GatewayResponse(result['status'], result['headers'], base64.b64decode(result['content']),
+                                   result['encoding'])
+        self.__update_account_state(result, parseJson)
+        return result
+
+    def post(self, url='', payloadPost={}, params={}, ignoreExpire=False, noIndex=False, parseJson=False):
+        kwargs = {'url': url, 'payloadPost': payloadPost, 'params': params, 'ignoreExpire': ignoreExpire,
+                  'noIndex': noIndex, 'parseJson': parseJson}
+        served, result = self.__call('post', kwargs)
+        if not served:
+            return self.local_service.post(**kwargs)
+        self.local_service.register_write(url, payloadPost, params)
+        self.__update_account_state(result, parseJson)
+        return result
@@ -0,0 +1,186 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+# parameters that change with every request and don't affect the response
+volatile_params = {'actionRequest'}
+
+# response headers worth keeping in the archive
+_kept_headers = ['Content-Type']
+
+
+def _normalize_pairs(pairs):
+    return urlencode(sorted((str(k), str(v)) for k, v in pairs if k not in volatile_params))
+
+
+def normalize_request(method, url, params=None, payload=None):
+    """
+    Builds the archive key of a request. The host, the order of the parameters and the volatile parameters
+    (like the actionRequest token) are ignored, so the same request matches no matter the server or the session.
+    :param method: str -> GET/POST
+    :param url: str -> full url, including the query
+    :param params: dict/None -> query parameters
+    :param payload: dict/None -> form data of a POST request
+    :return: str
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True) + list((params or {}).items())
+    key = '{} {}?{}'.format(method.upper(), parts.path or '/', _normalize_pairs(query))
+    if payload:
+        key += ' ' + _normalize_pairs(payload.items())
+    return key
+
+
+class FixtureNotFoundError(KeyError):
+    pass
+
+
+class FixtureRecorder:
+    """
+    Appends every request/response exchange to a gzip json lines archive. Each response body is written only once,
+    the exchanges refer to it by its digest, so pages that don't change between requests don't bloat the archive.
+    Every write is a separate gzip member appended under a file lock, so the forked bots can record to the same file.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: str -> archive file
+        """
+        self.path = path
+        self.__pid = os.getpid()
+        self.__written_bodies = set()
+
+    def __append(self, records):
+        data = gzip.compress(''.join(json.dumps(record) + '\n' for record in records).encode('utf-8'))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+            os.write(fd, data)
+        finally:
+            os.close(fd)  # closing the descriptor releases the lock
+
+    def write_meta(self, meta):
+        """
+        Stores account data (host, username, server...) that the replay needs instead of logging in
+        :param meta: dict[]
+        :return: void
+        """
+        self.__append([{'meta': meta}])
+
+    def record(self, method, url, params, payload, response):
+        """
+        :param method: str
+        :param url: str
+        :param params: dict/None
+        :param payload: dict/None
+        :param response: requests.Response
+        :return: void
+        """
+        if self.__pid != os.getpid():
+            # we've been forked, the parent has its own list of written bodies
+            self.__pid = os.getpid()
+            self.__written_bodies = set()
+
+        content = response.content or b''
+        digest = hashlib.sha1(content).hexdigest()
+        records = []
+        if digest not in self.__written_bodies:
+            records.append({'digest': digest, 'body': content.decode('utf-8', errors='surrogateescape')})
+            self.__written_bodies.add(digest)
+        records.append({
+            'key': normalize_request(method, url, params, payload),
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in _kept_headers if name in response.headers},
+            'encoding': response.encoding,
+            'elapsed': response.elapsed.total_seconds(),
+            'digest': digest,
+        })
+        try:
+            self.__append(records)
+        except OSError:
+            logging.exception('Failed to record the request into %s', self.path)
+            self.__written_bodies.discard(digest)
+
+
+class FixtureReplayer:
+    """
+    Serves the responses of a recorded archive. A request which was recorded several times gets the recorded
+    responses in order and then keeps getting the last one. The latency is either the recorded one or fixed.
+    """
+
+    def __init__(self, path, latency=None):
+        """
+        :param path: str -> archive written by FixtureRecorder
+        :param latency: None/float -> seconds to wait for every response; None means the recorded latency
+        """
+        self.path = path
+        self.latency = latency
+        self.meta = {}
+        self.exchanges = {}
+        self.__bodies = {}
+        self.__positions = {}
+        self.served = 0
+        self.missing = 0
+        self.__load()
+
+    def __load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as file:
+            for line in file:
+                record = json.loads(line)
+                if 'meta' in record:
+                    self.meta.update(record['meta'])
+                elif 'body' in record:
+                    self.__bodies[record['digest']] = record['body'].encode('utf-8', errors='surrogateescape')
+                else:
+                    self.exchanges.setdefault(record['key'], []).append(record)
+        logging.info('Loaded %d recorded requests from %s', sum(len(e) for e in self.exchanges.values()), self.path)
+
+    def replay(self, method, url, params=None, payload=None):
+        """
+        :param method: str
+        :param url: str
+        :param params: dict/None
+        :param payload: dict/None
+        :return: requests.Response
+        """
+        key = normalize_request(method, url, params, payload)
+        if key not in self.exchanges:
+            self.missing += 1
+            raise FixtureNotFoundError('The request was not recorded: {}'.format(key))
+
+        exchanges = self.exchanges[key]
+        position = self.__positions.get(key, 0)
+        self.__positions[key] = min(position + 1, len(exchanges) - 1)
+        exchange = exchanges[position]
+
+        latency = exchange['elapsed'] if self.latency is None else self.latency
+        if latency > 0:
+            time.sleep(latency)
+        self.served += 1
+
+        response = requests.Response()
+        response.status_code = exchange['status']
+        response.headers = CaseInsensitiveDict(exchange['headers'])
+        response.encoding = exchange['encoding']
+        response.url = url
+        response.elapsed = datetime.timedelta(seconds=latency)
+        response._content = self.__bodies[exchange['digest']]
+        response._content_consumed = True
+        return response
@@ -1,6 +1,6 @@
 #! /usr/bin/env python3
 # -*- coding: utf-8 -*-
-import base64
+import copy
 import getpass
 import json
 import logging
@@ -9,7 +9,8 @@ import random
 import re
 import sys
 import time
-from collections import deque
+from collections import Counter
+from urllib.parse import parse_qsl, urlparse
 
 import requests
 from urllib3.exceptions import InsecureRequestWarning
@@ -17,8 +18,19 @@ from urllib3.exceptions import InsecureRequestWarning
 from ikabot import config
 from ikabot.config import actionRequest, ConnectionError_wait, user_agent
 from ikabot.helpers.getJson import getCity
-from ikabot.helpers.gui import banner, decodeUnicodeEscape, enter
+from ikabot.helpers.gui import banner, decodeUnicodeEscape, enter, formatTimestamp
+from ikabot.helpers.ikabotProcessListManager import IkabotProcessListManager
+from ikabot.helpers.unitStats import changes_unit_stats, invalidate_unit_stats
 from ikabot.helpers.userInput import read
+from ikabot.web.accountState import AccountState
+from ikabot.web.httpFixtures import FixtureRecorder, FixtureReplayer, normalize_request
+from ikabot.web.jsonStream import JsonStreamParser
+from ikabot.web.parsedCache import ParsedCache
+from ikabot.web.rateLimiter import RateLimiter, RequestPriority
+from ikabot.web.requestHistory import RequestHistory, RequestTraceFile
+from ikabot.web.retryPolicy import CircuitBreaker, CircuitState, RetryPolicy
+from ikabot.web.session import create_session, mount_timeout_adapter
+from ikabot.web.singleFlight import SingleFlight
 
 #blackbox tokens
 blackbox_tokens = [ #ch, chi, ffi
@@ -27,20 +39,131 @@ blackbox_tokens = [ #ch, chi, ffi
     'JVqc1fosb5TG-D2yJJMDaI2_BU2yHpH6aNM8YZPF6hxfxSaSBWqPwQQpW43PO6QSfaLUBitdoMX3KYDpV7sqoRQ5a53C9DdcjsADa91MuR5DdafM_kFmmMoRgO9WwidMfq73Zcj2G01_pNYZSXes0QNGeJ3PEjdpmwBum-IkSXut0gRHbJ7QNJnNAzdszQA0baDQAjJixwAwYZT4L2XIADBpzf84aqABNmfKLmab0TKXzwg8oNcPQnesD3XZDD2f1DlrodM0bZLE9htNkLXnGWDPPqURdpvN_Ua0F0VqnMz0QpjhJW6v2P0vcrMBSJTZ_jBgiNYsdbkCQ2ia3QI0ZLIIUZXeH0R2pu1SmAd53EFmmMgPY7vgEkJzqd8PNGaW6lN4qtoCMqraCjpqnM0FN2CFt-crlAZrzkJ1ueobQHKiGIvqH36u0wU1pRh3rAs7YJLV-ixcoNMXSHmix_krUILF6hxOguNGqg5z1TdpnM8AMGPG_DWaygA3bdAyaJ7QATJqntQMbdMKPJ7O_zZuoNMGOZz_Npf9MJbK_TOXzAJllsctZIm77RJEh6zeEHStDnSrDG2eAjJiyPoqXMH5K2SV-2CUzS9om88DaZ_YD0N5r-IXfOFCd6oPRqsMb9QKQqXWBmyfzwFkxwAzZsfsHlB1p-obVIa22w1QgbHlFTpsr-EVOmyv1AY4ac__MpTLAmjMLWCTyv4wYpjJK5DxIYW37lOJve8ihOocTrLkRqzhGH7jRajdEHHWDUKk3RNFq-FGe63gQ6bWCC1fkbboK1CCtOlKet9Fd60Td7AWfKzlG1GJwiiN7k-z40d7tBp8tOkeT4e561Cx50l83kN6rg8_cajhFXiqC2ydzTKT9yhcjfMYSnyh0xY7bZ8DaKACM5b7K4zwJlqQ9lm88SeIvfFTiLwfU4W8IIKzGHzgFHitD0Ci2RJFeK0PQHndDkN2ptc6ngFml8wwkcT1Gkx-o9UYPW-hBT1totYPdNUIbM4DN2qc0wtwodULcagOPnfZD0ip3D5x1Deb_GHG_ziczP5hlcv9NmvMAjhszgM4baPbEEN84gc5a5DCBTZonMr6LWCXy_4yaKDWD0R3qc4AQ2iazC5gwiaJ7iJYvvdZjsYskfIkXZP5Xo_yVYW-IVqOxyiMwfQlWZL0LJHF-16X_TOVyyyPwvIiWbwfWI3uIVi-8yZLfa_UBkl2rOMTSX-x6SFVeqzvFEZ4qtoMP2ydzvsrY7foHEF0teYWO26v5BxKgLnyTHGj1fosb5TG-GOUAXjnX8o8p-BEsitc1glqnNU-pN0VhvQtYIW36Q5Ag7XrH0R2ud4QQnOjyPosUYPG6x1PtPtv2CGLwPlEjPxdwRZf0SBQnu84j_c4kPlhxhNasBx0yTV20Eqg6TulEIToK5ILYs0imOkwlAVcohZ91x2EvQ954SN40Cp7xBpso_RMovNX0CqD2jF34y6FxvpKnQVQpxJgximjEovZHXbfQojiWrw2j7TmKHqrDoLcD3O7IIvYRpjJ_mi2H2DYJpD7MH7CF5DeSJ3RHmKzK1CCtNkLTnOl1ySTDXbiTq_UBkyBr98ENmaO5U68II8GeZ7QAE6ix_kpWoq46A1AgqfZCWDJN22hxvk7YJLCOnCkzfIkVJUFdeFGnQJkrxiMseMpXpHI9ilfhLbmDlmh9UKOs-UoTX-vG4TvVHmr2yKH6lXE7RJEdLcfkQBt0vcpb6DRCjholsb0JEl7q_5fxSaYASZYntMGPWue1PkrXYK09xxOgLLiFEd0pdYDM2u_8CRJfL3uHkN2t-wkUoKy4jxhk8XqHF_NQq4aP3S4',
 ]# Tokens updated 8.11.2023
 
+action_request_regex = re.compile(r'actionRequest"?:\s*"(.*?)"')
+
+
+def extract_action_request(text):
+    """
+    Extracts the actionRequest token from html page or ajax response.
+    :param text: str -> response body
+    :return: str/None -> the token or None if it's not presented
+    """
+    if not text:
+        return None
+    match = action_request_regex.search(text)
+    if match is None:
+        return None
+    return match.group(1)
+
+
+def extract_action_request_from_json(data):
+    """
+    Extracts the actionRequest token from parsed ajax response.
+    :param data: object -> parsed response body
+    :return: str/None -> the token or None if it's not presented
+    """
+    if not isinstance(data, list):
+        return None
+    for item in data:
+        if isinstance(item, list) and len(item) > 1 and isinstance(item[1], dict) and 'actionRequest' in item[1]:
+            return item[1]['actionRequest']
+    return None
+
+
 class IkariamService:
     def __init__(self, db, telegram):
         self.padre = True
         self.logged = False
         self.blackbox = 'tra:' + random.choice(blackbox_tokens)
-        self.requestHistory = deque(maxlen=5) #keep last 5 requests in history
+        self.action_request_token = None
+        # free transporters, gold, current city... updated from every response
+        self.account_state = AccountState(max_age=float(config.application_params.get('accountStateMaxAge', 10)))
+        self.offline = False
+        # counters of the work we've done or avoided, logged when the process ends
+        self.metrics = Counter()
+        self.parsed_cache = ParsedCache(max_size=int(config.application_params.get('parsedCacheSize', 64)),
+                                        max_age=float(config.application_params.get('parsedCacheMaxAge', 5)))
+        self.single_flight = SingleFlight(ttl=float(config.application_params.get('singleFlightTtl', 1)))
+        self.requestHistory = self.__create_request_history()
+        # the user is waiting on the main menu, so its requests go first. Bots set their own priority
+        self.request_priority = RequestPriority.HIGH
+        self.rate_limiter = RateLimiter.for_account(config.BOT_NAME)
+        # retry policies for refused/dropped connections, timeouts and failed logins
+        self.connection_retry_policy = RetryPolicy(base_delay=2, max_delay=ConnectionError_wait)
+        self.timeout_retry_policy = RetryPolicy(base_delay=10, max_delay=ConnectionError_wait)
+        self.login_retry_policy = RetryPolicy(base_delay=30, max_delay=ConnectionError_wait)
+        self.__circuit_breakers = {}
+        self.fixture_recorder, self.fixture_replayer = self.__create_fixtures()
         # disable ssl verification warning
         requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
         self.reset_db_telegram(db, telegram)
-        self.__login()
+        if self.fixture_replayer is not None:
+            self.__start_offline(None, self.fixture_replayer.meta)
+            # the token is ignored when matching the recorded requests
+            self.action_request_token = 'replay'
+        elif config.application_params.get('mockServerUrl', None):
+            self.__start_offline(config.application_params['mockServerUrl'].rstrip('/') + '/index.php?', {})
+        else:
+            self.__login()
+
+    @staticmethod
+    def __create_fixtures():
+        """
+        :return: (FixtureRecorder/None, FixtureReplayer/None)
+        """
+        replay_path = config.application_params.get('replayFixtures', None)
+        if replay_path:
+            latency = config.application_params.get('replayLatency', 'recorded')
+            latency = None if latency == 'recorded' else float(latency)
+            return None, FixtureReplayer(replay_path, latency=latency)
+        record_path = config.application_params.get('recordFixtures', None)
+        if record_path:
+            return FixtureRecorder(record_path), None
+        return None, None
+
+    def __start_offline(self, url_base, meta):
+        """
+        Skips the login, so the bots can run offline against the recorded requests or a local mock server
+        :param url_base: str/None -> urlBase of the server; None means the recorded host
+        :param meta: dict[] -> account data
+        """
+        self.username = meta.get('username', 'replay')
+        self.server = meta.get('server', 'en')
+        self.word = meta.get('word', 'replay')
+        self.server_number = meta.get('server_number', '0')
+        self.host = meta.get('host', 's{}-{}.ikariam.gameforge.com'.format(self.server_number, self.server))
+        self.urlBase = url_base or 'https://{}/index.php?'.format(self.host)
+        self.headers = {'User-Agent': user_agent}
+        self.s = create_session()
+        self.s.headers.update(self.headers)
+        self.offline = True
+        self.logged = True
+        config.infoUser = 'Server:{}, World:{}, Player:{} (offline)'.format(self.server, self.word, self.username)
+
+    @staticmethod
+    def __create_request_history():
+        trace_file = None
+        trace_file_path = config.application_params.get('requestTraceFile', None)
+        if trace_file_path:
+            trace_file = RequestTraceFile(
+                path=trace_file_path,
+                max_bytes=config.application_params.get('requestTraceFileMaxBytes', 10 * 1024 * 1024),
+                backup_count=config.application_params.get('requestTraceFileBackups', 3),
+            )
+        return RequestHistory(
+            size=config.application_params.get('requestHistorySize', 5),
+            keep_details=config.application_params.get('logRequestResponse', False),
+            trace_file=trace_file,
+            max_body_size=config.application_params.get('logRequestResponseMaxSize', 4096),
+        )
 
     def reset_db_telegram(self, db, telegram):
         self.db = db
         self.telegram = telegram
+        # cookies and proxy config kept in memory and reloaded only when they are written
+        self.__stored_state_version = None
+        self.__stored_cookies = None
+        self.__stored_proxy = None
 
     def __genRand(self):
         return hex(random.randint(0, 65535))[2:]
@@ -51,7 +174,7 @@ class IkariamService:
     def __logout(self, html):
         if html is not None:
             idCiudad = getCity(html)['id']
-            token = re.search(r'actionRequest"?:\s*"(.*?)"', html).group(1)
+            token = extract_action_request(html)
             urlLogout = 'action=logoutAvatar&function=logout&sideBarExt=undefined&startPageShown=1&detectedDevice=1&cityId={0}&backgroundView=city&currentCityId={0}&actionRequest={1}'.format(idCiudad, token)
             self.s.get(self.urlBase + urlLogout, verify=config.do_ssl_verify)
 
@@ -66,9 +189,10 @@ class IkariamService:
 
     def __getCookie(self):
         try:
-            cookie_dict = self.db.get_stored_value('cookies') or {}
-            self.s = requests.Session()
-            self.__update_proxy()
+            self.__refresh_stored_state()
+            cookie_dict = self.__stored_cookies or {}
+            self.s = create_session()
+            self.__update_proxy(refresh=False)
             self.s.headers.clear()
             self.s.headers.update(self.headers)
             requests.cookies.cookiejar_from_dict(cookie_dict, cookiejar=self.s.cookies, overwrite=True)
@@ -104,7 +228,7 @@ class IkariamService:
 
             banner()
 
-        self.s = requests.Session()
+        self.s = create_session()
         logging.info("Trying to log in. {loggedIn: %s, retries: %d}",
                      self.logged, retries)
 
@@ -356,7 +480,7 @@ class IkariamService:
         # if there are cookies stored, try to use them
         if cookies is not None and self.logged is False:
             # create a new temporary session object
-            old_s = requests.Session()
+            old_s = create_session()
             # set the headers
             old_s.headers.clear()
             old_s.headers.update(self.headers)
@@ -488,7 +612,16 @@ class IkariamService:
         if not used_old_cookies:
             self.__saveNewCookies()
 
+        self.__harvest_action_request(html)
         self.logged = True
+        if self.fixture_recorder is not None:
+            self.fixture_recorder.write_meta({
+                'username': self.username,
+                'server': self.server,
+                'word': self.word,
+                'server_number': self.server_number,
+                'host': self.host,
+            })
 
     def __backoff(self):
         logging.debug('__backoff()')
@@ -498,21 +631,26 @@ class IkariamService:
     def __sessionExpired(self):
         logging.info('__sessionExpired()')
         self.__backoff()
-        cookies = self.db.get_stored_value('cookies')
+        attempt = 0
+        while True:
+            self.__refresh_stored_state()
+            cookies = self.__stored_cookies
+
+            try:
+                if cookies is None or self.s.cookies['PHPSESSID'] != cookies['PHPSESSID']:
+                    self.__getCookie()
+                    return
+            except KeyError:
+                pass
 
-        try:
-            if cookies is None or self.s.cookies['PHPSESSID'] != cookies['PHPSESSID']:
-                self.__getCookie()
-            else:
-                try:
-                    self.__login(3)
-                except Exception:
-                    self.__sessionExpired()
-        except KeyError:
             try:
                 self.__login(3)
+                return
             except Exception:
-                self.__sessionExpired()
+                delay = self.login_retry_policy.get_delay(attempt)
+                attempt += 1
+                logging.exception('Failed to log in again (attempt %d). Will retry in %.1fs', attempt, delay)
+                time.sleep(delay)
 
     def __proxy_error(self):
         proxy_conf = self.db.get_stored_value('proxy')
@@ -536,19 +674,42 @@ class IkariamService:
             self.telegram.send_message(msg)
             sys.exit()
 
-    def __update_proxy(self, *, obj=None):
-        # set the proxy
+    def __refresh_stored_state(self):
+        """
+        Reloads cookies and proxy config from the db, but only if they were written since the last check
+        :return: bool -> has the stored state changed
+        """
+        version = self.db.get_storage_version()
+        if version == self.__stored_state_version:
+            return False
+        self.__stored_state_version = version
+        self.__stored_cookies = self.db.get_stored_value('cookies')
+        self.__stored_proxy = self.db.get_stored_value('proxy')
+        return True
+
+    def __update_proxy(self, *, obj=None, refresh=True):
+        """
+        :param obj: None/requests.Session -> the session of the service by default
+        :param refresh: bool -> reload the stored state first; False when the caller has just reloaded it
+        """
         if obj is None:
             obj = self.s
-        proxy_data = self.db.get_stored_value('proxy')
+        if refresh:
+            self.__refresh_stored_state()
+        proxy_data = self.__stored_proxy
         if proxy_data is not None and proxy_data['set'] is True:
             obj.proxies.update(proxy_data['proxy']['conf'])
         else:
-            obj.proxies.update({})
+            obj.proxies.clear()
 
     def __checkCookie(self):
         logging.debug('__checkCookie()')
-        cookies = self.db.get_stored_value('cookies')
+        if self.offline:
+            return
+        if self.__refresh_stored_state():
+            # someone has changed the stored data, the proxy config might be different
+            self.__update_proxy(refresh=False)
+        cookies = self.__stored_cookies
 
         try:
             if cookies is None or self.s.cookies['PHPSESSID'] != cookies['PHPSESSID']:
@@ -559,18 +720,29 @@ class IkariamService:
             except Exception:
                 self.__sessionExpired()
 
-    def __uniqueRequestId(self):
-        return base64.b64encode(os.urandom(32))[:8]
+    def __harvest_action_request(self, text):
+        """
+        Refreshes the cached actionRequest token from the response we've already received
+        :param text: str -> response body
+        :return: void
+        """
+        token = extract_action_request(text)
+        if token is not None:
+            self.action_request_token = token
 
     def __token(self):
-        """Generates a valid actionRequest token from the session
+        """Returns a valid actionRequest token. The token is harvested from every response, so we fetch the index
+        page only when we don't have one cached.
         Returns
         -------
         token : str
             a string representing a valid actionRequest token
         """
-        html = self.get()
-        return re.search(r'actionRequest"?:\s*"(.*?)"', html).group(1)
+        if self.action_request_token is None:
+            logging.debug('No cached actionRequest token. Fetching a new one')
+            # not through get, a shared response would not be harvested again
+            self.__get(self.urlBase, {}, False, False, False)
+        return self.action_request_token
 
     def __prepare_last_request_for_logs(self):
         if config.application_params.get('logRequestResponse', False):
@@ -583,9 +755,138 @@ class IkariamService:
                 .replace("  ", ' ')
                 .replace("  ", ' ')
             )
-        return "{method} {url}".format(**self.requestHistory[-1])
+        record = self.requestHistory[-1]
+        if record['status'] is None:
+            return "{method} {url}".format(**record)
+        return "{method} {url} -> {status} in {elapsed}s, {size} bytes".format(**record)
+
+    def __on_circuit_state_change(self, circuit_breaker):
+        if circuit_breaker.state == CircuitState.OPEN:
+            info = 'Connection problems with {}. Paused until {}'.format(
+                circuit_breaker.name, formatTimestamp(circuit_breaker.open_until))
+        elif circuit_breaker.state == CircuitState.HALF_OPEN:
+            info = 'Trying to reconnect to {}'.format(circuit_breaker.name)
+        else:
+            info = 'Connection to {} restored'.format(circuit_breaker.name)
+        logging.warning(info)
+
+        if self.padre is False:
+            # make the state visible in the process table
+            IkabotProcessListManager(self.db).upsert_process({'info': info})
+
+    def __get_circuit_breaker(self, url):
+        host = urlparse(url).netloc
+        if host not in self.__circuit_breakers:
+            self.__circuit_breakers[host] = CircuitBreaker(
+                name=host,
+                failure_threshold=5,
+                open_policy=RetryPolicy(base_delay=30, max_delay=ConnectionError_wait),
+                on_state_change=self.__on_circuit_state_change,
+            )
+        return self.__circuit_breakers[host]
 
-    def get(self, url='', params={}, ignoreExpire=False, noIndex=False, fullResponse=False):
+    def is_bulk_get_allowed(self):
+        """
+        The concurrent bulk reads of AsyncIkariamService use their own session. That is not possible while the
+        requests are replayed or recorded, or while the circuit of the server is not closed
+        :return: bool
+        """
+        return self.fixture_replayer is None and self.fixture_recorder is None and \
+            self.__get_circuit_breaker(self.urlBase).state == CircuitState.CLOSED
+
+    def register_bulk_get(self, url, response, text):
+        """
+        Records a response of the concurrent bulk reads like the ones sent by the service. Must be called from the
+        thread of the service
+        :param url: str
+        :param response: requests.Response
+        :param text: str -> the decoded body
+        :return: void
+        """
+        self.requestHistory.append('GET', url, proxies=self.s.proxies, headers=self.s.headers)
+        self.requestHistory.set_response(response, text=text)
+        self.__get_circuit_breaker(url).record_success()
+
+    def register_bulk_get_failure(self, url):
+        """
+        Counts a connection failure of the concurrent bulk reads like the ones of the service, so a server which is
+        down opens the circuit. Must be called from the thread of the service
+        :param url: str
+        :return: void
+        """
+        self.__get_circuit_breaker(url).record_failure()
+
+    def __send(self, method, url, **kwargs):
+        """
+        Sends the request and retries the connection problems with capped exponential backoff. Timeouts and refused
+        connections have their own retry policies and each host has its own circuit breaker.
+        :return: requests.Response
+        """
+        # the requests are where the bots spend their time, don't let the batched heartbeats go stale meanwhile
+        self.db.flush_if_due()
+        circuit_breaker = self.__get_circuit_breaker(url)
+        attempt = 0
+        while True:
+            circuit_breaker.wait_until_closed()
+            self.rate_limiter.acquire(self.request_priority)
+            if self.fixture_replayer is not None:
+                return self.fixture_replayer.replay(method, url, kwargs.get('params'), kwargs.get('data'))
+            try:
+                response = self.s.request(method, url, verify=config.do_ssl_verify, **kwargs)
+                circuit_breaker.record_success()
+                if self.fixture_recorder is not None:
+                    self.fixture_recorder.record(method, url, kwargs.get('params'), kwargs.get('data'), response)
+                return response
+            except requests.exceptions.Timeout as e:
+                retry_policy = self.timeout_retry_policy
+                error = e
+            except requests.exceptions.ConnectionError as e:
+                retry_policy = self.connection_retry_policy
+                error = e
+
+            circuit_breaker.record_failure()
+            # an open circuit does the waiting by itself
+            delay = 0 if circuit_breaker.state == CircuitState.OPEN else retry_policy.get_delay(attempt)
+            attempt += 1
+            logging.warning('%s %s failed (attempt %d): %s. Will retry in %.1fs', method, url, attempt, error, delay)
+            time.sleep(delay)
+
+    def __log_last_request(self, prefix):
+        # building the message can be expensive when logRequestResponse is set, do it only when it will be logged
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug('%s %s', prefix, self.__prepare_last_request_for_logs())
+
+    def __read_json(self, response, ignoreExpire):
+        """
+        Streams the response body and parses the json while the chunks arrive, without building the whole body as
+        one string
+        :param response: requests.Response -> response of a request sent with stream=True
+        :param ignoreExpire: bool
+        :return: (object, bool) -> the parsed body and whether the server rejected our actionRequest
+        """
+        if response.encoding is None:
+            response.encoding = 'utf-8'
+        parser = JsonStreamParser(strict=False)
+        size = 0
+        tail = ''
+        wrong_request_id = False
+        try:
+            for chunk in response.iter_content(chunk_size=64 * 1024, decode_unicode=True):
+                size += len(chunk)
+                # the tail of the previous chunk makes sure we catch the markers split between two chunks
+                window = tail + chunk
+                if ignoreExpire is False:
+                    assert self.isExpired(window) is False
+                wrong_request_id = wrong_request_id or 'TXT_ERROR_WRONG_REQUEST_ID' in window
+                tail = window[-32:]
+                parser.feed(chunk)
+        finally:
+            response.close()
+            self.requestHistory.set_response(response, size=size)
+            self.__log_last_request('Received :')
+        return parser.close(), wrong_request_id
+
+    def get(self, url='', params={}, ignoreExpire=False, noIndex=False, fullResponse=False, parseJson=False):
         """Sends get request to ikariam
         Parameters
         ----------
@@ -599,6 +900,8 @@ class IkariamService:
             if set to True it will remove 'index.php' from the end of urlBase before appending url params and sending the get request
         fullResponse : bool
             if set to True it will retrn the full response object instead of the string containing html or json data
+        parseJson : bool
+            if set to True it will stream the response and return the parsed json instead of the string. Ignored when fullResponse is set
 
         Returns
         -------
@@ -606,36 +909,53 @@ class IkariamService:
             response from the server
         """
         self.__checkCookie()
-        self.__update_proxy()
 
         if noIndex:
             url = self.urlBase.replace('index.php', '') + url
         else:
             url = self.urlBase + url
+        if fullResponse or self.single_flight.ttl <= 0 or 'action=' in url or 'action' in params:
+            return self.__get(url, params, ignoreExpire, fullResponse, parseJson)
+
+        # the same page is often read several times in a row, share the response. Opening a city changes the
+        # current city, so a page is shared only while the current city is the same
+        key = '{} {} {}'.format(normalize_request('GET', url, params), ignoreExpire, parseJson)
+        result, shared = self.single_flight.do(key, lambda: self.__get(url, params, ignoreExpire, False, parseJson),
+                                               lambda: self.account_state.get('current_city_id', float('inf')))
+        if shared:
+            self.metrics['coalescedRequests'] += 1
+        # the parsed json is shared, every caller gets its own copy to modify
+        return copy.deepcopy(result) if parseJson else result
+
+    def __get(self, url, params, ignoreExpire, fullResponse, parseJson):
         while True:
             try:
-                self.requestHistory.append({
-                    'traceRequestId': self.__uniqueRequestId(),
-                    'method': 'GET', 'url': url, 'params': params,
-                    'payload': None, 'proxies': self.s.proxies,
-                    'headers': dict(self.s.headers), 'response': None})
-                logging.debug('Will send: %s', self.__prepare_last_request_for_logs())
-                response = self.s.get(url, params=params, verify=config.do_ssl_verify)
-                self.requestHistory[-1]['response'] = {'status': response.status_code, 'elapsed': response.elapsed.total_seconds(), 'headers': dict(response.headers), 'text': response.text}
-                logging.debug('Received : %s', self.__prepare_last_request_for_logs())
+                self.requestHistory.append('GET', url, params=params, proxies=self.s.proxies, headers=self.s.headers)
+                self.__log_last_request('Will send:')
+                if parseJson and not fullResponse:
+                    response = self.__send('GET', url, params=params, stream=True)
+                    data, _ = self.__read_json(response, ignoreExpire)
+                    token = extract_action_request_from_json(data)
+                    if token is not None:
+                        self.action_request_token = token
+                    self.account_state.update_from_json(data)
+                    return data
+                response = self.__send('GET', url, params=params)
                 html = response.text
+                self.requestHistory.set_response(response, text=html)
+                self.__log_last_request('Received :')
                 if ignoreExpire is False:
                     assert self.isExpired(html) is False
+                self.__harvest_action_request(html)
+                self.account_state.update_from_text(html)
                 if fullResponse:
                     return response
                 else:
                     return html
             except AssertionError:
                 self.__sessionExpired()
-            except requests.exceptions.ConnectionError:
-                time.sleep(ConnectionError_wait)
 
-    def post(self, url='', payloadPost={}, params={}, ignoreExpire=False, noIndex=False):
+    def post(self, url='', payloadPost={}, params={}, ignoreExpire=False, noIndex=False, parseJson=False):
         """Sends post request to ikariam
         Parameters
         ----------
@@ -649,6 +969,8 @@ class IkariamService:
             if set to True it will ignore if the current session is expired and will simply return whatever response it gets. If it's set to False, it will make sure that the current session is not expired before sending the post request, if it's expired it will login again
         noIndex : bool
             if set to True it will remove 'index.php' from the end of urlBase before appending url and params and sending the post request
+        parseJson : bool
+            if set to True it will stream the response and return the parsed json instead of the string
 
         Returns
         -------
@@ -659,7 +981,6 @@ class IkariamService:
         payloadPost_original = payloadPost
         params_original = params
         self.__checkCookie()
-        self.__update_proxy()
 
         # add the request id
         token = self.__token()
@@ -675,30 +996,87 @@ class IkariamService:
             url = self.urlBase + url
         while True:
             try:
-                self.requestHistory.append({
-                    'traceRequestId': self.__uniqueRequestId(),
-                    'method': 'POST', 'url': url, 'params': params,
-                    'payload': payloadPost, 'proxies': self.s.proxies,
-                    'headers': dict(self.s.headers), 'response': None})
-                logging.debug('Will send: %s', self.__prepare_last_request_for_logs())
-                response = self.s.post(url, data=payloadPost, params=params, verify=config.do_ssl_verify)
-                self.requestHistory[-1]['response'] = {'status': response.status_code, 'elapsed': response.elapsed.total_seconds(), 'headers': dict(response.headers), 'text': response.text}
-                logging.debug('Received : %s', self.__prepare_last_request_for_logs())
-                resp = response.text
-                if ignoreExpire is False:
-                    assert self.isExpired(resp) is False
-                if 'TXT_ERROR_WRONG_REQUEST_ID' in resp:
+                self.requestHistory.append('POST', url, params=params, payload=payloadPost, proxies=self.s.proxies, headers=self.s.headers)
+                self.__log_last_request('Will send:')
+                if parseJson:
+                    response = self.__send('POST', url, data=payloadPost, params=params, stream=True)
+                    resp, wrong_request_id = self.__read_json(response, ignoreExpire)
+                    token = extract_action_request_from_json(resp)
+                else:
+                    response = self.__send('POST', url, data=payloadPost, params=params)
+                    resp = response.text
+                    self.requestHistory.set_response(response, text=resp)
+                    self.__log_last_request('Received :')
+                    if ignoreExpire is False:
+                        assert self.isExpired(resp) is False
+                    wrong_request_id = 'TXT_ERROR_WRONG_REQUEST_ID' in resp
+                    token = extract_action_request(resp)
+                if wrong_request_id:
                     logging.warning('Got TXT_ERROR_WRONG_REQUEST_ID, bad actionRequest... %s', self.__prepare_last_request_for_logs())
-                    return self.post(url=url_original, payloadPost=payloadPost_original, params=params_original, ignoreExpire=ignoreExpire, noIndex=noIndex)
+                    # the cached token is stale (e.g. another process used it), get a fresh one
+                    self.action_request_token = None
+                    return self.post(url=url_original, payloadPost=payloadPost_original, params=params_original, ignoreExpire=ignoreExpire, noIndex=noIndex, parseJson=parseJson)
+                if token is not None:
+                    self.action_request_token = token
+                self.register_write(url_original, payloadPost, params)
+                if parseJson:
+                    self.account_state.update_from_json(resp)
+                else:
+                    self.account_state.update_from_text(resp)
                 return resp
             except AssertionError:
                 self.__sessionExpired()
-            except requests.exceptions.ConnectionError:
-                time.sleep(ConnectionError_wait)
+
+    def register_write(self, url='', payloadPost={}, params={}):
+        """
+        Forgets what the post request could have changed: the shared reads, the parsed pages of the cities and
+        islands it refers to and the stats of the units after a research. Also tracks the current city, no matter
+        which helper changed it
+        :param url: str
+        :param payloadPost: dict
+        :param params: dict
+        :return: void
+        """
+        self.single_flight.clear()
+        data = dict(parse_qsl(url.split('?', 1)[-1]))
+        for extra in (params, payloadPost):
+            if isinstance(extra, dict):
+                data.update(extra)
+        if data.get('action', None) == 'header':
+            if data.get('function', None) == 'changeCurrentCity' and str(data.get('cityId', '')).isdigit():
+                self.account_state.set('current_city_id', int(data['cityId']))
+            return
+        if 'action' not in data:
+            return
+        if changes_unit_stats(data):
+            invalidate_unit_stats(self.db)
+
+        cities_ids = {data[k] for k in ['cityId', 'currentCityId', 'destinationCityId'] if data.get(k, None)}
+        islands_ids = {data[k] for k in ['islandId', 'destinationIslandId'] if data.get(k, None)}
+        if not cities_ids and not islands_ids:
+            self.parsed_cache.invalidate()
+            return
+        current_city_id = self.account_state.get('current_city_id', float('inf'))
+        if current_city_id is not None:
+            # the origin of a transport is the current city
+            cities_ids.add(current_city_id)
+        self.parsed_cache.invalidate('city', *cities_ids)
+        if islands_ids:
+            self.parsed_cache.invalidate('island', *islands_ids)
+
+    def reset_connection_pool(self):
+        """
+        Replaces the connection pool of the session. Used after fork, so that the child doesn't send its requests
+        through the sockets of the parent process
+        """
+        mount_timeout_adapter(self.s)
 
     def logout(self):
         """This function kills the current (chlid) process
         """
         logging.info('logout()')
+        if self.metrics:
+            logging.info('Metrics: %s', dict(self.metrics))
+        self.requestHistory.close()
         if self.padre is False:
             os._exit(0)
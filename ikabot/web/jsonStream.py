@@ -0,0 +1,104 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+
+_whitespace = ' \t\n\r'
+
+
+class JsonStreamParser:
+    """
+    Parses json from text chunks while they arrive. The elements of a top level array (which is what the ajax
+    responses of ikariam are) are decoded one by one, so only the still unparsed tail of the body is kept as text
+    instead of the whole body. Any other json document is decoded when the last chunk arrives.
+    """
+
+    def __init__(self, strict=False):
+        """
+        :param strict: bool -> same as the strict parameter of json.loads
+        """
+        self.__decoder = json.JSONDecoder(strict=strict)
+        self.__buffer = ''
+        self.__position = 0
+        self.__retry_size = 0
+        self.__is_array = None
+        self.__done = False
+        self.items = []
+
+    def __skip(self, characters):
+        while self.__position < len(self.__buffer) and self.__buffer[self.__position] in characters:
+            self.__position += 1
+
+    def __compact(self):
+        self.__buffer = self.__buffer[self.__position:]
+        self.__position = 0
+
+    def __parse_items(self, final):
+        while not self.__done:
+            self.__skip(_whitespace + ',')
+            if self.__position >= len(self.__buffer):
+                return
+            if self.__buffer[self.__position] == ']':
+                self.__position += 1
+                self.__done = True
+                return
+            if not final and len(self.__buffer) < self.__retry_size:
+                # the element is incomplete; wait for the buffer to double, so big elements are not rescanned
+                # with every chunk
+                return
+            try:
+                item, end = self.__decoder.raw_decode(self.__buffer, self.__position)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                self.__compact()
+                self.__retry_size = 2 * len(self.__buffer)
+                return
+            if end == len(self.__buffer) and not final:
+                # a number at the end of the buffer might continue in the next chunk
+                self.__compact()
+                self.__retry_size = len(self.__buffer) + 1
+                return
+            self.items.append(item)
+            self.__position = end
+            self.__retry_size = 0
+            self.__compact()
+
+    def feed(self, chunk):
+        """
+        :param chunk: str
+        :return: void
+        """
+        self.__buffer += chunk
+        if self.__is_array is None:
+            self.__skip(_whitespace)
+            if self.__position >= len(self.__buffer):
+                return
+            self.__is_array = self.__buffer[self.__position] == '['
+            if self.__is_array:
+                self.__position += 1
+        if self.__is_array:
+            self.__parse_items(final=False)
+
+    def close(self):
+        """
+        :return: object -> the parsed document
+        """
+        if self.__is_array:
+            self.__parse_items(final=True)
+            self.__skip(_whitespace)
+            if not self.__done or self.__position != len(self.__buffer):
+                raise json.JSONDecodeError('Invalid json array', self.__buffer, self.__position)
+            return self.items
+        return self.__decoder.decode(self.__buffer)
+
+
+def parse_json_stream(chunks, strict=False):
+    """
+    :param chunks: iterable[str]
+    :param strict: bool
+    :return: object -> the parsed document
+    """
+    parser = JsonStreamParser(strict=strict)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
@@ -0,0 +1,69 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+class ParsedCache:
+    """
+    Least recently used cache of parsed pages (cities, islands) keyed by (kind, id). The parsed pages are kept only
+    for a short time, because the resources keep changing, and they are invalidated by the writes to their city.
+    The callers get their own copy, so they can modify it.
+    """
+
+    def __init__(self, max_size=64, max_age=5):
+        """
+        :param max_size: int -> maximum number of pages
+        :param max_age: float -> default seconds for which a page is considered fresh
+        """
+        self.max_size = max_size
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+        self.__entries = OrderedDict()
+
+    def get(self, kind, id, max_age=None):
+        """
+        :param kind: str -> city/island
+        :param id: int|str
+        :param max_age: None/float -> overrides the max_age of the cache
+        :return: dict/None -> copy of the parsed page or None if we don't have a fresh one
+        """
+        key = (kind, str(id))
+        with self.__lock:
+            entry = self.__entries.get(key, None)
+            if entry is None or time.time() - entry[1] > (self.max_age if max_age is None else max_age):
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(entry[0])
+
+    def put(self, kind, id, value):
+        """
+        :param kind: str -> city/island
+        :param id: int|str
+        :param value: dict -> parsed page, a copy is stored
+        :return: void
+        """
+        key = (kind, str(id))
+        value = copy.deepcopy(value)
+        with self.__lock:
+            self.__entries[key] = (value, time.time())
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+
+    def invalidate(self, kind=None, *ids):
+        """
+        :param kind: None/str -> kind of the pages to forget; all the pages when None
+        :param ids: int|str -> ids of the pages to forget; all the pages of the kind when none is given
+        :return: void
+        """
+        ids = {str(id) for id in ids}
+        with self.__lock:
+            for key in [k for k in self.__entries if kind is None or (k[0] == kind and (not ids or k[1] in ids))]:
+                del self.__entries[key]
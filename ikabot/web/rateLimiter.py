@@ -0,0 +1,124 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+import logging
+import os
+import re
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from enum import Enum
+
+from ikabot import config
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+
+class RequestPriority(Enum):
+    """
+    The value is the fraction of the bucket that is reserved for the more important requests. Low priority requests
+    are sent only while the bucket is fuller than their reserve, so background work yields to the urgent one.
+    """
+    HIGH = 0.0  # alerts and the user in the main menu
+    NORMAL = 0.25  # transports, upgrades, market...
+    LOW = 0.5  # background work like world dumps and island scans
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all the processes of one account. The bucket state (tokens, last refill time) lives in a
+    small lock file next to the db, so the forked bots throttle together. On systems without fcntl the bucket is
+    shared only between the threads of the current process.
+    """
+    __state_format = 'dd'
+    __state_size = struct.calcsize(__state_format)
+
+    def __init__(self, rate, capacity=None, state_file=None):
+        """
+        :param rate: float -> tokens (requests) per second; 0 disables the limiter
+        :param capacity: int/None -> maximum burst of requests
+        :param state_file: str/None -> file holding the shared bucket state
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate * 5))
+        self.state_file = state_file
+        self.__thread_lock = threading.Lock()
+        self.__local_state = (float(self.capacity), time.time())
+
+    @staticmethod
+    def for_account(bot_name):
+        """
+        Creates the limiter of the account configured with the application parameters
+        :param bot_name: str
+        :return: RateLimiter
+        """
+        return RateLimiter(
+            rate=float(config.application_params.get('rateLimitPerSecond', 4)),
+            capacity=int(config.application_params.get('rateLimitBurst', 20)),
+            state_file='{}.{}.ratelimit'.format(config.DB_FILE, re.sub(r'\W', '_', bot_name)),
+        )
+
+    @contextmanager
+    def __locked_state(self):
+        """
+        Yields a mutable [tokens, timestamp] list, which is persisted when the context exits
+        """
+        with self.__thread_lock:
+            if fcntl is None or self.state_file is None:
+                state = list(self.__local_state)
+                yield state
+                self.__local_state = tuple(state)
+                return
+
+            fd = os.open(self.state_file, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+                data = os.pread(fd, self.__state_size, 0)
+                if len(data) == self.__state_size:
+                    state = list(struct.unpack(self.__state_format, data))
+                else:
+                    state = [float(self.capacity), time.time()]
+                yield state
+                os.pwrite(fd, struct.pack(self.__state_format, *state), 0)
+            finally:
+                os.close(fd)  # closing the descriptor releases the lock
+
+    def try_acquire(self, priority=RequestPriority.NORMAL):
+        """
+        Takes a token from the bucket if there is one available for the priority
+        :param priority: RequestPriority
+        :return: float -> 0 if the token was taken, otherwise the seconds to wait before trying again
+        """
+        if self.rate <= 0:
+            return 0
+
+        # a small bucket can't keep a reserve, but it must still let every priority through
+        reserve = min(self.capacity * priority.value, self.capacity - 1)
+        with self.__locked_state() as state:
+            now = time.time()
+            tokens = min(self.capacity, state[0] + max(0.0, now - state[1]) * self.rate)
+            state[1] = now
+            if tokens - 1 >= reserve:
+                state[0] = tokens - 1
+                return 0
+            state[0] = tokens
+        return (reserve + 1 - tokens) / self.rate
+
+    def acquire(self, priority=RequestPriority.NORMAL):
+        """
+        Blocks until a token for the priority is available
+        :param priority: RequestPriority
+        :return: float -> the seconds we've waited
+        """
+        waited = 0
+        while True:
+            wait = self.try_acquire(priority)
+            if wait <= 0:
+                if waited > 0:
+                    logging.debug('Rate limited for %.2fs; priority=%s', waited, priority.name)
+                return waited
+            time.sleep(wait)
+            waited += wait
@@ -0,0 +1,151 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+import base64
+import gzip
+import json
+import logging
+import os
+from collections import deque
+
+
+def _unique_request_id():
+    return base64.b64encode(os.urandom(32))[:8].decode('ascii')
+
+
+class RequestTraceFile:
+    """
+    Appends request records as json lines to a compressed per-process file. Records are buffered and written as a
+    single gzip member per batch. When the file becomes bigger than max_bytes it's rotated, keeping backup_count
+    older files.
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backup_count=3, batch_size=20):
+        self.__path = path
+        self.__max_bytes = max_bytes
+        self.__backup_count = backup_count
+        self.__batch_size = batch_size
+        self.__buffer = []
+        self.__pid = os.getpid()
+
+    def get_file_name(self):
+        return '{}.{}.jsonl.gz'.format(self.__path, os.getpid())
+
+    def write(self, record):
+        """
+        Buffers the record and writes the buffer to the file when the batch is full
+        :param record: dict[]
+        :return: void
+        """
+        if self.__pid != os.getpid():
+            # we've been forked, the buffer belongs to the parent process
+            self.__pid = os.getpid()
+            self.__buffer = []
+
+        self.__buffer.append(json.dumps(record, default=str))
+        if len(self.__buffer) >= self.__batch_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.__buffer) == 0:
+            return
+
+        file_name = self.get_file_name()
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+            with gzip.open(file_name, 'at', encoding='utf-8') as file:
+                file.write('\n'.join(self.__buffer) + '\n')
+            self.__buffer = []
+            if os.path.getsize(file_name) >= self.__max_bytes:
+                self.__rotate(file_name)
+        except OSError:
+            logging.exception('Failed to write request trace file %s', file_name)
+            self.__buffer = []
+
+    def __rotate(self, file_name):
+        for i in range(self.__backup_count - 1, 0, -1):
+            src = '{}.{}'.format(file_name, i)
+            if os.path.exists(src):
+                os.replace(src, '{}.{}'.format(file_name, i + 1))
+        if self.__backup_count > 0:
+            os.replace(file_name, file_name + '.1')
+        else:
+            os.remove(file_name)
+
+
+class RequestHistory:
+    """
+    Fixed size ring buffer with compact records of the last requests sent to ikariam. Headers, proxies and the
+    beginning of the response body are kept only when keep_details is set, so the memory stays flat no matter the
+    uptime.
+    """
+
+    def __init__(self, size=5, keep_details=False, trace_file=None, max_body_size=4096):
+        """
+        :param size: int -> how many requests to keep in memory
+        :param keep_details: bool -> should we keep headers, proxies and the response body
+        :param trace_file: RequestTraceFile/None -> where to spill the finished records
+        :param max_body_size: int -> how many characters of the response body to keep
+        """
+        self.__records = deque(maxlen=size)
+        self.keep_details = keep_details
+        self.trace_file = trace_file
+        self.max_body_size = max_body_size
+
+    def __len__(self):
+        return len(self.__records)
+
+    def __getitem__(self, index):
+        return self.__records[index]
+
+    def __iter__(self):
+        return iter(self.__records)
+
+    def append(self, method, url, params=None, payload=None, proxies=None, headers=None):
+        """
+        Adds new record for a request that is about to be sent
+        :return: dict[] -> the record
+        """
+        record = {
+            'traceRequestId': _unique_request_id(),
+            'method': method,
+            'url': url,
+            'params': params,
+            'payload': payload,
+            'status': None,
+            'elapsed': None,
+            'size': None,
+        }
+        if self.keep_details:
+            record['proxies'] = dict(proxies or {})
+            record['headers'] = dict(headers or {})
+            record['response'] = None
+        self.__records.append(record)
+        return record
+
+    def set_response(self, response, text=None, size=None):
+        """
+        Stores the response data into the last record
+        :param response: requests.Response
+        :param text: str/None -> the already decoded body, so it's not decoded again
+        :param size: int/None -> the body size, when the body has been streamed and the response has no content
+        :return: void
+        """
+        record = self.__records[-1]
+        record['status'] = response.status_code
+        record['elapsed'] = response.elapsed.total_seconds()
+        record['size'] = size if size is not None else len(response.content or b'')
+        if self.keep_details:
+            if text is None and size is None:
+                text = response.text
+            record['response'] = {
+                'headers': dict(response.headers),
+                'text': None if text is None else text[:self.max_body_size],
+                'truncated': text is not None and len(text) > self.max_body_size,
+            }
+
+        if self.trace_file is not None:
+            self.trace_file.write({k: v for k, v in record.items() if k != 'response'})
+
+    def close(self):
+        if self.trace_file is not None:
+            self.trace_file.flush()
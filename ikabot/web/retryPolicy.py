@@ -0,0 +1,97 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+import logging
+import random
+import time
+from enum import Enum
+
+
+class RetryPolicy:
+    """
+    Capped exponential backoff with jitter
+    """
+
+    def __init__(self, base_delay, max_delay, multiplier=2.0):
+        """
+        :param base_delay: float -> seconds to wait after the first failure
+        :param max_delay: float -> maximum seconds to wait
+        :param multiplier: float -> how much the delay grows with each failure
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+
+    def get_delay(self, attempt):
+        """
+        Returns the seconds to wait before the next retry. Half of the delay is random, so that the forked bots
+        don't retry all at once.
+        :param attempt: int -> number of failures so far, starting from 0
+        :return: float
+        """
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** min(attempt, 64))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+class CircuitState(Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a host after too many consecutive connection failures. While the circuit is open, the
+    requests wait instead of hammering the server. After the open period one trial request is let through (half-open):
+    on success the circuit is closed, on failure it's opened again for longer.
+    """
+
+    def __init__(self, name, failure_threshold, open_policy, on_state_change=None):
+        """
+        :param name: str -> usually the host
+        :param failure_threshold: int -> consecutive failures which open the circuit
+        :param open_policy: RetryPolicy -> how long the circuit stays open
+        :param on_state_change: None/callable(CircuitBreaker) -> called when the state changes
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_policy = open_policy
+        self.on_state_change = on_state_change
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.open_until = 0
+
+    def __set_state(self, state):
+        if self.state == state:
+            return
+        logging.info('Circuit %s: %s -> %s', self.name, self.state.value, state.value)
+        self.state = state
+        if self.on_state_change is not None:
+            self.on_state_change(self)
+
+    def wait_until_closed(self):
+        """
+        Blocks while the circuit is open
+        :return: float -> the seconds we've waited
+        """
+        if self.state != CircuitState.OPEN:
+            return 0
+        waited = max(0.0, self.open_until - time.time())
+        if waited > 0:
+            time.sleep(waited)
+        self.__set_state(CircuitState.HALF_OPEN)
+        return waited
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.__set_state(CircuitState.CLOSED)
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == CircuitState.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.open_until = time.time() + self.open_policy.get_delay(self.times_opened)
+            self.times_opened += 1
+            if self.state == CircuitState.OPEN:
+                return
+            self.__set_state(CircuitState.OPEN)
@@ -0,0 +1,55 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+import requests
+from requests.adapters import HTTPAdapter
+
+from ikabot import config
+
+
+def get_request_timeout():
+    """
+    :return: (float, float) -> connect and read timeouts in seconds, configured with the application parameters
+    """
+    return (
+        float(config.application_params.get('requestConnectTimeout', 10)),
+        float(config.application_params.get('requestReadTimeout', 60)),
+    )
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter with a default timeout, so a stalled connection can't hang the bot forever. Requests which set their
+    own timeout keep it.
+    """
+
+    def __init__(self, *args, timeout=None, **kwargs):
+        """
+        :param timeout: None/float/(float, float) -> default (connect, read) timeout
+        """
+        self.timeout = timeout if timeout is not None else get_request_timeout()
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def mount_timeout_adapter(session, **adapter_kwargs):
+    """
+    Replaces the connection pools of the session with ones that have the default timeout
+    :param session: requests.Session
+    :param adapter_kwargs: passed to the TimeoutHTTPAdapter
+    :return: requests.Session
+    """
+    adapter = TimeoutHTTPAdapter(**adapter_kwargs)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def create_session(**adapter_kwargs):
+    """
+    :return: requests.Session -> session with the default timeout
+    """
+    return mount_timeout_adapter(requests.Session(), **adapter_kwargs)
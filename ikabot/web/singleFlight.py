@@ -0,0 +1,92 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+
+class _Call:
+    def __init__(self):
+        self.tag = None
+        self.done = threading.Event()
+        self.finished = 0
+        self.result = None
+        self.failed = False
+
+
+class SingleFlight:
+    """
+    Coalesces identical reads. While a read is in flight, the same read from another thread waits for it instead of
+    sending its own request, and a read which completed less than ttl seconds ago is served again. The tag is the
+    context which the result depends on (e.g. the current city): a completed read is shared only while the tag is
+    the same as right after the read.
+    """
+
+    def __init__(self, ttl):
+        """
+        :param ttl: float -> seconds for which a completed read is shared; 0 disables the sharing of completed reads
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+        self.__calls = {}
+
+    def __is_shareable(self, call, tag, now):
+        if not call.done.is_set():
+            return True
+        return not call.failed and call.tag == tag and now - call.finished <= self.ttl
+
+    def __prune(self, now):
+        for key in [k for k, c in self.__calls.items() if c.done.is_set() and now - c.finished > self.ttl]:
+            del self.__calls[key]
+
+    def do(self, key, function, get_tag=None):
+        """
+        :param key: str -> identifies the read, usually the normalized request
+        :param function: callable() -> performs the read
+        :param get_tag: None/callable() -> returns the context of the read
+        :return: (object, bool) -> the result and whether it was shared
+        """
+        tag = get_tag() if get_tag is not None else None
+        with self.__lock:
+            now = time.time()
+            call = self.__calls.get(key, None)
+            if call is not None and self.__is_shareable(call, tag, now):
+                owner = False
+            else:
+                self.__prune(now)
+                call = _Call()
+                self.__calls[key] = call
+                owner = True
+
+        if not owner:
+            call.done.wait()
+            if call.failed:
+                # the owner failed, try on our own
+                return self.do(key, function, get_tag)
+            self.hits += 1
+            return call.result, True
+
+        self.misses += 1
+        try:
+            call.result = function()
+            call.tag = get_tag() if get_tag is not None else None
+        except BaseException:
+            call.failed = True
+            with self.__lock:
+                if self.__calls.get(key, None) is call:
+                    del self.__calls[key]
+            raise
+        finally:
+            call.finished = time.time()
+            call.done.set()
+        return call.result, False
+
+    def clear(self):
+        """
+        Forgets the completed reads, e.g. after a write which could change them
+        :return: void
+        """
+        with self.__lock:
+            for key in [k for k, c in self.__calls.items() if c.done.is_set()]:
+                del self.__calls[key]
@@ -0,0 +1,120 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Turns the pages of a recorded session (see the recordFixtures parameter) into benchmark fixtures, without the
+names, tokens and messages of the account.
+Run with: python -m tests.benchmarks.anonymize <recorded archive> [fixtures directory]
+"""
+import gzip
+import os
+import re
+import sys
+from urllib.parse import parse_qsl
+
+from ikabot.web.httpFixtures import FixtureReplayer
+
+fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+# first line: synthetic or recorded, then a description of the pages
+origin_file = 'ORIGIN'
+
+# fixture name -> the view of the recorded request
+fixture_views = {
+    'city.html': 'city',
+    'island.html': 'island',
+    'market.json': 'branchOffice',
+    'militaryAdvisor.json': 'militaryAdvisor',
+    'unitDescription.json': 'unitdescription',
+    'cityMilitary.json': 'cityMilitary',
+}
+
+_token_pattern = re.compile(r'\b[0-9a-f]{32}\b')
+# json keys (plain or escaped in javascript strings) whose values identify the player
+_private_keys = ['ownerName', 'playerName', 'avatarName', 'ownerAllyTag', 'allyTag', 'allyName', 'email', 'message']
+_private_value_pattern = re.compile(
+    r'(\\?"(?:{})\\?"\s*:\s*\\?")((?:[^"\\]|\\(?!"))*)(\\?")'.format('|'.join(_private_keys))
+)
+_avatar_name_pattern = re.compile(r'(class="avatarName"[^>]*>)([^<]*)(<)')
+
+
+def anonymize(text):
+    """
+    :param text: str -> page or ajax response
+    :return: str -> the same text with anonymous names and tokens of the same length
+    """
+    text = _token_pattern.sub(lambda m: '0' * len(m.group(0)), text)
+    text = _private_value_pattern.sub(lambda m: m.group(1) + 'x' * len(m.group(2)) + m.group(3), text)
+    return _avatar_name_pattern.sub(lambda m: m.group(1) + 'x' * len(m.group(2)) + m.group(3), text)
+
+
+def write_fixture(name, text, directory=fixtures_dir):
+    """
+    :param name: str -> one of fixture_views
+    :param text: str
+    :param directory: str
+    :return: str -> path of the written fixture
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name + '.gz')
+    with gzip.open(path, 'wt', encoding='utf-8') as file:
+        file.write(anonymize(text))
+    return path
+
+
+def get_fixtures_origin(directory=fixtures_dir):
+    """
+    :param directory: str
+    :return: str -> recorded if the fixtures were written from a recorded session, synthetic otherwise
+    """
+    try:
+        with open(os.path.join(directory, origin_file), encoding='utf-8') as file:
+            return file.readline().strip() or 'synthetic'
+    except OSError:
+        return 'synthetic'
+
+
+def set_fixtures_origin(origin, description, directory=fixtures_dir):
+    """
+    :param origin: str -> synthetic/recorded
+    :param description: str
+    :param directory: str
+    :return: void
+    """
+    with open(os.path.join(directory, origin_file), 'w', encoding='utf-8') as file:
+        file.write('{}\n{}\n'.format(origin, description))
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__.strip())
+        sys.exit(1)
+
+    replayer = FixtureReplayer(sys.argv[1], latency=0)
+    directory = sys.argv[2] if len(sys.argv) > 2 else fixtures_dir
+    written = []
+    for name, view in fixture_views.items():
+        keys = [key for key in replayer.exchanges if re.search(r'[?& ]view={}(&|$| )'.format(view), key)]
+        if not keys:
+            print('{}: no {} page in the archive'.format(name, view))
+            continue
+        method, url = keys[-1].split(' ')[:2]
+        response = replayer.exchanges[keys[-1]][-1]
+        text = replayer.replay(method, url, payload=_payload(keys[-1])).text
+        print('{}: {} ({:,} bytes, status {})'.format(name, write_fixture(name, text, directory), len(text),
+                                                      response['status']))
+        written.append(name)
+    if written:
+        # the pages of the views which weren't recorded may still be synthetic
+        set_fixtures_origin('recorded' if len(written) == len(fixture_views) else 'synthetic',
+                            'Pages recorded in {}: {}'.format(os.path.basename(sys.argv[1]), ', '.join(written)),
+                            directory)
+
+
+def _payload(key):
+    parts = key.split(' ', 2)
+    if len(parts) < 3:
+        return None
+    return dict(parse_qsl(parts[2], keep_blank_values=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Contention of the process table: N writer processes send heartbeats (upsert_process) to the same database file,
+like the forked bots do, while one process keeps listing the processes, like the menu does. Compares the rollback
+journal with the write ahead log, with and without the batched heartbeats. Then measures the refresh of the menu
+with many running bots.
+Run with: python -m tests.benchmarks.databaseBenchmark [--writers 16] [--heartbeats 200] [--processes 60]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import timeit
+from contextlib import redirect_stdout
+from io import StringIO
+
+import psutil
+
+from ikabot import config
+from ikabot.helpers.database import Database
+from ikabot.helpers.ikabotProcessListManager import IkabotProcessListManager, ProcessStatus
+from ikabot.migrations.migrate import apply_migrations
+
+# name -> (application parameters, batch interval)
+modes = {
+    'rollback journal': ({'dbJournalMode': 'DELETE', 'dbSynchronous': 'FULL'}, 0),
+    'wal': ({}, 0),
+    'wal + batched': ({}, 0.5),
+}
+
+
+def _writer(db_file, params, batch_interval, heartbeats, start, results):
+    config.DB_FILE = db_file
+    config.application_params = dict(params)
+    start.wait()
+    db = Database('bot', batch_interval=batch_interval)
+    manager = IkabotProcessListManager(db)
+    latencies = []
+    errors = 0
+    manager.upsert_process({'action': 'benchmark', 'status': ProcessStatus.RUNNING})
+    for i in range(heartbeats):
+        started = time.perf_counter()
+        try:
+            manager.upsert_process({'info': 'heartbeat {}'.format(i)}, batched=True)
+        except sqlite3.OperationalError:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    db.close_db_conn()
+    results.put((latencies, errors))
+
+
+def _reader(db_file, params, stop, results):
+    config.DB_FILE = db_file
+    config.application_params = dict(params)
+    db = Database('bot')
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        db.get_processes()
+        latencies.append(time.perf_counter() - started)
+        time.sleep(0.01)
+    db.close_db_conn()
+    results.put(latencies)
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))] if values else 0
+
+
+def run(mode, writers, heartbeats):
+    """
+    :param mode: str -> one of modes
+    :param writers: int -> number of writer processes
+    :param heartbeats: int -> heartbeats of every writer
+    :return: dict
+    """
+    params, batch_interval = modes[mode]
+    directory = tempfile.mkdtemp()
+    try:
+        config.DB_FILE = os.path.join(directory, 'ikabot.db')
+        with redirect_stdout(StringIO()):
+            apply_migrations()
+        context = multiprocessing.get_context('fork')
+        start, stop = context.Event(), context.Event()
+        writer_results, reader_results = context.Queue(), context.Queue()
+        processes = [context.Process(target=_writer, args=(config.DB_FILE, params, batch_interval, heartbeats, start,
+                                                           writer_results))
+                     for _ in range(writers)]
+        reader = context.Process(target=_reader, args=(config.DB_FILE, params, stop, reader_results))
+        for process in processes + [reader]:
+            process.start()
+
+        started = time.perf_counter()
+        start.set()
+        results = [writer_results.get() for _ in processes]
+        elapsed = time.perf_counter() - started
+        stop.set()
+        reads = reader_results.get()
+        for process in processes + [reader]:
+            process.join()
+    finally:
+        shutil.rmtree(directory)
+
+    latencies = [latency for result in results for latency in result[0]]
+    return {
+        'heartbeats/sec': len(latencies) / elapsed,
+        'p50 ms': _percentile(latencies, 50) * 1000,
+        'p99 ms': _percentile(latencies, 99) * 1000,
+        'max ms': max(latencies) * 1000,
+        'read p99 ms': _percentile(reads, 99) * 1000,
+        'errors': sum(result[1] for result in results),
+    }
+
+
+def _check_one_by_one(processes):
+    # what the refresh of the menu did before the snapshot of all the processes
+    name = psutil.Process(os.getpid()).name()
+    for process in processes:
+        proc = psutil.Process(process['pid'])
+        proc.status() != psutil.STATUS_ZOMBIE and proc.name() == name
+
+
+def measure_listing(processes):
+    """
+    :param processes: int -> number of running bots in the table
+    :return: (float, float) -> ms to refresh the process list of the menu, ms to check the bots one by one
+    """
+    directory = tempfile.mkdtemp()
+    context = multiprocessing.get_context('fork')
+    stop = context.Event()
+    bots = [context.Process(target=stop.wait) for _ in range(processes)]
+    try:
+        config.DB_FILE = os.path.join(directory, 'ikabot.db')
+        with redirect_stdout(StringIO()):
+            apply_migrations()
+        for bot in bots:
+            bot.start()
+        db = Database('bot')
+        manager = IkabotProcessListManager(db)
+        for bot in bots:
+            manager.upsert_process({'pid': bot.pid, 'action': 'benchmark', 'status': ProcessStatus.WAITING,
+                                    'nextActionTime': time.time() + 3600})
+        assert len(manager.get_process_list()) == processes
+        listing = min(timeit.repeat(manager.get_process_list, number=10, repeat=5)) / 10
+        rows = db.get_processes()
+        one_by_one = min(timeit.repeat(lambda: _check_one_by_one(rows), number=10, repeat=5)) / 10
+        db.close_db_conn()
+    finally:
+        stop.set()
+        for bot in bots:
+            bot.join()
+        shutil.rmtree(directory)
+    return listing * 1000, one_by_one * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Contention benchmark of the process table')
+    parser.add_argument('--writers', type=int, default=16, help='number of writer processes')
+    parser.add_argument('--heartbeats', type=int, default=200, help='heartbeats of every writer')
+    parser.add_argument('--processes', type=int, default=60, help='running bots in the table of the menu')
+    args = parser.parse_args()
+
+    print('{} writers x {} heartbeats'.format(args.writers, args.heartbeats))
+    columns = ['heartbeats/sec', 'p50 ms', 'p99 ms', 'max ms', 'read p99 ms', 'errors']
+    print('{:<18}'.format('mode') + ''.join('{:>15}'.format(c) for c in columns))
+    for mode in modes:
+        result = run(mode, args.writers, args.heartbeats)
+        print('{:<18}'.format(mode) + ''.join('{:>15,.1f}'.format(result[c]) for c in columns))
+
+    listing, one_by_one = measure_listing(args.processes)
+    print('\nmenu refresh with {} running bots: {:.1f} ms (checking the bots one by one took {:.1f} ms)'.format(
+        args.processes, listing, one_by_one))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compares the single scan extraction of getCity with the previous one, which searched the whole page once for each
+variable. Without a saved page it uses the city fixture, which is synthetic unless recorded pages replaced it (see
+parserBenchmark). Run with: python -m tests.benchmarks.getCityBenchmark [path of a saved city page]
+"""
+import json
+import re
+import sys
+import timeit
+
+from ikabot.helpers.getJson import extract_background_data, extract_city_variables, getCity, getFreeCitizens, \
+    getPopulation, getResourcesListedForSale
+from ikabot.helpers.resources import extract_resource_production, extract_tradegood, extract_tradegood_production, \
+    getAvailableResources, getWarehouseCapacity, getWineConsumptionPerHour
+from tests.benchmarks.anonymize import get_fixtures_origin
+from tests.benchmarks.parserBenchmark import load_fixture, synthetic_warning
+
+
+def extract_one_by_one(html):
+    city = json.loads(re.search(r'"updateBackgroundData",\s?([\s\S]*?)\],\["updateTemplateData"', html).group(1),
+                      strict=False)
+    return city, [getAvailableResources(html, num=True), getWarehouseCapacity(html), getFreeCitizens(html),
+                  getPopulation(html), getWineConsumptionPerHour(html), getResourcesListedForSale(html),
+                  extract_tradegood(html), extract_tradegood_production(html), extract_resource_production(html)]
+
+
+def extract_single_scan(html):
+    return extract_background_data(html), extract_city_variables(html)
+
+
+def measure(function, html, number):
+    return min(timeit.repeat(lambda: function(html), number=number, repeat=5)) / number
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding='utf-8') as file:
+            html = file.read()
+        print('page: {}'.format(sys.argv[1]))
+    else:
+        html = load_fixture('city.html')
+        print('page: {} city fixture{}'.format(get_fixtures_origin(), synthetic_warning()))
+
+    number = 200
+    one_by_one = measure(extract_one_by_one, html, number)
+    single_scan = measure(extract_single_scan, html, number)
+    print('page size:              {:>10,} bytes'.format(len(html)))
+    print('one search per variable: {:>9.3f} ms'.format(one_by_one * 1000))
+    print('single scan:             {:>9.3f} ms'.format(single_scan * 1000))
+    print('getCity:                 {:>9.3f} ms'.format(measure(getCity, html, number) * 1000))
+    print('speedup:                 {:>9.1f}x'.format(one_by_one / single_scan))
+
+
+if __name__ == '__main__':
+    main()
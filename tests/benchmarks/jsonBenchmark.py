@@ -0,0 +1,87 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compares the json libraries which jsonCodec can use on a full world dump (the file written by DumpWorldBot) and on
+the ajax responses of the fixtures directory, and checks that they all give the same results as the json module.
+Without a dump, one is made of the island of the fixtures, repeated for every island of a world.
+Run with: python -m tests.benchmarks.jsonBenchmark [path of a world dump .json.gz] [--duration seconds]
+"""
+import argparse
+import gzip
+import json
+import random
+
+from ikabot.helpers import jsonCodec
+from ikabot.helpers.getJson import getIsland
+from ikabot.helpers.models import Island, to_json_default
+from tests.benchmarks.anonymize import get_fixtures_origin
+from tests.benchmarks.parserBenchmark import load_fixture, measure, synthetic_warning
+
+ajax_fixtures = ['market.json', 'militaryAdvisor.json', 'unitDescription.json', 'cityMilitary.json']
+
+
+def make_world(islands=900, seed=0):
+    """
+    :param islands: int -> number of islands, a world has about 900
+    :param seed: int
+    :return: dict -> the world as DumpWorldBot keeps it before writing it
+    """
+    rnd = random.Random(seed)
+    template = getIsland(load_fixture('island.html'))
+    world = {'name': 's1-en', 'self_name': 'xxxxxx', 'dump_start_date': 1700000000.0, 'shallow': False,
+             'islands': []}
+    for island_id in range(1, islands + 1):
+        island = dict(template, id=str(island_id), name='Island{}'.format(island_id), x=str(island_id % 100 + 1),
+                      y=str(island_id // 100 + 1), resourceLevel=str(rnd.randint(1, 40)))
+        island['cities'] = [dict(city, id=rnd.randint(1, 10 ** 6), name='City{}'.format(rnd.randint(1, 10 ** 6)),
+                                 level=rnd.randint(1, 40)) if city['type'] == 'city' else dict(city)
+                            for city in template['cities']]
+        world['islands'].append(Island.from_dict(island))
+    return world
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the json libraries')
+    parser.add_argument('dump', nargs='?', help='world dump written by DumpWorldBot')
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds to spend on each measurement')
+    args = parser.parse_args()
+
+    if args.dump:
+        with gzip.open(args.dump, 'rb') as file:
+            dump = file.read()
+        world = json.loads(dump)
+        world['islands'] = [Island.from_dict(island) for island in world['islands']]
+    else:
+        world = make_world()
+        dump = json.dumps(world, default=to_json_default).encode('utf-8')
+    expected_world = json.loads(dump)
+    responses = {name: load_fixture(name) for name in ajax_fixtures}
+    expected_responses = {name: json.loads(text, strict=False) for name, text in responses.items()}
+
+    print('fixtures: {} pages{}'.format(get_fixtures_origin(), synthetic_warning()))
+    print('world dump: {:,} islands, {:,} bytes{}'.format(len(expected_world['islands']), len(dump),
+                                                        '' if args.dump else ', made of the island fixture'))
+    print('{:<8} {:>14} {:>14} {:>14}'.format('library', 'load dump ms', 'write dump ms', 'ajax loads/sec'))
+    baseline = None
+    for name in ['json', 'orjson', 'ujson']:
+        if jsonCodec.set_backend(name) != name:
+            print('{:<8} not installed'.format(name))
+            continue
+        assert jsonCodec.loads(dump) == expected_world, name
+        assert json.loads(jsonCodec.dumps_bytes(world, default=to_json_default)) == expected_world, name
+        for fixture, text in responses.items():
+            assert jsonCodec.loads(text, strict=False) == expected_responses[fixture], (name, fixture)
+
+        load = measure(lambda: jsonCodec.loads(dump), args.duration)
+        write = measure(lambda: jsonCodec.dumps_bytes(world, default=to_json_default), args.duration)
+        ajax = measure(lambda: [jsonCodec.loads(text, strict=False) for text in responses.values()], args.duration)
+        result = (1000 / load['ops'], 1000 / write['ops'], ajax['ops'] * len(responses))
+        if baseline is None:
+            baseline = result
+        print('{:<8} {:>14.1f} {:>14.1f} {:>14,.0f}   ({:.1f}x, {:.1f}x, {:.1f}x)'.format(
+            name, *result, baseline[0] / result[0], baseline[1] / result[1], result[2] / baseline[2]))
+    jsonCodec.set_backend('auto')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measures the parsers of the game pages on the saved pages of the fixtures directory (see anonymize.py): operations
+per second and the memory allocated by one call. Save a baseline before changing a parser and compare with it after.
+The fixtures in the repository are synthetic pages of the mock server (see fixtures/ORIGIN), so the results compare
+two versions of a parser, they are not the times on real pages until recorded pages replace them.
+Run with: python -m tests.benchmarks.parserBenchmark [--save baseline.json] [--baseline baseline.json] [--filter name]
+"""
+import argparse
+import gzip
+import json
+import os
+import time
+import tracemalloc
+
+from ikabot.bot.islandMonitoringBot import IslandMonitoringBot
+from ikabot.helpers.barbarians import get_units
+from ikabot.helpers.getJson import getCity, getIsland
+from ikabot.helpers.market import onSellInMarket, storageCapacityOfMarket
+from ikabot.helpers.naval import TransportShip, fetch_transport_ships_size, get_military_and_see_movements
+from ikabot.helpers.resources import getAvailableResources, getWarehouseCapacity, getWineConsumptionPerHour
+from tests.benchmarks.anonymize import fixtures_dir, get_fixtures_origin
+
+
+def load_fixture(name):
+    """
+    :param name: str -> e.g. city.html
+    :return: str
+    """
+    with gzip.open(os.path.join(fixtures_dir, name + '.gz'), 'rt', encoding='utf-8') as file:
+        return file.read()
+
+
+class ReplayService:
+    """
+    Answers every request of the helpers with the same saved response
+    """
+
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, url='', params={}, ignoreExpire=False, noIndex=False, fullResponse=False, parseJson=False):
+        return json.loads(self.response, strict=False) if parseJson else self.response
+
+    def post(self, url='', payloadPost={}, params={}, ignoreExpire=False, noIndex=False, parseJson=False):
+        return json.loads(self.response, strict=False) if parseJson else self.response
+
+
+def get_parsers():
+    """
+    :return: list[(str, callable())] -> name of the parser and a call of it on its fixture
+    """
+    city = load_fixture('city.html')
+    island = load_fixture('island.html')
+    market = json.loads(load_fixture('market.json'))[1][1][1]
+    military_advisor = ReplayService(load_fixture('militaryAdvisor.json'))
+    city_military = ReplayService(load_fixture('cityMilitary.json'))
+    unit_description = ReplayService(load_fixture('unitDescription.json'))
+    return [
+        ('getJson.getCity', lambda: getCity(city)),
+        ('getJson.getIsland', lambda: getIsland(island)),
+        ('IslandMonitoringBot.extract_current_city_name_from_selector',
+         lambda: IslandMonitoringBot.extract_current_city_name_from_selector(island)),
+        ('resources.getAvailableResources', lambda: getAvailableResources(city, num=True)),
+        ('resources.getWarehouseCapacity', lambda: getWarehouseCapacity(city)),
+        ('resources.getWineConsumptionPerHour', lambda: getWineConsumptionPerHour(city)),
+        ('market.onSellInMarket', lambda: onSellInMarket(market)),
+        ('market.storageCapacityOfMarket', lambda: storageCapacityOfMarket(market)),
+        ('naval.get_military_and_see_movements', lambda: get_military_and_see_movements(military_advisor, 1)),
+        ('barbarians.get_units', lambda: get_units(city_military, {'id': 1})),
+        ('naval.fetch_transport_ships_size',
+         lambda: fetch_transport_ships_size(unit_description, 1, TransportShip.TRANSPORT_SHIP)),
+    ]
+
+
+def synthetic_warning():
+    """
+    :return: str -> the label of the results on synthetic fixtures
+    """
+    if get_fixtures_origin() == 'recorded':
+        return ''
+    return ' (mock server pages, not captured from the game: the results don\'t show the times on real pages)'
+
+
+def measure(function, duration):
+    """
+    :param function: callable()
+    :param duration: float -> seconds to spend on the measurement of the speed
+    :return: dict -> operations per second and KiB allocated by one call at its peak
+    """
+    function()  # warm up the caches of the regular expressions
+    calls = 0
+    started = time.perf_counter()
+    elapsed = 0
+    while elapsed < duration:
+        for _ in range(10):
+            function()
+        calls += 10
+        elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'ops': calls / elapsed, 'peakKiB': peak / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the parsers of the game pages')
+    parser.add_argument('--duration', type=float, default=1.0, help='seconds to spend on each parser')
+    parser.add_argument('--filter', default='', help='measure only the parsers which contain this text')
+    parser.add_argument('--save', help='write the results to this json file')
+    parser.add_argument('--baseline', help='compare the results with this json file')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    results = {}
+    print('fixtures: {} pages{}\n'.format(get_fixtures_origin(), synthetic_warning()))
+    print('{:<60} {:>12} {:>12} {:>10}'.format('parser', 'ops/sec', 'peak KiB', 'vs base'))
+    for name, function in get_parsers():
+        if args.filter not in name:
+            continue
+        results[name] = measure(function, args.duration)
+        change = ''
+        if name in baseline:
+            change = '{:.2f}x'.format(results[name]['ops'] / baseline[name]['ops'])
+        print('{:<60} {:>12,.0f} {:>12,.1f} {:>10}'.format(name, results[name]['ops'], results[name]['peakKiB'], change))
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Soak test of many bots of one account against the mock server (tests/web/mockIkariamServer.py), without network: N
+forked processes read their cities, send writes and heartbeats for a while, like the bots do, through the shared
+rate limiter and the same database file. Reports the requests per second which reached the server, the latencies of
+the bots, the database lock errors and the memory of a bot.
+Run with: python -m tests.benchmarks.soakBenchmark [--bots 50] [--duration 60] [--rate 4] [--cities 5]
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import shutil
+import sqlite3
+import tempfile
+import time
+import traceback
+from contextlib import redirect_stdout
+from io import StringIO
+
+import psutil
+
+from ikabot import config
+from ikabot.config import actionRequest, city_url
+from ikabot.helpers.database import Database
+from ikabot.helpers.getJson import get_city
+from ikabot.helpers.ikabotProcessListManager import IkabotProcessListManager, ProcessStatus
+from ikabot.migrations.migrate import apply_migrations
+from ikabot.web.ikariamService import IkariamService
+from tests.web.mockIkariamServer import MockIkariamServer, MockWorld
+
+
+def _bot(number, db_file, params, cities_ids, duration, start, results):
+    config.DB_FILE = db_file
+    config.application_params = dict(params)
+    start.wait()
+    db = Database('soak', batch_interval=float(params.get('dbBatchInterval', 5)))
+    manager = IkabotProcessListManager(db)
+    service = IkariamService(db, None)
+    latencies = []
+    lock_errors = 0
+    errors = 0
+    try:
+        manager.upsert_process({'action': 'soak', 'status': ProcessStatus.RUNNING})
+        started = time.time()
+        i = number
+        while time.time() - started < duration:
+            city_id = cities_ids[i % len(cities_ids)]
+            i += 1
+            request_started = time.perf_counter()
+            try:
+                if i % 4 == 0:
+                    service.post(params={'action': 'header', 'function': 'changeCurrentCity',
+                                         'actionRequest': actionRequest, 'cityId': city_id, 'ajax': 1})
+                elif i % 4 == 1:
+                    service.get(city_url + str(city_id))
+                else:
+                    get_city(service, city_id)
+                latencies.append(time.perf_counter() - request_started)
+                manager.upsert_process({'info': 'request {}'.format(i)}, batched=True)
+            except sqlite3.OperationalError:
+                lock_errors += 1
+            except Exception:
+                errors += 1
+                if errors == 1:
+                    print('bot {} failed:\n{}'.format(number, traceback.format_exc()))
+        db.flush()
+    finally:
+        rss = psutil.Process().memory_info().rss
+        db.close_db_conn()
+        results.put((latencies, lock_errors, errors, rss))
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+
+def run(bots, duration, rate, cities):
+    """
+    :param bots: int -> number of forked bots
+    :param duration: float -> seconds for which every bot sends requests
+    :param rate: float -> requests per second of the rate limiter of the account
+    :param cities: int -> cities of the mock world
+    :return: dict
+    """
+    directory = tempfile.mkdtemp()
+    db_file = os.path.join(directory, 'ikabot.db')
+    world = MockWorld(cities=cities)
+    server = MockIkariamServer(world).start()
+    params = {'mockServerUrl': server.url, 'rateLimitPerSecond': rate, 'rateLimitBurst': max(1, int(rate * 2))}
+    context = multiprocessing.get_context('fork')
+    start = context.Event()
+    results = context.Queue()
+    try:
+        config.DB_FILE = db_file
+        with redirect_stdout(StringIO()):
+            apply_migrations()
+        processes = [context.Process(target=_bot, args=(number, db_file, params, sorted(world.cities), duration,
+                                                        start, results)) for number in range(bots)]
+        for process in processes:
+            process.start()
+        started = time.time()
+        start.set()
+        collected = []
+        while len(collected) < bots:
+            try:
+                collected.append(results.get(timeout=duration + 60))
+            except queue.Empty:
+                break
+        elapsed = time.time() - started
+        for process in processes:
+            process.join(10)
+        stats = world.get_stats()
+    finally:
+        server.shutdown()
+        shutil.rmtree(directory)
+
+    latencies = [latency for result in collected for latency in result[0]]
+    return {
+        'bots': len(collected),
+        'server requests/sec': sum(stats.values()) / elapsed,
+        'bot requests': len(latencies),
+        'p50 ms': _percentile(latencies, 0.5) * 1000,
+        'p99 ms': _percentile(latencies, 0.99) * 1000,
+        'db lock errors': sum(result[1] for result in collected),
+        'other errors': sum(result[2] for result in collected),
+        'bot rss MiB': max((result[3] for result in collected), default=0) / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Soak test of many bots against the mock server')
+    parser.add_argument('--bots', type=int, default=50, help='number of forked bots')
+    parser.add_argument('--duration', type=float, default=60, help='seconds for which the bots send requests')
+    parser.add_argument('--rate', type=float, default=4, help='requests per second allowed to the account')
+    parser.add_argument('--cities', type=int, default=5, help='cities of the mock world')
+    args = parser.parse_args()
+
+    print('{} bots for {:.0f} seconds, {} requests/sec allowed'.format(args.bots, args.duration, args.rate))
+    result = run(args.bots, args.duration, args.rate, args.cities)
+    for name, value in result.items():
+        print('{:<22}{:>12,.1f}'.format(name, value))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import tempfile
+import unittest
+
+from tests.benchmarks.anonymize import anonymize, get_fixtures_origin, set_fixtures_origin
+from tests.benchmarks.parserBenchmark import get_parsers
+
+
+class TestParserBenchmark(unittest.TestCase):
+    def test_parsers_work_on_the_fixtures(self):
+        for name, function in get_parsers():
+            with self.subTest(name):
+                self.assertIsNotNone(function())
+
+    def test_anonymize(self):
+        text = ('actionRequest: "0123456789abcdef0123456789abcdef", "ownerName":"Pericles", '
+                '{\\"avatarName\\":\\"Aspasia\\"} <span class="avatarName">Pericles</span>')
+        self.assertEqual(anonymize(text), 'actionRequest: "00000000000000000000000000000000", "ownerName":"xxxxxxxx", '
+                                          '{\\"avatarName\\":\\"xxxxxxx\\"} <span class="avatarName">xxxxxxxx</span>')
+
+    def test_fixtures_origin(self):
+        # the fixtures of the repository are mock server pages
+        self.assertEqual('synthetic', get_fixtures_origin())
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual('synthetic', get_fixtures_origin(directory))
+            set_fixtures_origin('recorded', 'Pages recorded in session.json.gz', directory)
+            self.assertEqual('recorded', get_fixtures_origin(directory))
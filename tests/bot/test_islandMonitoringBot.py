@@ -188,3 +188,15 @@ class IslandMonitoringBot_TestMonitorPiracy(unittest.TestCase):
         # Assert the expected result
         expected_result = {}
         self.assertEqual(result, expected_result)
+
+
+class IslandMonitoringBot_TestExtractCurrentCityName(unittest.TestCase):
+    def test_selected_option(self):
+        html = ('<select id="js_homeCitySelect" class="dropDownButton"><option value="1">[1:2] First</option>'
+                '<option value="2" class="coords" selected="selected">[3:4] Rock &amp; Roll </option></select>')
+        self.assertEqual(IslandMonitoringBot.extract_current_city_name_from_selector(html), '[3:4] Rock & Roll')
+
+    def test_unexpected_markup_is_parsed_as_tree(self):
+        html = ('<select id="js_homeCitySelect"><option value="1">[1:2] First</option>'
+                '<option value="2" selected><b>[3:4]</b> Second</option></select>')
+        self.assertEqual(IslandMonitoringBot.extract_current_city_name_from_selector(html), '[3:4] Second')
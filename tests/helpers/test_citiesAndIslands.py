@@ -0,0 +1,45 @@
+import unittest
+from collections import Counter
+
+from ikabot.helpers.citiesAndIslands import changeCurrentCity
+from ikabot.web.accountState import AccountState
+
+
+class FakeIkariamService:
+    def __init__(self):
+        self.account_state = AccountState()
+        self.metrics = Counter()
+        self.posts = []
+        self.gets = 0
+
+    def get(self, url='', params={}, **kwargs):
+        self.gets += 1
+        return 'currentCityId: 1,'
+
+    def post(self, url='', payloadPost={}, params={}, **kwargs):
+        self.posts.append(params)
+        self.account_state.set('current_city_id', int(params['cityId']))
+        return []
+
+
+class TestChangeCurrentCity(unittest.TestCase):
+    def test_always_switch(self):
+        # another process can select another city at any moment
+        service = FakeIkariamService()
+        service.account_state.set('current_city_id', 1)
+
+        changeCurrentCity(service, 1)
+        changeCurrentCity(service, 2)
+
+        self.assertEqual([p['cityId'] for p in service.posts], [1, 2])
+        self.assertEqual([p['currentCityId'] for p in service.posts], ['1', '1'])
+        self.assertEqual(service.metrics, Counter({'citySwitches': 2}))
+        # the current city of the switch was known, no page was loaded for it
+        self.assertEqual(service.gets, 0)
+
+    def test_stale_city_is_read_from_the_page(self):
+        service = FakeIkariamService()
+
+        changeCurrentCity(service, 2)
+        self.assertEqual(service.gets, 1)
+        self.assertEqual(service.posts[0]['currentCityId'], '1')
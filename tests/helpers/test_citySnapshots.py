@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from ikabot import config
+from ikabot.helpers import citySnapshots
+from ikabot.helpers.database import Database
+from ikabot.helpers.getJson import get_city, getCity
+from ikabot.migrations.migrate import apply_migrations
+from ikabot.web.parsedCache import ParsedCache
+from tests.benchmarks.parserBenchmark import load_fixture
+
+day = 24 * 60 * 60
+
+
+def make_city(wine, level=1):
+    return {
+        'id': '42',
+        'availableResources': [1000, wine, 0, 0, 0],
+        'productionPerHour': [100, 50, 0, 0, 0],
+        'wineConsumptionPerHour': 20,
+        'storageCapacity': 2000,
+        'position': [
+            {'position': 0, 'building': 'townHall', 'level': level},
+            {'position': 1, 'building': 'empty', 'type': 'sea'},
+        ],
+    }
+
+
+class _IkariamService:
+    def __init__(self, db):
+        self.db = db
+        self.parsed_cache = ParsedCache()
+        self.html = load_fixture('city.html')
+
+    def get(self, url=''):
+        return self.html
+
+
+class _BrokenDatabase:
+    def store_city_snapshot(self, city_id, buckets, recorded_at, data):
+        raise ValueError('database is broken')
+
+
+class TestCitySnapshots(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_file = config.DB_FILE
+        config.DB_FILE = os.path.join(self.directory, 'ikabot.db')
+        with redirect_stdout(StringIO()):
+            apply_migrations()
+        self.db = Database('bot')
+        citySnapshots._last_recorded.clear()
+
+    def tearDown(self):
+        self.db.close_db_conn()
+        config.DB_FILE = self.db_file
+        shutil.rmtree(self.directory)
+
+    def test_latest_snapshot(self):
+        now = 1700000000
+        self.assertIsNone(citySnapshots.get_latest_city_snapshot(self.db, 42, now=now))
+        self.assertTrue(citySnapshots.record_city(self.db, make_city(100), now=now))
+        # parsed again right away, not written
+        self.assertFalse(citySnapshots.record_city(self.db, make_city(200), now=now + 1))
+
+        snapshot = citySnapshots.get_latest_city_snapshot(self.db, '42', now=now + 60)
+        self.assertEqual(now, snapshot['time'])
+        self.assertEqual([1000, 100, 0, 0, 0], snapshot['availableResources'])
+        self.assertEqual([{'position': 0, 'building': 'townHall', 'level': 1}], snapshot['buildings'])
+        self.assertIsNone(citySnapshots.get_latest_city_snapshot(self.db, 42, max_age=30, now=now + 60))
+        # two hours later 100 + 2 * (50 - 20) wine
+        self.assertEqual([1200, 160, 0, 0, 0],
+                         citySnapshots.estimate_available_resources(snapshot, at=now + 2 * 60 * 60))
+
+    def test_downsampled_history(self):
+        start = 1700000000 // day * day
+        for minute in range(0, 3 * day // 60, 30):
+            city = make_city(minute, level=minute // (day // 60) + 1)
+            citySnapshots.record_city(self.db, city, now=start + minute * 60)
+        now = start + 3 * day
+
+        # the last day is in the tier of the minutes, an older period in the tier of the hours
+        recent = citySnapshots.get_city_history(self.db, 42, now - 2 * 60 * 60, now=now)
+        self.assertEqual(4, len(recent))
+        older = citySnapshots.get_city_history(self.db, 42, start, start + day - 1, now=now)
+        self.assertEqual(24, len(older))
+        self.assertEqual(list(range(30, 24 * 60, 60)), [s['availableResources'][1] for s in older])
+
+        # the rows of the minutes older than a day are deleted
+        citySnapshots._last_pruned = 0
+        citySnapshots.record_city(self.db, make_city(0), now=now)
+        self.assertEqual([], self.db.get_city_snapshots(42, 0, start, now - day - 60))
+        self.assertEqual(24, len(self.db.get_city_snapshots(42, 1, start, start + day - 1)))
+
+    def test_fetched_cities_are_recorded(self):
+        service = _IkariamService(self.db)
+        city = getCity(service.html)
+        # parsing alone doesn't write anything
+        self.assertIsNone(citySnapshots.get_latest_city_snapshot(self.db, city['id']))
+
+        self.assertEqual(city, get_city(service, city['id']))
+        snapshot = citySnapshots.get_latest_city_snapshot(self.db, city['id'])
+        self.assertEqual(city['availableResources'], snapshot['availableResources'])
+
+        # a snapshot which can't be written doesn't fail the loading of the city
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(city, get_city(_IkariamService(_BrokenDatabase()), city['id']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+from contextlib import closing, redirect_stdout
+from io import StringIO
+
+from ikabot import config
+from ikabot.helpers.database import Database
+from ikabot.migrations.migrate import apply_migrations, switch_to_incremental_vacuum
+
+
+class TestDatabase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_file = config.DB_FILE
+        config.DB_FILE = os.path.join(self.directory, 'ikabot.db')
+        with redirect_stdout(StringIO()):
+            apply_migrations()
+
+    def tearDown(self):
+        config.DB_FILE = self.db_file
+        shutil.rmtree(self.directory)
+
+    def read_committed(self, column):
+        with closing(sqlite3.connect(config.DB_FILE)) as conn:
+            return [row[0] for row in conn.execute('SELECT {} FROM processes ORDER BY pid'.format(column))]
+
+    def test_write_ahead_log(self):
+        db = Database('bot')
+        with closing(sqlite3.connect(config.DB_FILE)) as conn:
+            self.assertEqual('wal', conn.execute('PRAGMA journal_mode').fetchone()[0])
+        db.close_db_conn()
+
+    def test_batched_writes(self):
+        db = Database('bot', batch_interval=60)
+        process = {'pid': 1, 'action': 'a', 'status': 'running', 'lastActionTime': 1}
+        db.set_process(process)
+
+        self.assertTrue(db.update_process(1, {'status': 'waiting', 'nextAction': None}, batched=True))
+        self.assertTrue(db.update_process(1, {'info': 'heartbeat'}, batched=True))
+        self.assertEqual(['running'], self.read_committed('status'))
+
+        # the reads of the connection see the batched writes
+        self.assertEqual([('waiting', 'heartbeat')], [(p['status'], p['info']) for p in db.get_processes()])
+        self.assertEqual(['waiting'], self.read_committed('status'))
+
+        # a batched update of a process which isn't in the table is not kept in memory
+        self.assertFalse(db.update_process(2, {'info': 'heartbeat'}, batched=True))
+
+        db.update_process(1, {'info': 'last'}, batched=True)
+        db.set_process(dict(process, pid=3))
+        self.assertEqual(['last', None], self.read_committed('info'))
+
+        db.update_process(3, {'info': 'closed'}, batched=True)
+        db.close_db_conn()
+        self.assertEqual(['last', 'closed'], self.read_committed('info'))
+
+    def test_old_batched_writes_are_committed_without_a_new_write(self):
+        db = Database('bot', batch_interval=0.05)
+        db.set_process({'pid': 1, 'action': 'a', 'status': 'running', 'lastActionTime': 1})
+        db.update_process(1, {'status': 'waiting'}, batched=True)
+
+        self.assertFalse(db.flush_if_due())
+        self.assertEqual(['running'], self.read_committed('status'))
+        time.sleep(0.1)
+        self.assertTrue(db.flush_if_due())
+        self.assertEqual(['waiting'], self.read_committed('status'))
+        self.assertFalse(db.flush_if_due())
+        db.close_db_conn()
+
+    def test_not_batched_without_interval(self):
+        db = Database('bot')
+        db.set_process({'pid': 1, 'action': 'a', 'status': 'running', 'lastActionTime': 1})
+        db.update_process(1, {'status': 'waiting'}, batched=True)
+        self.assertEqual(['waiting'], self.read_committed('status'))
+        db.close_db_conn()
+
+    def test_storage_version(self):
+        db = Database('bot')
+        other = Database('other')
+        version = db.get_storage_version()
+        db.set_process({'pid': 1, 'action': 'a', 'status': 'running', 'lastActionTime': 1})
+        db.update_process(1, {'lastActionTime': 2})
+        other.store_value('cookies', {'a': 'b'})
+        self.assertEqual(version, db.get_storage_version())
+
+        Database('bot').store_value('cookies', {'a': 'b'})
+        self.assertNotEqual(version, db.get_storage_version())
+        version = db.get_storage_version()
+        db.store_value('proxy', {'set': False})
+        self.assertNotEqual(version, db.get_storage_version())
+        db.close_db_conn()
+        other.close_db_conn()
+
+    def test_expired_processes_are_deleted_at_once(self):
+        db = Database('bot')
+        other = Database('other')
+        for pid, status, next_action_time in [(1, 'done', 10), (2, 'error', 10), (3, 'done', 30), (4, 'running', 10),
+                                              (5, 'done', None)]:
+            db.set_process({'pid': pid, 'action': 'a', 'status': status, 'lastActionTime': 1,
+                            'nextActionTime': next_action_time})
+        other.set_process({'pid': 6, 'action': 'a', 'status': 'done', 'lastActionTime': 1, 'nextActionTime': 10})
+
+        self.assertEqual(2, db.delete_expired_processes(['done', 'error'], now=20))
+        self.assertEqual([3, 4, 5, 6], self.read_committed('pid'))
+
+        with closing(sqlite3.connect(config.DB_FILE)) as conn:
+            # switched by the migrations, optimize never runs a full vacuum
+            self.assertEqual(2, conn.execute('PRAGMA auto_vacuum').fetchone()[0])
+            plan = conn.execute('EXPLAIN QUERY PLAN SELECT * FROM processes WHERE botName = ? AND targetCity = ?',
+                                ('bot', 'Polis')).fetchall()
+        self.assertIn('processes_target_city', str(plan))
+
+        db.optimize()
+        with closing(sqlite3.connect(config.DB_FILE)) as conn:
+            # the statistics of the indexes were collected
+            self.assertIn(('processes',), conn.execute('SELECT DISTINCT tbl FROM sqlite_stat1').fetchall())
+        db.close_db_conn()
+        other.close_db_conn()
+
+    def auto_vacuum(self):
+        with closing(sqlite3.connect(config.DB_FILE)) as conn:
+            return conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+
+    def reset_auto_vacuum(self):
+        # a database created before the switch
+        with closing(sqlite3.connect(config.DB_FILE, isolation_level=None)) as conn:
+            conn.execute('PRAGMA auto_vacuum = NONE')
+            conn.execute('VACUUM')
+        self.assertEqual(0, self.auto_vacuum())
+
+    def test_migrations_with_another_connection_open(self):
+        self.reset_auto_vacuum()
+        other = Database('other')
+        other.set_process({'pid': 1, 'action': 'a', 'status': 'done', 'lastActionTime': 1})
+        other.delete_process(1)
+        with redirect_stdout(StringIO()):
+            apply_migrations()
+        self.assertEqual(2, self.auto_vacuum())
+        other.close_db_conn()
+
+    def test_switch_is_deferred_while_another_connection_is_writing(self):
+        self.reset_auto_vacuum()
+        other = sqlite3.connect(config.DB_FILE, isolation_level=None)
+        other.execute('BEGIN IMMEDIATE')
+        other.execute("INSERT INTO processes (pid, botName, action, status, lastActionTime) "
+                      "VALUES (1, 'other', 'a', 'running', 1)")
+        with self.assertLogs(level='WARNING'):
+            self.assertFalse(switch_to_incremental_vacuum())
+        self.assertEqual(0, self.auto_vacuum())
+        other.execute('ROLLBACK')
+        other.close()
+
+        # at the next start
+        self.assertTrue(switch_to_incremental_vacuum())
+        self.assertEqual(2, self.auto_vacuum())
+
+    def test_switch_is_deferred_while_bots_are_running(self):
+        self.reset_auto_vacuum()
+        db = Database('bot')
+        db.set_process({'pid': os.getppid(), 'action': 'a', 'status': 'running', 'lastActionTime': 1})
+        self.assertFalse(switch_to_incremental_vacuum())
+        self.assertEqual(0, self.auto_vacuum())
+
+        db.delete_process(os.getppid())
+        self.assertTrue(switch_to_incremental_vacuum())
+        self.assertEqual(2, self.auto_vacuum())
+        db.close_db_conn()
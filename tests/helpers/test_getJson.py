@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from ikabot import config
+from ikabot.helpers.database import Database
+from ikabot.helpers.getJson import extract_city_variables, get_city, getCity
+from ikabot.helpers.resources import extract_resource_production, extract_tradegood, extract_tradegood_production, \
+    getWineConsumptionPerHour
+from ikabot.migrations.migrate import apply_migrations
+from ikabot.web.ikariamService import IkariamService
+from tests.web.mockIkariamServer import MockIkariamServer, MockWorld
+
+
+class TestExtractCityVariables(unittest.TestCase):
+    def setUp(self):
+        world = MockWorld(cities=1)
+        self.city_id = next(iter(world.cities))
+        _, self.html = world.handle({'view': 'city', 'cityId': str(self.city_id)})
+
+    def test_city_page(self):
+        city = getCity(self.html)
+        self.assertEqual(city['id'], str(self.city_id))
+        self.assertEqual(len(city['availableResources']), 5)
+        self.assertEqual(city['freeSpaceForResources'][0],
+                         city['storageCapacity'] - city['availableResources'][0] - city['resourcesListedForSale'][0])
+
+    def test_same_as_the_helpers_without_script_block(self):
+        html = self.html.replace('dataSetForView', 'otherView')
+        self.assertEqual(extract_city_variables(html), extract_city_variables(self.html))
+
+    def test_unexpected_values_fall_back_to_the_helpers(self):
+        html = (self.html.replace('wineSpendings: ', 'wineSpendings:  ')
+                .replace('producedTradegood: "', 'producedTradegood: "x')
+                .replace('resourceProduction: ', 'resourceProduction: 1e'))
+        variables = extract_city_variables(html)
+        self.assertEqual(variables['wineConsumptionPerHour'], getWineConsumptionPerHour(html))
+        self.assertEqual(variables['producedTradegood'], extract_tradegood(html))
+        self.assertEqual(variables['tradegoodProductionPerSecond'], extract_tradegood_production(html))
+        self.assertEqual(variables['resourceProductionPerSeconds'], extract_resource_production(html))
+
+
+class TestGetCity(unittest.TestCase):
+    def setUp(self):
+        self.db_file, self.params = config.DB_FILE, dict(config.application_params)
+        self.directory = tempfile.mkdtemp()
+        self.world = MockWorld(cities=2)
+        self.server = MockIkariamServer(self.world).start()
+        config.DB_FILE = os.path.join(self.directory, 'ikabot.db')
+        config.application_params['mockServerUrl'] = self.server.url
+        with redirect_stdout(StringIO()):
+            apply_migrations()
+        self.db = Database('bot')
+        self.service = IkariamService(self.db, None)
+
+    def tearDown(self):
+        self.service.logout()
+        self.db.close_db_conn()
+        self.server.shutdown()
+        config.DB_FILE = self.db_file
+        config.application_params.clear()
+        config.application_params.update(self.params)
+        shutil.rmtree(self.directory)
+
+    def test_selected_city(self):
+        first, second = sorted(self.world.cities)
+        get_city(self.service, first)
+        get_city(self.service, second)
+        self.assertEqual(second, self.world.current_city_id)
+
+        # reused, the server still has the other city selected
+        self.assertEqual(str(first), get_city(self.service, first)['id'])
+        self.assertEqual(second, self.world.current_city_id)
+
+        # got again, so the write which follows is for the right city
+        self.assertEqual(str(first), get_city(self.service, first, select=True)['id'])
+        self.assertEqual(first, self.world.current_city_id)
+        stats = self.world.get_stats()
+        self.assertEqual(str(first), get_city(self.service, first, select=True)['id'])
+        self.assertEqual(stats, self.world.get_stats())
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+import psutil
+
+from ikabot import config
+from ikabot.helpers.database import Database
+from ikabot.helpers.ikabotProcessListManager import IkabotProcessListManager, ProcessStatus, \
+    _determine_process_special_action, _get_running_processes, _ProcessSpecialAction
+from ikabot.migrations.migrate import apply_migrations
+
+
+class TestProcessLiveness(unittest.TestCase):
+    name = 'python'
+
+    def action(self, process, running_process):
+        return _determine_process_special_action(dict({'pid': 7, 'status': ProcessStatus.RUNNING}, **process),
+                                                 self.name, running_process)
+
+    def test_running_process(self):
+        running = {'pid': 7, 'name': self.name, 'status': psutil.STATUS_SLEEPING, 'create_time': 100.0}
+        self.assertIsNone(self.action({'createTime': 100.0}, running))
+        self.assertIsNone(self.action({'createTime': None}, running))
+        self.assertIsNone(self.action({}, dict(running, status=None, create_time=None)))
+        # psutil can't read the name
+        self.assertIsNone(self.action({}, dict(running, name=None)))
+        # a live bot which got the pid of a dead one and has written the row since, with a stale createTime
+        self.assertEqual(_ProcessSpecialAction.SET_CREATE_TIME,
+                         self.action({'createTime': 50.0, 'lastActionTime': 150.0}, running))
+
+    def test_dead_process(self):
+        running = {'pid': 7, 'name': self.name, 'status': psutil.STATUS_SLEEPING, 'create_time': 100.0}
+        self.assertEqual(_ProcessSpecialAction.SET_TERMINATED_STATUS, self.action({}, None))
+        # the pid was reused by another process, which started after the last write of the row
+        self.assertEqual(_ProcessSpecialAction.SET_TERMINATED_STATUS,
+                         self.action({'createTime': 50.0, 'lastActionTime': 60.0}, running))
+        self.assertEqual(_ProcessSpecialAction.SET_TERMINATED_STATUS, self.action({'createTime': 50.0}, running))
+        self.assertEqual(_ProcessSpecialAction.HAS_DIFFERENT_NAME, self.action({}, dict(running, name='bash')))
+        self.assertEqual(_ProcessSpecialAction.SET_ZOMBIE,
+                         self.action({}, dict(running, status=psutil.STATUS_ZOMBIE)))
+        self.assertIsNone(self.action({'status': ProcessStatus.ZOMBIE, 'nextActionTime': time.time() + 30},
+                                      dict(running, status=psutil.STATUS_ZOMBIE)))
+
+    def test_finished_process(self):
+        self.assertEqual(_ProcessSpecialAction.SET_DELETION_TIME, self.action({'status': ProcessStatus.DONE}, None))
+        self.assertEqual(_ProcessSpecialAction.HAS_EXPIRED_SHOWTIME,
+                         self.action({'status': ProcessStatus.DONE, 'nextActionTime': time.time() - 1}, None))
+
+    def test_snapshot(self):
+        own = _get_running_processes()[os.getpid()]
+        self.assertEqual(psutil.Process().name(), own['name'])
+        self.assertEqual(psutil.Process().create_time(), own['create_time'])
+
+
+class TestProcessListManager(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_file = config.DB_FILE
+        config.DB_FILE = os.path.join(self.directory, 'ikabot.db')
+        with redirect_stdout(StringIO()):
+            apply_migrations()
+        self.db = Database('bot')
+        self.manager = IkabotProcessListManager(self.db)
+
+    def tearDown(self):
+        self.db.close_db_conn()
+        config.DB_FILE = self.db_file
+        shutil.rmtree(self.directory)
+
+    def test_reused_pid_replaces_the_row_of_the_dead_process(self):
+        pid = os.getpid()
+        self.db.set_process({'pid': pid, 'action': 'old', 'status': ProcessStatus.RUNNING, 'lastActionTime': 1,
+                             'info': 'old info', 'createTime': 12345.0})
+
+        self.manager.upsert_process({'action': 'new', 'objective': 'o', 'targetCity': None,
+                                     'status': ProcessStatus.INITIALIZED})
+
+        process = self.manager.get_process_list([['pid', '==', pid]])[0]
+        self.assertEqual(ProcessStatus.INITIALIZED, process['status'])
+        self.assertEqual('new', process['action'])
+        self.assertIsNone(process['info'])
+        self.assertEqual(psutil.Process().create_time(), process['createTime'])
+
+    def test_live_bot_on_a_reused_pid_stays_alive(self):
+        pid = os.getpid()
+        self.db.set_process({'pid': pid, 'action': 'old', 'status': ProcessStatus.RUNNING, 'lastActionTime': 1,
+                             'createTime': 12345.0})
+        self.manager.upsert_process({'action': 'new', 'status': ProcessStatus.INITIALIZED})
+        self.manager.upsert_process({'status': ProcessStatus.RUNNING, 'info': 'working'})
+
+        for _ in range(2):
+            process = self.manager.get_process_list([['pid', '==', pid]])[0]
+            self.assertEqual(ProcessStatus.RUNNING, process['status'])
+            self.assertEqual('working', process['info'])
+
+        # a row written by the live bot before the fix of its createTime is repaired, not terminated
+        self.db.update_process(pid, {'createTime': 12345.0})
+        process = self.manager.get_process_list([['pid', '==', pid]])[0]
+        self.assertEqual(ProcessStatus.RUNNING, process['status'])
+        self.assertEqual(psutil.Process().create_time(), self.db.get_processes([['pid', '==', pid]])[0]['createTime'])
@@ -0,0 +1,47 @@
+import json
+import unittest
+
+from ikabot.helpers import jsonCodec
+
+
+class TestJsonCodec(unittest.TestCase):
+    documents = [
+        '[["updateGlobalData",{"headerData":{"wood":1.5,"name":"\\u00c1thina"}}],["changeView",["x","<div/>"]]]',
+        '{"text":"line\nbreak\ttab"}',  # control characters, allowed by strict=False
+        '[NaN,-Infinity]',
+        '{"a":1,"a":2}',
+    ]
+
+    def tearDown(self):
+        jsonCodec.set_backend('auto')
+
+    def test_same_results_as_json(self):
+        for backend in ['auto', 'json', 'orjson', 'ujson']:
+            jsonCodec.set_backend(backend)
+            for document in self.documents:
+                with self.subTest(backend=backend, document=document):
+                    expected = json.loads(document, strict=False)
+                    self.assertEqual(repr(expected), repr(jsonCodec.loads(document, strict=False)))
+                    self.assertEqual(repr(expected), repr(jsonCodec.loads(document.encode('utf-8'), strict=False)))
+                    if 'NaN' not in document:  # orjson writes NaN and infinity, which are not json, as null
+                        self.assertEqual(repr(expected), repr(json.loads(jsonCodec.dumps(expected))))
+            self.assertRaises(json.JSONDecodeError, jsonCodec.loads, self.documents[1])
+
+    def test_huge_integers(self):
+        document = '{"big":123456789012345678901234567890}'
+        jsonCodec.set_backend('json')
+        self.assertEqual({'big': 123456789012345678901234567890}, jsonCodec.loads(document))
+        for backend in ['orjson', 'ujson']:
+            jsonCodec.set_backend(backend)
+            with self.subTest(backend=backend):
+                # exact when the library rejects the integer, a float when it reads it as one
+                self.assertIn(repr(jsonCodec.loads(document)['big']),
+                              ['123456789012345678901234567890', '1.2345678901234568e+29'])
+
+    def test_dumps(self):
+        self.assertEqual({'1': [1, 2.5, None], 'b': 'Á'}, json.loads(jsonCodec.dumps({1: (1, 2.5, None), 'b': 'Á'})))
+        self.assertEqual('"x"', jsonCodec.dumps(object(), default=lambda o: 'x'))
+        self.assertRaises(TypeError, jsonCodec.dumps, object())
+
+    def test_missing_backend(self):
+        self.assertEqual('json', jsonCodec.set_backend('unknown'))
@@ -0,0 +1,64 @@
+import copy
+import json
+import pickle
+import unittest
+
+from ikabot.helpers.models import City, Island, to_json_default
+
+
+def _city(**kwargs):
+    city = {
+        'type': 'city', 'name': 'Polis', 'id': 7, 'level': 10, 'ownerId': 3, 'ownerName': 'Owner', 'ownerAllyId': 0,
+        'ownerAllyTag': '', 'hasTreaties': 0, 'actions': [], 'state': '', 'viewAble': 1, 'infos': [],
+        'islandX': '10', 'islandY': '20', 'tradegood': 1, 'material': 'Wine', 'cityName': 'Polis',
+        'isNoob': False, 'alliance': '', 'hasAlliance': False,
+    }
+    city.update(kwargs)
+    return city
+
+
+class TestModels(unittest.TestCase):
+    def test_city_is_equal_to_its_dict(self):
+        data = _city()
+        city = City.from_dict(data)
+
+        self.assertEqual(city, data)
+        self.assertEqual(data, city.to_dict())
+        self.assertEqual(list(data), list(city))
+        self.assertEqual('Wine', city['material'])
+        self.assertEqual('{name} of {ownerName}'.format(**city), 'Polis of Owner')
+        self.assertIsNone(city._extra)
+
+    def test_keys_of_the_dict_only(self):
+        data = _city(ownerAllyId=5, ownerAllyTag='ALLY', allianceName='ALLY', hasAlliance=True, extraKey=1)
+        del data['alliance']
+        del data['isNoob']
+        city = City.from_dict(data)
+
+        self.assertEqual(city, data)
+        self.assertNotIn('alliance', city)
+        self.assertNotIn('isNoob', city)
+        self.assertEqual(1, city.get('extraKey'))
+        self.assertIsNone(city.get('isNoob'))
+
+    def test_derived_keys_follow_the_changes(self):
+        city = City.from_dict(_city())
+        city['state'] = 'noob'
+        city['tradegood'] = 4
+
+        self.assertTrue(city['isNoob'])
+        self.assertEqual('Sulfur', city['material'])
+
+        del city['isNoob']
+        self.assertNotIn('isNoob', city)
+        self.assertRaises(KeyError, lambda: city['isNoob'])
+
+    def test_island_copies(self):
+        data = {'id': '1', 'name': 'Isle', 'x': '10', 'y': '20', 'tipo': '1',
+                'cities': [_city(), {'type': 'empty', 'name': 'empty', 'position': 1}]}
+        island = Island.from_dict(data)
+
+        self.assertIsInstance(island['cities'][0], City)
+        self.assertEqual(data, json.loads(json.dumps(island, default=to_json_default)))
+        self.assertEqual(island, copy.deepcopy(island))
+        self.assertEqual(island, pickle.loads(pickle.dumps(island)))
@@ -0,0 +1,21 @@
+import unittest
+
+from ikabot.helpers.naval import TransportShip, extract_transport_ship_size
+
+
+def unit_description(ship_class, info_class='infoBoxContent', capacity='1.500', line_break='<br/>'):
+    return ('<div class="contentBox01h"><div class="content"><div class="{}" id="unit"></div>'
+            '<div class="{}"><p>Description</p><div class="floatleft"><span class="textLabel">Speed:</span> 60{}'
+            '<span class="textLabel">Capacity:</span> {}{}</div></div></div></div>').format(
+        ship_class, info_class, line_break, capacity, line_break)
+
+
+class TestExtractTransportShipSize(unittest.TestCase):
+    def test_size_of_the_ship(self):
+        html = unit_description('s204', capacity='50.000') + unit_description('s201')
+        self.assertEqual(extract_transport_ship_size(html, TransportShip.TRANSPORT_SHIP), '1.500')
+        self.assertEqual(extract_transport_ship_size(html, TransportShip.TRANSPORT_SHIP_LARGE), '50.000')
+
+    def test_other_markup(self):
+        html = unit_description('unit s201', info_class='infoBoxContent wide', line_break='<br>')
+        self.assertEqual(extract_transport_ship_size(html, TransportShip.TRANSPORT_SHIP), '1.500')
@@ -0,0 +1,40 @@
+import unittest
+
+from ikabot.helpers.unitStats import changes_unit_stats, get_unit_stat, invalidate_unit_stats
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.storage = {}
+
+    def get_stored_value(self, key):
+        return self.storage.get(key, None)
+
+    def store_value(self, key, data):
+        self.storage[key] = data
+
+
+class TestUnitStats(unittest.TestCase):
+    def test_stats_are_loaded_once(self):
+        db = FakeDatabase()
+        loads = []
+
+        def load():
+            loads.append(1)
+            return 500
+
+        self.assertEqual(500, get_unit_stat(db, 201, 'capacity', load))
+        self.assertEqual(500, get_unit_stat(db, '201', 'capacity', load))
+        self.assertEqual(1, len(loads))
+
+        get_unit_stat(db, 201, 'capacity', load, max_age=-1)
+        self.assertEqual(2, len(loads))
+
+        invalidate_unit_stats(db)
+        get_unit_stat(db, 201, 'capacity', load)
+        self.assertEqual(3, len(loads))
+
+    def test_research_changes_the_stats(self):
+        self.assertTrue(changes_unit_stats({'action': 'Advisor', 'function': 'doResearch', 'type': '2'}))
+        self.assertFalse(changes_unit_stats({'action': 'transportOperations',
+                                             'function': 'loadTransportersWithFreight'}))
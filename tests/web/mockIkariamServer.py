@@ -0,0 +1,493 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the ikariam endpoints that ikabot uses. It keeps a small in-memory world, so the bots can be
+load and soak tested without network. Start it with:
+
+    python -m tests.web.mockIkariamServer --port=8080 --cities=5
+
+and point ikabot at it with ``--mockServerUrl=http://127.0.0.1:8080``. The request counters are served as json on
+``/stats``. tests/benchmarks/soakBenchmark.py runs many forked bots against it.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter, deque
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from ikabot.config import materials_names
+
+_building_names = {
+    'townHall': 'Town hall',
+    'warehouse': 'Warehouse',
+    'port': 'Trading port',
+    'branchOffice': 'Trading post',
+    'academy': 'Academy',
+    'tavern': 'Tavern',
+}
+# building of every position of a new city, None is an empty ground
+_city_layout = ['townHall', 'port', 'warehouse', 'branchOffice', 'academy', 'tavern'] + [None] * 13
+
+# messages of the feedback shown by the game
+FEEDBACK_SUCCESS = 10
+FEEDBACK_ERROR = 11
+
+
+def _escape_js(data):
+    """
+    :param data: object
+    :return: str -> json usable inside a JSON.parse('...') of the page
+    """
+    return json.dumps(data, separators=(',', ':')).replace('"', '\\"')
+
+
+class MockWorld:
+    """
+    In-memory world of one player. All the methods are thread safe.
+    """
+
+    def __init__(self, cities=3, seed=0, ship_capacity=500, transporters=20, travel_seconds=600,
+                 upgrade_seconds=3600, strict_action_request=False):
+        """
+        :param cities: int -> number of cities of the player
+        :param seed: int -> seed of the generated world
+        :param ship_capacity: int -> resources carried by one transporter
+        :param transporters: int -> number of transporters of the player
+        :param travel_seconds: int -> duration of every transport
+        :param upgrade_seconds: int -> duration of every building upgrade
+        :param strict_action_request: bool -> should the actions with an unknown actionRequest be rejected
+        """
+        self.__lock = threading.Lock()
+        self.__random = random.Random(seed)
+        self.ship_capacity = ship_capacity
+        self.max_transporters = transporters
+        self.travel_seconds = travel_seconds
+        self.upgrade_seconds = upgrade_seconds
+        self.strict_action_request = strict_action_request
+        self.gold = 100000
+        self.stats = Counter()
+        self.movements = []
+        self.__action_requests = deque(maxlen=50)
+        self.__next_event_id = 1
+
+        self.islands = {}
+        self.cities = {}
+        for i in range(cities):
+            island_id = 100 + i
+            city_id = 1000 + i
+            tradegood = 1 + i % 4
+            self.islands[island_id] = {
+                'id': island_id,
+                'name': 'Island{}'.format(i),
+                'x': 10 + i,
+                'y': 20 + i,
+                'tradegood': tradegood,
+                'woodLevel': 10,
+                'cities': [city_id, 5000 + i],
+            }
+            self.cities[city_id] = self.__create_city(city_id, 'Polis{}'.format(i), island_id, tradegood)
+        self.current_city_id = min(self.cities)
+
+    def __create_city(self, city_id, name, island_id, tradegood):
+        buildings = []
+        for building in _city_layout:
+            if building is None:
+                buildings.append({'building': 'buildingGround land', 'name': 'empty'})
+            else:
+                buildings.append({'building': building, 'name': _building_names[building], 'level': 10})
+        return {
+            'id': city_id,
+            'name': name,
+            'islandId': island_id,
+            'tradegood': tradegood,
+            'resources': [self.__random.randint(1000, 5000) for _ in materials_names],
+            'storageCapacity': 20000,
+            'citizens': 500,
+            'population': 2000,
+            'wineSpendings': 50,
+            'resourceProduction': 0.5,
+            'tradegoodProduction': 0.2,
+            'onSale': [0] * len(materials_names),
+            'buildings': buildings,
+        }
+
+    def __new_action_request(self):
+        token = '{:032x}'.format(self.__random.getrandbits(128))
+        self.__action_requests.append(token)
+        return token
+
+    def __update(self):
+        """
+        Finishes the transports and the upgrades that are due
+        """
+        now = time.time()
+        for movement in [m for m in self.movements if m['eventTime'] <= now]:
+            self.movements.remove(movement)
+            target = self.cities.get(movement['targetId'])
+            if target is not None:
+                for i, amount in enumerate(movement['resources']):
+                    target['resources'][i] = min(target['storageCapacity'], target['resources'][i] + amount)
+        for city in self.cities.values():
+            for building in city['buildings']:
+                if 'completed' in building and building['completed'] <= now:
+                    del building['completed']
+                    building['level'] += 1
+
+    def __header_data(self, city):
+        free_transporters = self.max_transporters - sum(m['transporters'] for m in self.movements)
+        return {
+            'freeTransporters': free_transporters,
+            'maxTransporters': self.max_transporters,
+            'gold': '{:.2f}'.format(self.gold),
+            'income': 500,
+            'upkeep': -200,
+            'scientistsUpkeep': -100,
+            'currentResources': dict(zip(['resource', '1', '2', '3', '4'], city['resources'])),
+            'maxResources': {'resource': city['storageCapacity']},
+            'resourceProduction': city['resourceProduction'],
+            'tradegoodProduction': city['tradegoodProduction'],
+            'producedTradegood': str(city['tradegood']),
+            'relatedCity': {'owncity': 1},
+            'cityDropdownMenu': {'selectedCity': 'city_{}'.format(self.current_city_id)},
+        }
+
+    def __ajax(self, city, view=None, html='', view_script_params=None, feedback=None):
+        global_data = {'actionRequest': self.__new_action_request(), 'headerData': self.__header_data(city),
+                       'backgroundData': {'id': city['id'], 'name': city['name'], 'islandId': city['islandId']}}
+        response = [
+            ['updateGlobalData', global_data],
+            ['changeView', [view or '', html, {'viewScriptParams': view_script_params or {}}]],
+            ['updateTemplateData', {}],
+        ]
+        if feedback is not None:
+            response.append(['provideFeedback', [{'location': 1, 'type': feedback[0], 'text': feedback[1]}]])
+        return response
+
+    def __city_json(self, city):
+        island = self.islands[city['islandId']]
+        positions = []
+        for building in city['buildings']:
+            position = dict(building)
+            if 'completed' in building:
+                position['building'] = building['building'] + ' constructionSite'
+                position['completed'] = int(math.ceil(building['completed']))
+            if 'level' in building:
+                position['level'] = str(building['level'])
+                position['canUpgrade'] = 'completed' not in building
+                position['isMaxLevel'] = False
+            positions.append(position)
+        return {
+            'id': city['id'],
+            'name': city['name'],
+            'ownerId': 1,
+            'ownerName': 'player',
+            'islandId': island['id'],
+            'islandName': island['name'],
+            'islandXCoord': str(island['x']),
+            'islandYCoord': str(island['y']),
+            'position': positions,
+        }
+
+    def __city_page(self, city):
+        resources = city['resources']
+        current_resources = {'citizens': city['citizens'], 'population': city['population'],
+                             'resource': resources[0], '2': resources[2], '1': resources[1], '4': resources[4],
+                             '3': resources[3]}
+        max_resources = {'resource': city['storageCapacity'], '1': city['storageCapacity']}
+        on_sale = {'resource': str(city['onSale'][0])}
+        on_sale.update({str(i): str(city['onSale'][i]) for i in range(1, len(materials_names))})
+        related_cities = {}
+        for own_city in self.cities.values():
+            island = self.islands[own_city['islandId']]
+            related_cities['city_{}'.format(own_city['id'])] = {
+                'id': own_city['id'], 'name': own_city['name'], 'coords': '[{}:{}] '.format(island['x'], island['y']),
+                'tradegood': str(own_city['tradegood']), 'relationship': 'ownCity'}
+        related_cities['additionalInfo'] = {'tradegood': str(city['tradegood'])}
+
+        ajax = [
+            ['updateGlobalData', {'actionRequest': self.__new_action_request()}],
+            ['updateBackgroundData', self.__city_json(city)],
+            ['updateTemplateData', {}],
+        ]
+        return '\n'.join([
+            '<html><head><title>Ikariam</title></head><body id="city">',
+            '<ul id="GF_toolbar"><li class="serverTime">{}</li></ul>'.format(int(time.time())),
+            '<div id="js_GlobalMenu_freeTransporters">{}</div>'.format(
+                self.__header_data(city)['freeTransporters']),
+            '<span id="js_GlobalMenu_maxTransporters">{}</span>'.format(self.max_transporters),
+            '<span id="js_GlobalMenu_citizens">{:,}</span>'.format(city['citizens']),
+            '<span id="js_GlobalMenu_population">{:,}</span>'.format(city['population']),
+            self.__city_select(),
+            '<script type="text/javascript">',
+            'dataSetForView = {',
+            '    currentCityId: %d,' % city['id'],
+            '    actionRequest: "%s",' % self.__action_requests[-1],
+            '    relatedCityData: JSON.parse(\'%s\'),' % _escape_js(related_cities),
+            '    currentResources: JSON.parse(\'%s\'),' % _escape_js(current_resources),
+            '    maxResources: JSON.parse(\'%s\'),' % _escape_js(max_resources),
+            '    branchOfficeResources: JSON.parse(\'%s\'),' % _escape_js(on_sale),
+            '    wineSpendings: %d,' % city['wineSpendings'],
+            '    producedTradegood: "%d",' % city['tradegood'],
+            '    tradegoodProduction: %s,' % city['tradegoodProduction'],
+            '    resourceProduction: %s,' % city['resourceProduction'],
+            '};',
+            'ikariam.getClass(ajax.Responder, %s);' % json.dumps(ajax, separators=(',', ':')),
+            '</script>',
+            '</body></html>',
+        ])
+
+    def __city_select(self):
+        options = []
+        for city in self.cities.values():
+            island = self.islands[city['islandId']]
+            options.append('<option value="{}" class="coords"{}>[{}:{}] {}</option>'.format(
+                city['id'], ' selected="selected"' if city['id'] == self.current_city_id else '', island['x'],
+                island['y'], escape(city['name'])))
+        return '<select id="js_homeCitySelect" class="dropDownButton">{}</select>'.format(''.join(options))
+
+    def __island_page(self, island):
+        cities = []
+        for city_id in island['cities']:
+            if city_id in self.cities:
+                city = self.cities[city_id]
+                cities.append({'type': 'city', 'name': city['name'], 'id': city_id, 'level': 10, 'ownerId': 1,
+                               'ownerName': 'player', 'ownerAllyId': 0, 'ownerAllyTag': '', 'state': ''})
+            else:
+                cities.append({'type': 'city', 'name': 'Foreign{}'.format(city_id), 'id': city_id, 'level': 8,
+                               'ownerId': city_id, 'ownerName': 'neighbour{}'.format(city_id), 'ownerAllyId': 0,
+                               'ownerAllyTag': '', 'state': ''})
+        cities.append({'type': 'empty', 'name': 'empty'})
+        island_json = json.dumps({
+            'id': str(island['id']), 'name': island['name'], 'xCoord': str(island['x']), 'yCoord': str(island['y']),
+            'tradegood': island['tradegood'], 'resourceLevel': str(island['woodLevel']),
+            'tradegoodLevel': '10', 'wonder': '1', 'wonderName': 'Hephaistos\' Forge', 'wonderLevel': '1',
+            'cities': cities,
+        }, separators=(',', ':'))
+        # the parser cuts the json at the specialServerBadges key
+        island_json = island_json[:-1] + ',"specialServerBadges":[]}'
+        return '\n'.join([
+            '<html><head><title>Ikariam</title></head><body id="island">',
+            self.__city_select(),
+            '<script type="text/javascript">',
+            'dataSetForView = {actionRequest: "%s"};' % self.__new_action_request(),
+            'ikariam.getClass(ajax.Responder, [["updateBackgroundData",%s],["updateTemplateData",{}]]);' %
+            island_json,
+            '</script>',
+            '</body></html>',
+        ])
+
+    def __market_html(self, city):
+        inputs = ''.join(
+            '<input type="text" class="textfield" size="10" name="cargo_{0}" id="textfield_{0}" value="{1}">'.format(
+                name, amount)
+            for name, amount in zip(['resource', 'tradegood1', 'tradegood2', 'tradegood3', 'tradegood4'],
+                                    city['onSale']))
+        options = ''.join('<option value="{0}">{0}</option>'.format(r) for r in range(1, 11))
+        return '<div id="branchOffice"><select name="range">{}</select>{}<script>var storageCapacity = {};' \
+               '</script></div>'.format(options, inputs, city['storageCapacity'])
+
+    def __unit_description_html(self):
+        html = ''
+        ships = [(201, 'Merchant ship', self.ship_capacity), (204, 'Freighter', 100 * self.ship_capacity)]
+        for ship, name, capacity in ships:
+            html += ('<div class="contentBox01h"><h3 class="header">{}</h3><div class="content">'
+                     '<div id="unit" class="s{}"></div><div class="infoBoxContent">'
+                     '<div class="floatleft"><span class="textLabel">Capacity:</span> {}<br/></div>'
+                     '</div></div></div>').format(name, ship, '{:,}'.format(capacity).replace(',', '.'))
+        return html
+
+    def __world_map(self, params):
+        data = {}
+        x_min, x_max = int(params.get('x_min', 0)), int(params.get('x_max', 100))
+        y_min, y_max = int(params.get('y_min', 0)), int(params.get('y_max', 100))
+        for island in self.islands.values():
+            if x_min <= island['x'] <= x_max and y_min <= island['y'] <= y_max:
+                data.setdefault(str(island['x']), {})[str(island['y'])] = [
+                    str(island['id']), island['name'], str(island['tradegood']), '1', '0', '0',
+                    str(island['woodLevel']), str(len(island['cities'])), 0, '0', '0']
+        return {'data': data}
+
+    def __transport(self, city, params):
+        target = self.cities.get(int(params.get('destinationCityId', 0)))
+        if target is None:
+            return self.__ajax(city, feedback=(FEEDBACK_ERROR, 'Unknown destination'))
+        cargo = [int(params.get('cargo_resource', 0))]
+        cargo += [int(params.get('cargo_tradegood{}'.format(i), 0)) for i in range(1, len(materials_names))]
+        transporters = int(params.get('transporters', 0))
+        free_transporters = self.__header_data(city)['freeTransporters']
+        if (any(amount > available for amount, available in zip(cargo, city['resources']))
+                or transporters > free_transporters or transporters * self.ship_capacity < sum(cargo)):
+            return self.__ajax(city, feedback=(FEEDBACK_ERROR, 'Not enough resources or transporters'))
+
+        for i, amount in enumerate(cargo):
+            city['resources'][i] -= amount
+        self.movements.append({
+            'event': {'id': self.__next_event_id, 'type': 'transport', 'missionText': 'Transport'},
+            'eventTime': time.time() + self.travel_seconds,
+            'isOwnArmyOrFleet': True,
+            'isHostile': False,
+            'origin': {'name': city['name'], 'avatarName': 'player'},
+            'target': {'name': target['name'], 'avatarName': 'player'},
+            'targetId': target['id'],
+            'resources': cargo,
+            'transporters': transporters,
+        })
+        self.__next_event_id += 1
+        return self.__ajax(city, feedback=(FEEDBACK_SUCCESS, 'The transport has started'))
+
+    def __upgrade(self, city, params):
+        position = int(params.get('position', -1))
+        if not 0 <= position < len(city['buildings']) or 'level' not in city['buildings'][position]:
+            return self.__ajax(city, feedback=(FEEDBACK_ERROR, 'Unknown building'))
+        if any('completed' in building for building in city['buildings']):
+            return self.__ajax(city, feedback=(FEEDBACK_ERROR, 'Another building is being expanded'))
+        city['buildings'][position]['completed'] = time.time() + self.upgrade_seconds
+        return self.__ajax(city, feedback=(FEEDBACK_SUCCESS, 'The expansion has started'))
+
+    def handle(self, params):
+        """
+        :param params: dict[str, str] -> query and form parameters of the request
+        :return: (str, str) -> content type and body
+        """
+        with self.__lock:
+            self.__update()
+            action = params.get('action')
+            function = params.get('function')
+            view = params.get('view')
+            endpoint = '{}.{}'.format(action, function) if action else (view or 'index')
+            self.stats[endpoint] += 1
+
+            if (self.strict_action_request and action is not None
+                    and params.get('actionRequest') not in self.__action_requests):
+                self.stats['wrongActionRequest'] += 1
+                return 'application/json', json.dumps([['provideFeedback', [
+                    {'location': 1, 'type': FEEDBACK_ERROR, 'text': 'TXT_ERROR_WRONG_REQUEST_ID'}]]])
+
+            city_id = params.get('currentCityId') or params.get('cityId')
+            city = self.cities.get(int(city_id)) if city_id and city_id.isdigit() else None
+            city = city or self.cities[self.current_city_id]
+
+            if action == 'header' and function == 'changeCurrentCity':
+                self.current_city_id = int(params['cityId'])
+                response = self.__ajax(self.cities[self.current_city_id])
+            elif action == 'transportOperations':
+                response = self.__transport(city, params)
+            elif action == 'CityScreen' and function == 'upgradeBuilding':
+                response = self.__upgrade(city, params)
+            elif action == 'WorldMap' and function == 'getJSONArea':
+                response = self.__world_map(params)
+            elif view == 'island':
+                island = self.islands.get(int(params.get('islandId', 0)), next(iter(self.islands.values())))
+                return 'text/html; charset=UTF-8', self.__island_page(island)
+            elif view == 'militaryAdvisor':
+                response = self.__ajax(city, view, view_script_params={
+                    'militaryAndFleetMovements': [
+                        {k: v for k, v in m.items() if k not in ['targetId', 'resources']} for m in self.movements
+                    ]})
+            elif view == 'unitdescription':
+                response = self.__ajax(city, view, html=self.__unit_description_html())
+            elif view == 'branchOffice':
+                response = self.__ajax(city, view, html=self.__market_html(city))
+            elif view == 'updateGlobalData' or params.get('ajax') == '1':
+                response = self.__ajax(city, view)
+            else:
+                if view == 'city' and params.get('cityId', '').isdigit():
+                    city = self.cities.get(int(params['cityId']), city)
+                # opening a city selects it
+                self.current_city_id = city['id']
+                return 'text/html; charset=UTF-8', self.__city_page(city)
+            return 'application/json', json.dumps(response, separators=(',', ':'))
+
+    def get_stats(self):
+        with self.__lock:
+            return dict(self.stats)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def __respond(self, params):
+        if urlsplit(self.path).path == '/stats':
+            content_type, body = 'application/json', json.dumps(self.server.world.get_stats())
+        else:
+            content_type, body = self.server.world.handle(params)
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.__respond(dict(parse_qsl(urlsplit(self.path).query, keep_blank_values=True)))
+
+    def do_POST(self):
+        params = dict(parse_qsl(urlsplit(self.path).query, keep_blank_values=True))
+        length = int(self.headers.get('Content-Length', 0))
+        params.update(parse_qsl(self.rfile.read(length).decode('utf-8'), keep_blank_values=True))
+        self.__respond(params)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockIkariamServer:
+    def __init__(self, world=None, host='127.0.0.1', port=0):
+        """
+        :param world: MockWorld/None
+        :param host: str
+        :param port: int -> 0 picks a free port
+        """
+        self.world = world or MockWorld()
+        self.__server = ThreadingHTTPServer((host, port), _RequestHandler)
+        self.__server.daemon_threads = True
+        self.__server.world = self.world
+        self.__thread = None
+
+    @property
+    def url(self):
+        host, port = self.__server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def start(self):
+        """
+        Serves the requests in a background thread
+        :return: MockIkariamServer
+        """
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def serve_forever(self):
+        self.__server.serve_forever()
+
+    def shutdown(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local mock of the ikariam server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--cities', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--strictActionRequest', action='store_true')
+    args = parser.parse_args()
+
+    world = MockWorld(cities=args.cities, seed=args.seed, strict_action_request=args.strictActionRequest)
+    server = MockIkariamServer(world, host=args.host, port=args.port)
+    print('Mock ikariam server is listening on {}'.format(server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import time
+import unittest
+
+from ikabot.web.accountState import AccountState
+
+
+class TestAccountState(unittest.TestCase):
+    def test_update_from_html(self):
+        state = AccountState()
+        state.update_from_text('<div id="js_GlobalMenu_freeTransporters">7</div>'
+                               '<span id="js_GlobalMenu_maxTransporters">20</span>'
+                               '<script>dataSetForView = {currentCityId: 1234, actionRequest: "abc"}</script>')
+        self.assertEqual(state.get('free_transporters'), 7)
+        self.assertEqual(state.get('max_transporters'), 20)
+        self.assertEqual(state.get('current_city_id'), 1234)
+        self.assertIsNone(state.get('gold'))
+
+    def test_update_from_ajax(self):
+        ajax = [['updateGlobalData', {'actionRequest': 'abc', 'headerData': {
+            'freeTransporters': '3', 'maxTransporters': 20, 'gold': '12345.67',
+            'currentResources': {'resource': 100}, 'cityDropdownMenu': {'selectedCity': 'city_42'}}}],
+            ['changeView', ['city', '']]]
+
+        state = AccountState()
+        state.update_from_json(ajax)
+        self.assertEqual(state.get('free_transporters'), 3)
+        self.assertEqual(state.get('gold'), 12345)
+        self.assertEqual(state.get('current_city_id'), 42)
+        self.assertEqual(state.get('current_resources'), {'resource': 100})
+
+        text_state = AccountState()
+        text_state.update_from_text('[["updateGlobalData",{"headerData":{"freeTransporters":"3","gold":"12345.67",'
+                                    '"cityDropdownMenu":{"selectedCity":"city_42"}}}]]')
+        self.assertEqual(text_state.get('free_transporters'), 3)
+        self.assertEqual(text_state.get('gold'), 12345)
+        self.assertEqual(text_state.get('current_city_id'), 42)
+
+    def test_unexpected_ajax_values_are_skipped(self):
+        state = AccountState()
+        state.update_from_json([['updateGlobalData', {'headerData': {
+            'freeTransporters': None, 'maxTransporters': '', 'gold': 'unknown', 'cityDropdownMenu': [],
+        }}]])
+        state.update_from_json([['updateGlobalData', {'headerData': {
+            'freeTransporters': '3', 'maxTransporters': {}, 'cityDropdownMenu': {'selectedCity': 'city_x'},
+        }}]])
+        self.assertEqual(state.get('free_transporters'), 3)
+        self.assertIsNone(state.get('max_transporters'))
+        self.assertIsNone(state.get('gold'))
+        self.assertIsNone(state.get('current_city_id'))
+
+    def test_stale_values(self):
+        state = AccountState(max_age=0.05)
+        state.set('free_transporters', 5)
+        self.assertEqual(state.get('free_transporters'), 5)
+        time.sleep(0.1)
+        self.assertIsNone(state.get('free_transporters'))
+        self.assertEqual(state.get('free_transporters', max_age=10), 5)
+
+        state.invalidate('free_transporters')
+        self.assertIsNone(state.get('free_transporters', max_age=10))
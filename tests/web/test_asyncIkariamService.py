@@ -0,0 +1,162 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+import requests
+
+from ikabot import config
+from ikabot.helpers.database import Database
+from ikabot.migrations.migrate import apply_migrations
+from ikabot.web.accountState import AccountState
+from ikabot.web.asyncIkariamService import AsyncIkariamService
+from ikabot.web.ikariamService import IkariamService
+from tests.web.mockIkariamServer import MockIkariamServer, MockWorld
+from ikabot.web.rateLimiter import RateLimiter, RequestPriority
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(0.1)
+        if 'fail' in self.path:
+            # the connection is closed without a response
+            self.close_connection = True
+            return
+        body = self.path.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Set-Cookie', 'balancer={}; Path=/'.format(self.path.rsplit('=', 1)[-1]))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _IkariamService:
+    def __init__(self, port):
+        self.s = requests.Session()
+        self.urlBase = 'http://127.0.0.1:{}/index.php?'.format(port)
+        self.action_request_token = 'token'
+        self.sync_urls = []
+        self.rate_limiter = RateLimiter(rate=0)
+        self.request_priority = RequestPriority.NORMAL
+        self.account_state = AccountState()
+        self.bulk_get_allowed = True
+        self.bulk_urls = []
+        self.failed_urls = []
+
+    def isExpired(self, html):
+        return 'expired' in html
+
+    def get(self, url):
+        self.sync_urls.append(url)
+        return 'sync:' + url
+
+    def is_bulk_get_allowed(self):
+        return self.bulk_get_allowed
+
+    def register_bulk_get(self, url, response, text):
+        self.bulk_urls.append(url)
+
+    def register_bulk_get_failure(self, url):
+        self.failed_urls.append(url)
+        # the circuit is opened by the second failure
+        self.bulk_get_allowed = len(self.failed_urls) < 2
+
+
+class TestAsyncIkariamService(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.service = _IkariamService(self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_all_keeps_order_and_runs_concurrently(self):
+        urls = ['view=city&cityId={}'.format(i) for i in range(10)]
+        progress = []
+
+        start = time.time()
+        htmls = AsyncIkariamService(self.service, max_concurrency=10) \
+            .get_all(urls, progress=lambda done, total: progress.append((done, total)))
+
+        self.assertLess(time.time() - start, 0.8)
+        self.assertEqual(htmls, ['/index.php?' + url for url in urls])
+        self.assertEqual(progress[-1], (10, 10))
+        self.assertIsNone(self.service.action_request_token)
+        self.assertEqual(sorted(self.service.bulk_urls), sorted(self.service.urlBase + url for url in urls))
+
+    def test_expired_responses_are_fetched_with_the_sync_service(self):
+        htmls = AsyncIkariamService(self.service, max_concurrency=2).get_all(['view=city', 'expired'])
+        self.assertEqual(htmls, ['/index.php?view=city', 'sync:expired'])
+        self.assertEqual(self.service.sync_urls, ['expired'])
+
+    def test_cookies_of_the_responses_are_kept(self):
+        self.service.s.cookies.set('PHPSESSID', 'session')
+        AsyncIkariamService(self.service, max_concurrency=1).get_all(['view=city&cityId=1'])
+        self.assertEqual('1', self.service.s.cookies.get('balancer'))
+        self.assertEqual('session', self.service.s.cookies.get('PHPSESSID'))
+
+    def test_failures_are_reported_to_the_circuit(self):
+        urls = ['fail=1', 'view=city&cityId=1', 'fail=2'] + ['view=island&islandId={}'.format(i) for i in range(6)]
+        progress = []
+        htmls = AsyncIkariamService(self.service, max_concurrency=3) \
+            .get_all(urls, progress=lambda done, total: progress.append(done))
+
+        self.assertEqual(sorted(self.service.failed_urls), [self.service.urlBase + 'fail=1',
+                                                            self.service.urlBase + 'fail=2'])
+        self.assertEqual('sync:fail=1', htmls[0])
+        self.assertEqual('/index.php?view=city&cityId=1', htmls[1])
+        # the requests which hadn't started when the circuit opened are sent by the sync service
+        self.assertEqual(['fail=1', 'fail=2'], sorted(self.service.sync_urls[:2]))
+        self.assertIn(urls[-1], self.service.sync_urls)
+        bulk_urls = [url[len(self.service.urlBase):] for url in self.service.bulk_urls]
+        self.assertEqual(sorted(urls), sorted(bulk_urls + self.service.sync_urls))
+        self.assertEqual(list(range(1, len(urls) + 1)), progress)
+
+    def test_sync_service_is_used_when_bulk_get_is_not_allowed(self):
+        self.service.bulk_get_allowed = False
+        progress = []
+        htmls = AsyncIkariamService(self.service).get_all(['a', 'b'], progress=lambda *p: progress.append(p))
+        self.assertEqual(htmls, ['sync:a', 'sync:b'])
+        self.assertEqual(progress, [(1, 2), (2, 2)])
+        self.assertEqual(self.service.action_request_token, 'token')
+
+
+class TestBulkGetFixtures(unittest.TestCase):
+    def setUp(self):
+        self.db_file, self.params = config.DB_FILE, dict(config.application_params)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        config.DB_FILE = os.path.join(self.tmp_dir.name, 'ikabot.db')
+        with redirect_stdout(StringIO()):
+            apply_migrations()
+        self.db = Database('bot')
+
+    def tearDown(self):
+        self.db.close_db_conn()
+        config.DB_FILE = self.db_file
+        config.application_params.clear()
+        config.application_params.update(self.params)
+        self.tmp_dir.cleanup()
+
+    def test_bulk_get_is_recorded_and_replayed(self):
+        fixtures = os.path.join(self.tmp_dir.name, 'fixtures.jsonl.gz')
+        urls = ['view=city&cityId=1000', 'view=city&cityId=1001']
+        server = MockIkariamServer(MockWorld(cities=2)).start()
+        try:
+            config.application_params.update({'mockServerUrl': server.url, 'recordFixtures': fixtures})
+            recorded = AsyncIkariamService(IkariamService(self.db, None)).get_all(urls)
+        finally:
+            server.shutdown()
+
+        del config.application_params['recordFixtures']
+        config.application_params.update({'replayFixtures': fixtures, 'replayLatency': 0})
+        replayed = AsyncIkariamService(IkariamService(self.db, None)).get_all(urls)
+        self.assertEqual(recorded, replayed)
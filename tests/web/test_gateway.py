@@ -0,0 +1,179 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from types import SimpleNamespace
+
+from ikabot import config
+from ikabot.helpers.database import Database
+from ikabot.helpers.getJson import getCity
+from ikabot.migrations.migrate import apply_migrations
+from ikabot.web.accountState import AccountState
+from ikabot.web.asyncIkariamService import AsyncIkariamService
+from ikabot.web.gateway import GatewayIkariamService, IkariamGatewayServer, is_gateway_running
+from ikabot.web.ikariamService import IkariamService
+from tests.web.mockIkariamServer import MockIkariamServer, MockWorld
+from ikabot.web.rateLimiter import RequestPriority
+
+
+class _IkariamService:
+    def __init__(self, name):
+        self.name = name
+        self.request_priority = RequestPriority.NORMAL
+        self.account_state = AccountState()
+        self.calls = []
+        self.released = threading.Event()
+        self.released.set()
+
+    def get(self, url='', params={}, ignoreExpire=False, noIndex=False, fullResponse=False, parseJson=False):
+        self.calls.append(('get', url, self.request_priority))
+        if url == 'block':
+            self.released.wait(5)
+        if fullResponse:
+            return SimpleNamespace(status_code=200, headers={'a': 'b'}, content=b'\x00\x01', encoding=None)
+        return '{}:{}'.format(self.name, url)
+
+    def post(self, url='', payloadPost={}, params={}, ignoreExpire=False, noIndex=False, parseJson=False):
+        self.calls.append(('post', url, self.request_priority))
+        if url == 'fail':
+            raise ValueError('failed')
+        return '{}:{}:{}'.format(self.name, url, params.get('a'))
+
+    def register_write(self, url='', payloadPost={}, params={}):
+        pass
+
+    def is_bulk_get_allowed(self):
+        return True
+
+    def logout(self):
+        pass
+
+
+class TestGateway(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp_dir.name, 'gateway.sock')
+        self.gateway_service = _IkariamService('gateway')
+        self.local_service = _IkariamService('local')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def __wait_for_server(self):
+        for _ in range(500):
+            if is_gateway_running(self.socket_path):
+                return
+            time.sleep(0.01)
+        self.fail('Gateway did not start')
+
+    def __start_server(self):
+        server = IkariamGatewayServer(self.gateway_service, self.socket_path)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.__wait_for_server()
+        return server
+
+    def test_requests_are_served_by_the_gateway(self):
+        server = self.__start_server()
+        self.local_service.request_priority = RequestPriority.LOW
+        proxy = GatewayIkariamService(self.local_service, self.socket_path)
+
+        self.assertEqual(proxy.get('view=city'), 'gateway:view=city')
+        self.assertEqual(proxy.post('view=island', params={'a': 1}), 'gateway:view=island:1')
+        response = proxy.get('img', fullResponse=True)
+        self.assertEqual(response.content, b'\x00\x01')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.local_service.calls, [])
+        self.assertEqual(server.served_requests, 3)
+        self.assertEqual(self.gateway_service.calls[0], ('get', 'view=city', RequestPriority.LOW))
+        proxy.logout()
+
+    def test_gateway_errors_are_raised_with_their_type(self):
+        self.__start_server()
+        proxy = GatewayIkariamService(self.local_service, self.socket_path)
+        with self.assertRaisesRegex(ValueError, '^failed$'):
+            proxy.post('fail')
+        self.assertEqual(proxy.get('still-working'), 'gateway:still-working')
+        proxy.logout()
+
+    def test_waiting_requests_are_executed_by_priority(self):
+        server = self.__start_server()
+        self.gateway_service.released.clear()
+        proxies = []
+        clients = []
+        for url, priority in [('block', RequestPriority.NORMAL), ('low', RequestPriority.LOW),
+                              ('high', RequestPriority.HIGH)]:
+            local_service = _IkariamService('local')
+            local_service.request_priority = priority
+            proxies.append(GatewayIkariamService(local_service, self.socket_path))
+            clients.append(threading.Thread(target=proxies[-1].get, args=(url,)))
+            clients[-1].start()
+            # the first request blocks the gateway, the next ones wait in its queue
+            time.sleep(0.2)
+        self.gateway_service.released.set()
+        for client in clients:
+            client.join(5)
+        self.assertEqual(['block', 'high', 'low'], [url for _, url, _ in self.gateway_service.calls])
+        self.assertEqual(3, server.served_requests)
+        for proxy in proxies:
+            proxy.logout()
+
+    def test_bulk_reads_go_through_the_gateway(self):
+        self.__start_server()
+        proxy = GatewayIkariamService(self.local_service, self.socket_path)
+        self.assertEqual(['gateway:a', 'gateway:b'], AsyncIkariamService(proxy).get_all(['a', 'b']))
+        self.assertEqual([], self.local_service.calls)
+        proxy.logout()
+
+    def test_local_service_is_used_without_gateway(self):
+        proxy = GatewayIkariamService(self.local_service, self.socket_path)
+        self.assertFalse(is_gateway_running(self.socket_path))
+        self.assertEqual(proxy.get('view=city'), 'local:view=city')
+        proxy.name = 'changed'
+        self.assertEqual(self.local_service.name, 'changed')
+
+    def test_real_service_is_used_by_the_thread_which_owns_it(self):
+        db_file, params = config.DB_FILE, dict(config.application_params)
+        mock_server = MockIkariamServer(MockWorld(cities=2)).start()
+        config.DB_FILE = os.path.join(self.tmp_dir.name, 'ikabot.db')
+        config.application_params['mockServerUrl'] = mock_server.url
+        servers = []
+
+        def serve():
+            # the service and its sqlite connection are created in the thread of serve_forever, like in GatewayBot
+            db = Database('gateway')
+            servers.append(IkariamGatewayServer(IkariamService(db, None), self.socket_path))
+            servers[0].serve_forever()
+            db.close_db_conn()
+
+        try:
+            with redirect_stdout(StringIO()):
+                apply_migrations()
+            thread = threading.Thread(target=serve, daemon=True)
+            thread.start()
+            self.__wait_for_server()
+
+            proxy = GatewayIkariamService(self.local_service, self.socket_path)
+            results = []
+            clients = [threading.Thread(target=lambda: results.append(getCity(proxy.get('view=city&cityId=1001'))))
+                       for _ in range(3)]
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            self.assertEqual(['1001'] * 3, [city['id'] for city in results])
+            self.assertEqual(3, servers[0].served_requests)
+            self.assertEqual([], self.local_service.calls)
+            proxy.logout()
+
+            servers[0].shutdown()
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+        finally:
+            mock_server.shutdown()
+            config.DB_FILE = db_file
+            config.application_params.clear()
+            config.application_params.update(params)
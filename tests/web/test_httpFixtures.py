@@ -0,0 +1,80 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import requests
+
+from ikabot.web.httpFixtures import (FixtureNotFoundError, FixtureRecorder,
+                                     FixtureReplayer, normalize_request)
+
+
+def create_response(text, status=200):
+    response = requests.Response()
+    response.status_code = status
+    response.headers['Content-Type'] = 'text/html; charset=UTF-8'
+    response.encoding = 'UTF-8'
+    response.elapsed = datetime.timedelta(seconds=0.25)
+    response._content = text.encode('utf-8')
+    return response
+
+
+class TestNormalizeRequest(unittest.TestCase):
+    def test_host_order_and_token_are_ignored(self):
+        self.assertEqual(
+            normalize_request('GET', 'https://s1-en.ikariam.gameforge.com/index.php?view=city&cityId=1'),
+            normalize_request('get', 'http://127.0.0.1:8080/index.php?cityId=1', params={'view': 'city'}),
+        )
+        self.assertEqual(
+            normalize_request('POST', 'https://host/index.php?', params={'actionRequest': 'a', 'view': 'x'}),
+            normalize_request('POST', 'https://host/index.php?', params={'view': 'x', 'actionRequest': 'b'}),
+        )
+
+    def test_different_requests(self):
+        self.assertNotEqual(
+            normalize_request('GET', 'https://host/index.php?view=city&cityId=1'),
+            normalize_request('GET', 'https://host/index.php?view=city&cityId=2'),
+        )
+        self.assertNotEqual(
+            normalize_request('POST', 'https://host/index.php?', payload={'cargo_resource': 1}),
+            normalize_request('POST', 'https://host/index.php?', payload={'cargo_resource': 2}),
+        )
+
+
+class TestRecordReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'fixtures.jsonl.gz')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        recorder = FixtureRecorder(self.path)
+        recorder.write_meta({'username': 'player', 'host': 's1-en.ikariam.gameforge.com'})
+        url = 'https://s1-en.ikariam.gameforge.com/index.php?view=city&cityId=1'
+        recorder.record('GET', url, None, None, create_response('first'))
+        recorder.record('GET', url, None, None, create_response('second'))
+        recorder.record('GET', url + '0', None, None, create_response('first'))
+
+        replayer = FixtureReplayer(self.path, latency=0)
+        self.assertEqual(replayer.meta['username'], 'player')
+        self.assertEqual(replayer.replay('GET', url).text, 'first')
+        self.assertEqual(replayer.replay('GET', url).text, 'second')
+        # the last response is repeated
+        self.assertEqual(replayer.replay('GET', url).text, 'second')
+        response = replayer.replay('GET', url + '0')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['content-type'], 'text/html; charset=UTF-8')
+        self.assertEqual(list(response.iter_content(2, decode_unicode=True)), ['fi', 'rs', 't'])
+        self.assertEqual(replayer.served, 4)
+
+        with self.assertRaises(FixtureNotFoundError):
+            replayer.replay('GET', url + '1')
+        self.assertEqual(replayer.missing, 1)
+
+    def test_recorded_latency(self):
+        recorder = FixtureRecorder(self.path)
+        recorder.record('GET', 'https://host/index.php?view=city', None, None, create_response('city'))
+        replayer = FixtureReplayer(self.path)
+        self.assertEqual(replayer.replay('GET', 'https://host/index.php?view=city').elapsed.total_seconds(), 0.25)
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from contextlib import redirect_stdout
+from io import StringIO
+
+from ikabot import config
+from ikabot.config import actionRequest
+from ikabot.helpers.database import Database
+from ikabot.migrations.migrate import apply_migrations
+from ikabot.web.ikariamService import extract_action_request, extract_action_request_from_json, IkariamService
+from tests.web.mockIkariamServer import MockIkariamServer, MockWorld
+
+
+class TestExtractActionRequest(unittest.TestCase):
+    def test_extract_from_html_script(self):
+        html = '<script>dataSetForView = {actionRequest: "abc123def", currentCityId: 1}</script>'
+        self.assertEqual(extract_action_request(html), 'abc123def')
+
+    def test_extract_from_ajax_response(self):
+        ajax = '[["updateGlobalData",{"actionRequest":"fedcba321","headerData":{}}]]'
+        self.assertEqual(extract_action_request(ajax), 'fedcba321')
+
+    def test_missing_token(self):
+        self.assertIsNone(extract_action_request('<html></html>'))
+        self.assertIsNone(extract_action_request(''))
+        self.assertIsNone(extract_action_request(None))
+
+
+class TestExtractActionRequestFromJson(unittest.TestCase):
+    def test_extract_from_parsed_ajax_response(self):
+        data = [['updateGlobalData', {'actionRequest': 'fedcba321', 'headerData': {}}], ['changeView', ['city', '']]]
+        self.assertEqual(extract_action_request_from_json(data), 'fedcba321')
+
+    def test_missing_token(self):
+        self.assertIsNone(extract_action_request_from_json([['changeView', ['city', '']]]))
+        self.assertIsNone(extract_action_request_from_json({'actionRequest': 'abc'}))
+
+
+class TestActionRequestRetry(unittest.TestCase):
+    def setUp(self):
+        self.db_file, self.params = config.DB_FILE, dict(config.application_params)
+        self.directory = tempfile.mkdtemp()
+        self.world = MockWorld(cities=2, strict_action_request=True)
+        self.server = MockIkariamServer(self.world).start()
+        config.DB_FILE = os.path.join(self.directory, 'ikabot.db')
+        config.application_params['mockServerUrl'] = self.server.url
+        with redirect_stdout(StringIO()):
+            apply_migrations()
+        self.db = Database('bot')
+
+    def tearDown(self):
+        self.db.close_db_conn()
+        self.server.shutdown()
+        config.DB_FILE = self.db_file
+        config.application_params.clear()
+        config.application_params.update(self.params)
+        shutil.rmtree(self.directory)
+
+    def test_stale_token_is_replaced_even_when_the_index_page_is_shared(self):
+        service = IkariamService(self.db, None)
+        service.get()  # the index page is now shared by the single flight
+        service.action_request_token = 'stale'
+
+        service.post(params={'action': 'header', 'function': 'changeCurrentCity', 'actionRequest': actionRequest,
+                             'cityId': 1001, 'ajax': 1})
+
+        self.assertEqual(1, self.world.stats['wrongActionRequest'])
+        # the rejected post and its retry
+        self.assertEqual(2, self.world.stats['header.changeCurrentCity'])
+        self.assertEqual(1001, self.world.current_city_id)
+
+    def test_stored_state_is_read_only_when_written(self):
+        service = IkariamService(self.db, None)
+        refresh_stored_state = service._IkariamService__refresh_stored_state
+        refresh_stored_state()
+        with mock.patch.object(self.db, 'get_stored_value', wraps=self.db.get_stored_value) as get_stored_value:
+            # heartbeats of the bots don't make the session read the cookies again
+            self.db.set_process({'pid': 1, 'action': 'a', 'status': 'running', 'lastActionTime': 1})
+            self.db.update_process(1, {'lastActionTime': 2})
+            self.assertFalse(refresh_stored_state())
+            self.assertEqual(0, get_stored_value.call_count)
+
+            other = Database('bot')
+            other.store_value('proxy', {'set': False})
+            other.close_db_conn()
+            self.assertTrue(refresh_stored_state())
+            self.assertEqual(['cookies', 'proxy'], [c.args[0] for c in get_stored_value.call_args_list])
@@ -0,0 +1,47 @@
+import json
+import unittest
+
+from ikabot.web.jsonStream import JsonStreamParser, parse_json_stream
+
+
+def split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestJsonStream(unittest.TestCase):
+    ajax = [
+        ['updateGlobalData', {'actionRequest': 'abc', 'headerData': {'gold': '1,234'}}],
+        ['changeView', ['city', '<div class="a">' * 500]],
+        123,
+        4.5,
+        None,
+    ]
+
+    def test_array_in_chunks(self):
+        text = json.dumps(self.ajax)
+        for size in [1, 3, 7, 100, 4096, len(text)]:
+            self.assertEqual(parse_json_stream(split(text, size)), self.ajax)
+
+    def test_elements_are_parsed_while_the_chunks_arrive(self):
+        text = json.dumps(self.ajax)
+        parser = JsonStreamParser()
+        parser.feed(text[:len(text) - 10])
+        self.assertEqual(parser.items[:2], self.ajax[:2])
+        parser.feed(text[len(text) - 10:])
+        self.assertEqual(parser.close(), self.ajax)
+
+    def test_number_split_between_chunks(self):
+        self.assertEqual(parse_json_stream(['[12', '34]']), [1234])
+
+    def test_other_documents(self):
+        self.assertEqual(parse_json_stream(['{"data": ', '{"1": 2}}']), {'data': {'1': 2}})
+        self.assertEqual(parse_json_stream([' [', ' ] ']), [])
+
+    def test_control_characters_are_allowed(self):
+        self.assertEqual(parse_json_stream(['["a\tb"]']), ['a\tb'])
+
+    def test_invalid_json(self):
+        with self.assertRaises(json.JSONDecodeError):
+            parse_json_stream(['[1, 2'])
+        with self.assertRaises(json.JSONDecodeError):
+            parse_json_stream(['<html>'])
@@ -0,0 +1,59 @@
+import time
+import unittest
+
+import requests
+
+from ikabot.helpers.getJson import getCity, getIsland
+from ikabot.helpers.market import onSellInMarket, storageCapacityOfMarket
+from tests.web.mockIkariamServer import (FEEDBACK_SUCCESS, MockIkariamServer,
+                                          MockWorld)
+
+
+class TestMockIkariamServer(unittest.TestCase):
+    def setUp(self):
+        self.world = MockWorld(cities=2, travel_seconds=0.2, upgrade_seconds=0.2)
+        self.server = MockIkariamServer(self.world).start()
+        self.url = self.server.url + '/index.php?'
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_pages_are_parsed_by_ikabot(self):
+        city = getCity(requests.get(self.url, params={'view': 'city', 'cityId': 1001}).text)
+        self.assertEqual(city['id'], '1001')
+        self.assertEqual(city['availableResources'], self.world.cities[1001]['resources'])
+        self.assertEqual(city['storageCapacity'], 20000)
+
+        island = getIsland(requests.get(self.url, params={'view': 'island', 'islandId': 100}).text)
+        self.assertEqual([c['id'] for c in island['cities'] if c['type'] == 'city'], [1000, 5000])
+
+        market = requests.post(self.url, params={'view': 'branchOffice', 'ajax': 1}).json()[1][1][1]
+        self.assertEqual(storageCapacityOfMarket(market), 20000)
+        self.assertEqual(onSellInMarket(market), [0, 0, 0, 0, 0])
+
+    def test_transport(self):
+        resources = list(self.world.cities[1001]['resources'])
+        response = requests.post(self.url, params={
+            'action': 'transportOperations', 'function': 'loadTransportersWithFreight', 'currentCityId': 1000,
+            'destinationCityId': 1001, 'cargo_resource': 100, 'transporters': 1}).json()
+        self.assertEqual(response[3][1][0]['type'], FEEDBACK_SUCCESS)
+
+        movements = requests.post(self.url, params={'view': 'militaryAdvisor', 'ajax': 1}).json()
+        self.assertEqual(len(movements[1][1][2]['viewScriptParams']['militaryAndFleetMovements']), 1)
+        self.assertEqual(movements[0][1]['headerData']['freeTransporters'], self.world.max_transporters - 1)
+
+        time.sleep(0.3)
+        city = getCity(requests.get(self.url, params={'view': 'city', 'cityId': 1001}).text)
+        self.assertEqual(city['availableResources'][0], resources[0] + 100)
+
+    def test_upgrade_building(self):
+        response = requests.post(self.url, params={
+            'action': 'CityScreen', 'function': 'upgradeBuilding', 'currentCityId': 1000, 'position': 0}).json()
+        self.assertEqual(response[3][1][0]['type'], FEEDBACK_SUCCESS)
+        city = getCity(requests.get(self.url, params={'view': 'city', 'cityId': 1000}).text)
+        self.assertTrue(city['position'][0]['isBusy'])
+
+        time.sleep(0.3)
+        city = getCity(requests.get(self.url, params={'view': 'city', 'cityId': 1000}).text)
+        self.assertEqual(city['position'][0]['level'], 11)
+        self.assertEqual(self.world.get_stats()['CityScreen.upgradeBuilding'], 1)
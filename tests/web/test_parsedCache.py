@@ -0,0 +1,44 @@
+import time
+import unittest
+
+from ikabot.web.parsedCache import ParsedCache
+
+
+class TestParsedCache(unittest.TestCase):
+    def test_pages_are_copied(self):
+        cache = ParsedCache()
+        city = {'id': 1, 'availableResources': [1, 2, 3, 4, 5]}
+        cache.put('city', 1, city)
+        city['availableResources'][0] = 100
+
+        cached = cache.get('city', '1')
+        self.assertEqual(cached['availableResources'][0], 1)
+        cached['availableResources'][0] = 200
+        self.assertEqual(cache.get('city', 1)['availableResources'][0], 1)
+
+    def test_old_pages_are_not_returned(self):
+        cache = ParsedCache(max_age=60)
+        cache.put('city', 1, {'id': 1})
+        time.sleep(0.01)
+        self.assertIsNone(cache.get('city', 1, max_age=0))
+        self.assertIsNotNone(cache.get('city', 1))
+
+    def test_least_recently_used_page_is_evicted(self):
+        cache = ParsedCache(max_size=2)
+        cache.put('city', 1, {})
+        cache.put('city', 2, {})
+        cache.get('city', 1)
+        cache.put('city', 3, {})
+        self.assertIsNone(cache.get('city', 2))
+        self.assertIsNotNone(cache.get('city', 1))
+
+    def test_invalidate(self):
+        cache = ParsedCache()
+        for kind, id in [('city', 1), ('city', 2), ('island', 1)]:
+            cache.put(kind, id, {})
+        cache.invalidate('city', 1)
+        self.assertIsNone(cache.get('city', 1))
+        self.assertIsNotNone(cache.get('city', 2))
+        self.assertIsNotNone(cache.get('island', 1))
+        cache.invalidate()
+        self.assertIsNone(cache.get('island', 1))
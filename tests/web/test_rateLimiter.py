@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from ikabot import config
+from ikabot.web.rateLimiter import RateLimiter, RequestPriority
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.state_file = os.path.join(self.tmp_dir.name, 'bot.ratelimit')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_disabled_limiter_never_waits(self):
+        limiter = RateLimiter(rate=0)
+        for _ in range(100):
+            self.assertEqual(limiter.try_acquire(RequestPriority.LOW), 0)
+
+    def test_burst_is_limited_by_capacity(self):
+        limiter = RateLimiter(rate=0.001, capacity=4, state_file=self.state_file)
+        for _ in range(4):
+            self.assertEqual(limiter.try_acquire(RequestPriority.HIGH), 0)
+        self.assertGreater(limiter.try_acquire(RequestPriority.HIGH), 0)
+
+    def test_low_priority_yields_to_high_priority(self):
+        limiter = RateLimiter(rate=0.001, capacity=4, state_file=self.state_file)
+        # low priority keeps half of the bucket for the others
+        self.assertEqual(limiter.try_acquire(RequestPriority.LOW), 0)
+        self.assertEqual(limiter.try_acquire(RequestPriority.LOW), 0)
+        self.assertGreater(limiter.try_acquire(RequestPriority.LOW), 0)
+        self.assertEqual(limiter.try_acquire(RequestPriority.HIGH), 0)
+        self.assertEqual(limiter.try_acquire(RequestPriority.HIGH), 0)
+
+    def test_every_priority_passes_a_bucket_of_one_token(self):
+        for priority in RequestPriority:
+            limiter = RateLimiter(rate=1, capacity=1)
+            self.assertEqual(0, limiter.try_acquire(priority))
+            # the next token comes after one second, not never
+            self.assertAlmostEqual(1, limiter.try_acquire(priority), delta=0.01)
+        # the default capacity is 1 below 0.4 requests per second
+        limiter = RateLimiter(rate=0.2)
+        self.assertEqual(1, limiter.capacity)
+        self.assertEqual(0, limiter.try_acquire(RequestPriority.LOW))
+
+    def test_parameters_given_as_strings(self):
+        params = dict(config.application_params)
+        config.application_params.update({'rateLimitPerSecond': '0.5', 'rateLimitBurst': '3'})
+        try:
+            limiter = RateLimiter.for_account('bot')
+        finally:
+            config.application_params.clear()
+            config.application_params.update(params)
+        self.assertEqual((0.5, 3), (limiter.rate, limiter.capacity))
+        limiter.state_file = None
+        self.assertEqual(0, limiter.try_acquire(RequestPriority.LOW))
+
+    def test_bucket_is_shared_through_the_state_file(self):
+        first = RateLimiter(rate=0.001, capacity=2, state_file=self.state_file)
+        second = RateLimiter(rate=0.001, capacity=2, state_file=self.state_file)
+        self.assertEqual(first.try_acquire(RequestPriority.HIGH), 0)
+        self.assertEqual(second.try_acquire(RequestPriority.HIGH), 0)
+        self.assertGreater(first.try_acquire(RequestPriority.HIGH), 0)
+        self.assertGreater(second.try_acquire(RequestPriority.HIGH), 0)
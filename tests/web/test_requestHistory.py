@@ -0,0 +1,65 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+
+from ikabot.web.requestHistory import RequestHistory, RequestTraceFile
+
+
+class _Response:
+    def __init__(self, text):
+        self.status_code = 200
+        self.elapsed = timedelta(milliseconds=150)
+        self.headers = {'Content-Type': 'text/html'}
+        self.text = text
+        self.content = text.encode('utf-8')
+
+
+class TestRequestHistory(unittest.TestCase):
+    def test_keeps_only_last_records(self):
+        history = RequestHistory(size=3)
+        for i in range(10):
+            history.append('GET', 'url{}'.format(i))
+            history.set_response(_Response('x' * i))
+
+        self.assertEqual(len(history), 3)
+        self.assertEqual([r['url'] for r in history], ['url7', 'url8', 'url9'])
+        self.assertEqual(history[-1]['size'], 9)
+        self.assertEqual(history[-1]['status'], 200)
+        self.assertEqual(history[-1]['elapsed'], 0.15)
+
+    def test_body_is_kept_only_with_details(self):
+        history = RequestHistory(size=2)
+        history.append('GET', 'url', headers={'a': 'b'})
+        history.set_response(_Response('body'))
+        self.assertNotIn('response', history[-1])
+        self.assertNotIn('headers', history[-1])
+
+        history = RequestHistory(size=2, keep_details=True)
+        history.append('POST', 'url', payload={'p': 1}, headers={'a': 'b'})
+        history.set_response(_Response('body'))
+        self.assertEqual(history[-1]['response']['text'], 'body')
+        self.assertEqual(history[-1]['headers'], {'a': 'b'})
+
+    def test_trace_file_rotation(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            trace_file = RequestTraceFile(os.path.join(tmp_dir, 'trace'), max_bytes=1, backup_count=2, batch_size=2)
+            history = RequestHistory(size=2, trace_file=trace_file)
+            for i in range(7):
+                history.append('GET', 'url{}'.format(i))
+                history.set_response(_Response('body'))
+            history.close()
+
+            # every flush exceeds max_bytes, so the file is rotated each time
+            file_name = trace_file.get_file_name()
+            self.assertFalse(os.path.exists(file_name))
+            self.assertTrue(os.path.exists(file_name + '.1'))
+            self.assertTrue(os.path.exists(file_name + '.2'))
+            self.assertFalse(os.path.exists(file_name + '.3'))
+
+            with gzip.open(file_name + '.1', 'rt') as file:
+                records = [json.loads(line) for line in file]
+            self.assertEqual([r['url'] for r in records], ['url6'])
+            self.assertNotIn('response', records[0])
@@ -0,0 +1,57 @@
+import unittest
+from unittest import mock
+
+from ikabot.web.retryPolicy import CircuitBreaker, CircuitState, RetryPolicy
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_delay_grows_exponentially_and_is_capped(self):
+        policy = RetryPolicy(base_delay=2, max_delay=60)
+        for attempt, expected in [(0, 2), (1, 4), (2, 8), (5, 60), (1000, 60)]:
+            for _ in range(20):
+                delay = policy.get_delay(attempt)
+                self.assertGreaterEqual(delay, expected / 2)
+                self.assertLessEqual(delay, expected)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.states = []
+        self.circuit_breaker = CircuitBreaker(
+            name='s1-en.ikariam.gameforge.com',
+            failure_threshold=3,
+            open_policy=RetryPolicy(base_delay=30, max_delay=600),
+            on_state_change=lambda cb: self.states.append(cb.state),
+        )
+
+    def test_opens_after_consecutive_failures(self):
+        self.circuit_breaker.record_failure()
+        self.circuit_breaker.record_failure()
+        self.circuit_breaker.record_success()
+        self.circuit_breaker.record_failure()
+        self.circuit_breaker.record_failure()
+        self.assertEqual(self.circuit_breaker.state, CircuitState.CLOSED)
+
+        self.circuit_breaker.record_failure()
+        self.assertEqual(self.circuit_breaker.state, CircuitState.OPEN)
+        self.assertEqual(self.states, [CircuitState.OPEN])
+
+    @mock.patch('ikabot.web.retryPolicy.time.sleep')
+    def test_half_open_trial_request(self, sleep):
+        for _ in range(3):
+            self.circuit_breaker.record_failure()
+
+        self.assertGreater(self.circuit_breaker.wait_until_closed(), 0)
+        sleep.assert_called_once()
+        self.assertEqual(self.circuit_breaker.state, CircuitState.HALF_OPEN)
+
+        # a failed trial opens the circuit again
+        self.circuit_breaker.record_failure()
+        self.assertEqual(self.circuit_breaker.state, CircuitState.OPEN)
+        self.assertEqual(self.circuit_breaker.times_opened, 2)
+
+        self.circuit_breaker.wait_until_closed()
+        self.circuit_breaker.record_success()
+        self.assertEqual(self.circuit_breaker.state, CircuitState.CLOSED)
+        self.assertEqual(self.states, [CircuitState.OPEN, CircuitState.HALF_OPEN, CircuitState.OPEN,
+                                       CircuitState.HALF_OPEN, CircuitState.CLOSED])
@@ -0,0 +1,18 @@
+import socket
+import unittest
+
+import requests
+
+from ikabot.web.session import create_session
+
+
+class TestSession(unittest.TestCase):
+    def test_stalled_connection_times_out(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
+            # the server accepts the connection, but never answers
+            server.bind(('127.0.0.1', 0))
+            server.listen()
+            url = 'http://127.0.0.1:{}/'.format(server.getsockname()[1])
+            with create_session(timeout=(1, 0.2)) as session:
+                with self.assertRaises(requests.exceptions.ReadTimeout):
+                    session.get(url)
@@ -0,0 +1,54 @@
+import threading
+import time
+import unittest
+
+from ikabot.web.singleFlight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_completed_read_is_shared_within_ttl(self):
+        single_flight = SingleFlight(ttl=60)
+        calls = []
+        read = lambda: calls.append(1) or len(calls)
+
+        self.assertEqual(single_flight.do('city 1', read), (1, False))
+        self.assertEqual(single_flight.do('city 1', read), (1, True))
+        self.assertEqual(single_flight.do('city 2', read), (2, False))
+
+        single_flight.clear()
+        self.assertEqual(single_flight.do('city 1', read), (3, False))
+
+    def test_read_is_not_shared_when_tag_changes(self):
+        single_flight = SingleFlight(ttl=60)
+        tag = ['a']
+        single_flight.do('page', lambda: 'first', lambda: tag[0])
+        tag[0] = 'b'
+        self.assertEqual(single_flight.do('page', lambda: 'second', lambda: tag[0]), ('second', False))
+
+    def test_in_flight_read_is_shared(self):
+        single_flight = SingleFlight(ttl=0)
+        started = threading.Event()
+        results = []
+
+        def slow_read():
+            started.set()
+            time.sleep(0.2)
+            return 'page'
+
+        owner = threading.Thread(target=lambda: results.append(single_flight.do('page', slow_read)))
+        owner.start()
+        started.wait()
+        results.append(single_flight.do('page', lambda: 'other'))
+        owner.join()
+
+        self.assertEqual(sorted(results), [('page', False), ('page', True)])
+
+    def test_failed_read_is_not_shared(self):
+        single_flight = SingleFlight(ttl=60)
+
+        def failing_read():
+            raise ConnectionError()
+
+        with self.assertRaises(ConnectionError):
+            single_flight.do('page', failing_read)
+        self.assertEqual(single_flight.do('page', lambda: 'page'), ('page', False))